@@ -124,3 +124,12 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Number of threads running background import jobs in the web process.
+# Left at 0, jobs are run by the run_import_jobs management command, which
+# also picks up jobs a restarted web process never ran.
+IMPORT_JOB_WORKERS = int(os.getenv('IMPORT_JOB_WORKERS', '0'))
+
+# Seconds without progress after which a running import job is assumed to have
+# lost its worker and is queued again.
+IMPORT_JOB_STALE_SECONDS = int(os.getenv('IMPORT_JOB_STALE_SECONDS', '300'))
@@ -1,18 +1,57 @@
 from django.contrib import admin
 from django.db.models import Count, Sum, Q
-from .models import Card, Collection, CollectionCard, Decklist, DecklistCard
+from .models import Card, Collection, CollectionCard, Decklist, DecklistCard, ImportJob, OracleCard, SeedRun
+from .services.card_demand import CardDemandTracker
+from .services.card_search import CardSearch
+from .services.deck_simulator import DeckSimulator
+
+
+@admin.register(OracleCard)
+class OracleCardAdmin(admin.ModelAdmin):
+    list_display = ('name', 'mana_cost', 'cmc', 'type_line')
+    search_fields = ('name', 'oracle_text', 'type_line')
+    readonly_fields = ('oracle_id',)
+    
+    def get_search_results(self, request, queryset, search_term):
+        # Use the full-text index where the database has one
+        if search_term:
+            results = CardSearch.filter_queryset(queryset, search_term)
+            if results is not None:
+                return results, False
+        return super().get_search_results(request, queryset, search_term)
 
 
 @admin.register(Card)
 class CardAdmin(admin.ModelAdmin):
     list_display = ('name', 'set_code', 'collector_number', 'mana_cost', 'cmc', 'type_line', 'rarity')
     list_filter = ('set_code', 'rarity')
-    search_fields = ('name', 'oracle_text', 'type_line')
+    search_fields = ('name', 'oracle_card__oracle_text', 'oracle_card__type_line')
     readonly_fields = ('set_code', 'collector_number')
+    autocomplete_fields = ['oracle_card']
     
     def get_queryset(self, request):
-        # Optimize query with prefetch/select related if needed
-        return super().get_queryset(request)
+        # Gameplay attributes shown in the list come from the oracle card
+        return super().get_queryset(request).select_related('oracle_card')
+    
+    def get_search_results(self, request, queryset, search_term):
+        # Use the full-text index where the database has one
+        if search_term:
+            results = CardSearch.filter_queryset(queryset, search_term, 'oracle_card_id')
+            if results is not None:
+                return results, False
+        return super().get_search_results(request, queryset, search_term)
+
+
+def _collections_changed(collection_ids):
+    """
+    Bring the card demand and deck snapshots of collections edited in the admin up to date.
+    
+    Admin edits can change anything about a collection's cards and decklists,
+    so the demand is rebuilt rather than refreshed card by card.
+    """
+    CardDemandTracker.rebuild(collection_ids)
+    for collection_id in collection_ids:
+        DeckSimulator.invalidate(collection_id)
 
 
 class CollectionCardInline(admin.TabularInline):
@@ -43,6 +82,10 @@ class CollectionAdmin(admin.ModelAdmin):
         return obj.decklist_count
     decklist_count.admin_order_field = 'decklist_count'
     decklist_count.short_description = 'Decklists'
+    
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        DeckSimulator.invalidate(form.instance.id)
 
 
 class DecklistCardInline(admin.TabularInline):
@@ -77,6 +120,24 @@ class DecklistAdmin(admin.ModelAdmin):
     sideboard_count.admin_order_field = 'sideboard_count'
     sideboard_count.short_description = 'Side (Cards)'
 
+    # Admin edits can change anything about a decklist, so the card demand of
+    # the collections involved is rebuilt rather than refreshed card by card
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        collection_ids = {form.instance.collection_id}
+        if 'collection' in form.changed_data and form.initial.get('collection'):
+            collection_ids.add(form.initial['collection'])
+        _collections_changed(collection_ids)
+    
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        _collections_changed([obj.collection_id])
+    
+    def delete_queryset(self, request, queryset):
+        collection_ids = set(queryset.values_list('collection_id', flat=True))
+        super().delete_queryset(request, queryset)
+        _collections_changed(collection_ids)
+
 
 @admin.register(CollectionCard)
 class CollectionCardAdmin(admin.ModelAdmin):
@@ -84,6 +145,24 @@ class CollectionCardAdmin(admin.ModelAdmin):
     list_filter = ('collection',)
     search_fields = ('card__name',)
     autocomplete_fields = ['card']
+    
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        collection_ids = {obj.collection_id}
+        if 'collection' in form.changed_data and form.initial.get('collection'):
+            collection_ids.add(form.initial['collection'])
+        for collection_id in collection_ids:
+            DeckSimulator.invalidate(collection_id)
+    
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        DeckSimulator.invalidate(obj.collection_id)
+    
+    def delete_queryset(self, request, queryset):
+        collection_ids = set(queryset.values_list('collection_id', flat=True))
+        super().delete_queryset(request, queryset)
+        for collection_id in collection_ids:
+            DeckSimulator.invalidate(collection_id)
 
 
 @admin.register(DecklistCard)
@@ -91,4 +170,34 @@ class DecklistCardAdmin(admin.ModelAdmin):
     list_display = ('card', 'decklist', 'quantity', 'is_sideboard')
     list_filter = ('decklist', 'is_sideboard')
     search_fields = ('card__name', 'decklist__name')
-    autocomplete_fields = ['card']
\ No newline at end of file
+    autocomplete_fields = ['card']
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        collection_ids = {obj.decklist.collection_id}
+        if 'decklist' in form.changed_data and form.initial.get('decklist'):
+            collection_ids.add(Decklist.objects.get(id=form.initial['decklist']).collection_id)
+        _collections_changed(collection_ids)
+    
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        _collections_changed([obj.decklist.collection_id])
+    
+    def delete_queryset(self, request, queryset):
+        collection_ids = set(queryset.values_list('decklist__collection_id', flat=True))
+        super().delete_queryset(request, queryset)
+        _collections_changed(collection_ids)
+
+
+@admin.register(SeedRun)
+class SeedRunAdmin(admin.ModelAdmin):
+    list_display = ('data_type', 'updated_at', 'total_cards', 'imported_cards', 'updated_cards', 'unchanged_cards', 'created_at')
+    list_filter = ('data_type',)
+    readonly_fields = ('checksum',)
+
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'collection', 'decklist', 'status', 'processed_lines', 'total_lines', 'created_at', 'finished_at')
+    list_filter = ('kind', 'status')
+    readonly_fields = ('result', 'error', 'started_at', 'heartbeat_at', 'attempts', 'finished_at')
@@ -22,11 +22,12 @@ class CollectionEditForm(forms.ModelForm):
     
     class Meta:
         model = Collection
-        fields = ['name', 'description']
+        fields = ['name', 'description', 'exact_printings']
         widgets = {
             'name': forms.TextInput(attrs={'class': 'w-full p-2 border rounded-md focus:outline-none focus:ring-2 focus:ring-blue-500'}),
             'description': forms.Textarea(attrs={'class': 'w-full p-2 border rounded-md focus:outline-none focus:ring-2 focus:ring-blue-500', 
                                                  'rows': 4}),
+            'exact_printings': forms.CheckboxInput(attrs={'class': 'h-4 w-4 rounded border-gray-300 text-blue-600 focus:ring-blue-500'}),
         }
         
         
@@ -0,0 +1,91 @@
+import time
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from collection.models import Card, Collection, Decklist
+from collection.services.deck_allocation import DeckAllocator
+
+
+class Command(BaseCommand):
+    help = "Find which active decks of a collection can be built at the same time, and what to buy to build them all"
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'collection',
+            type=int,
+            nargs='?',
+            help='Collection id'
+        )
+        parser.add_argument(
+            '--prefer',
+            type=int,
+            nargs='+',
+            default=[],
+            help='Ids of decks to build first, in order'
+        )
+        parser.add_argument(
+            '--benchmark',
+            action='store_true',
+            help='Time the allocation on a generated demand matrix instead of a collection'
+        )
+        parser.add_argument(
+            '--decks',
+            type=int,
+            default=200,
+            help='Number of decks in the generated matrix (default: 200)'
+        )
+        parser.add_argument(
+            '--cards',
+            type=int,
+            default=5000,
+            help='Number of distinct cards in the generated matrix (default: 5000)'
+        )
+    
+    def handle(self, *args, **options):
+        if options['benchmark']:
+            self._benchmark(options['decks'], options['cards'])
+            return
+        
+        if options['collection'] is None:
+            raise CommandError('Give a collection id, or --benchmark')
+        collection = Collection.objects.filter(id=options['collection']).first()
+        if collection is None:
+            raise CommandError(f"Collection {options['collection']} does not exist")
+        
+        start_time = time.perf_counter()
+        allocation = DeckAllocator.solve(collection, options['prefer'])
+        elapsed = time.perf_counter() - start_time
+        
+        decklists = Decklist.objects.in_bulk(allocation['buildable'] + allocation['unbuildable'])
+        self.stdout.write(f"Buildable together ({len(allocation['buildable'])}):")
+        for decklist_id in allocation['buildable']:
+            self.stdout.write(f"    {decklists[decklist_id].name}")
+        self.stdout.write(f"Not buildable alongside them ({len(allocation['unbuildable'])}):")
+        for decklist_id in allocation['unbuildable']:
+            self.stdout.write(f"    {decklists[decklist_id].name}")
+        
+        if allocation['shortfall']:
+            cards = Card.objects.in_bulk(allocation['shortfall'].keys())
+            self.stdout.write("To build every active deck, buy:")
+            for card_id, quantity in sorted(allocation['shortfall'].items(), key=lambda item: cards[item[0]].name):
+                self.stdout.write(f"    {quantity} {cards[card_id].name} ({cards[card_id].set_code.upper()})")
+        
+        self.stdout.write(self.style.SUCCESS(f"Allocated in {elapsed:.3f} seconds."))
+    
+    def _benchmark(self, deck_count, card_count):
+        """Time the allocation on random decks of 20 to 40 distinct cards drawn from a shared pool."""
+        rng = np.random.default_rng(0)
+        demand = np.zeros((deck_count, card_count), dtype=np.int64)
+        for deck in range(deck_count):
+            cards = rng.choice(card_count, size=min(rng.integers(20, 40), card_count), replace=False)
+            demand[deck, cards] = rng.integers(1, 5, size=len(cards))
+        supply = rng.integers(1, 12, size=card_count)
+        
+        start_time = time.perf_counter()
+        chosen = DeckAllocator.allocate(demand, supply)
+        shortfall = DeckAllocator.shortfall(demand, supply)
+        elapsed = time.perf_counter() - start_time
+        
+        self.stdout.write(
+            f"{deck_count} decks x {card_count} cards: {chosen.sum()} buildable together, "
+            f"{shortfall.sum()} cards short, in {elapsed:.3f}s"
+        )
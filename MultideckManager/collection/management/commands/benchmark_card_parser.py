@@ -0,0 +1,93 @@
+import io
+import random
+import time
+from django.core.management.base import BaseCommand, CommandError
+from collection.services.card_list_parser import CardListParser
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the card list parser on generated inputs and check its throughput'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lines',
+            type=int,
+            default=100000,
+            help='Number of lines in each generated input (default: 100000)'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Number of timed runs per input, the fastest is reported (default: 3)'
+        )
+        parser.add_argument(
+            '--min-rate',
+            type=int,
+            default=50000,
+            help='Fail if any input parses slower than this many lines per second (default: 50000)'
+        )
+    
+    def handle(self, *args, **options):
+        line_count = options['lines']
+        repeat = options['repeat']
+        min_rate = options['min_rate']
+        
+        text, csv_text = self._generate_inputs(line_count)
+        benchmarks = [
+            ('text', lambda: CardListParser.parse_text(text)),
+            ('text, unmerged', lambda: CardListParser.parse_text(text, merge=False)),
+            ('csv', lambda: CardListParser.parse_csv(io.StringIO(csv_text))),
+        ]
+        
+        slow = []
+        for label, parse in benchmarks:
+            best = min(self._time(parse) for _ in range(repeat))
+            rate = line_count / best
+            self.stdout.write(f"{label}: {line_count} lines in {best:.3f}s ({rate:,.0f} lines/s)")
+            if rate < min_rate:
+                slow.append(label)
+        
+        if slow:
+            raise CommandError(f"Parsing is slower than {min_rate:,} lines/s for: {', '.join(slow)}")
+        
+        self.stdout.write(self.style.SUCCESS('Benchmark complete.'))
+    
+    @staticmethod
+    def _time(parse):
+        start = time.perf_counter()
+        parse()
+        return time.perf_counter() - start
+    
+    @staticmethod
+    def _generate_inputs(line_count):
+        """
+        Generate a text input mixing every supported line format and a CSV input.
+        
+        Names repeat so that merging is exercised, as in large cube lists.
+        """
+        rng = random.Random(0)
+        names = [f"Generated Card {i}" for i in range(max(line_count // 4, 1))]
+        formats = [
+            lambda name, n: f"{n} {name}",
+            lambda name, n: f"{n}x {name}",
+            lambda name, n: f"{name} ({n})",
+            lambda name, n: name,
+            lambda name, n: f"{n} {name} (ABC) {rng.randint(1, 400)}",
+            lambda name, n: f"{n} {name} (ABC) {rng.randint(1, 400)} *F*",
+            lambda name, n: f"SB: {n} {name}",
+        ]
+        
+        lines = []
+        csv_lines = []
+        for i in range(line_count):
+            name = rng.choice(names)
+            quantity = rng.randint(1, 4)
+            if i % 1000 == 0:
+                lines.append('Sideboard' if i % 2000 else 'Deck')
+                csv_lines.append('Sideboard' if i % 2000 else 'Mainboard')
+            else:
+                lines.append(rng.choice(formats)(name, quantity))
+                csv_lines.append(f"{quantity},{name},ABC,{i}")
+        
+        return '\n'.join(lines), '\n'.join(csv_lines)
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from collection.models import Collection
+from collection.services.card_demand import CardDemandTracker
+
+
+class Command(BaseCommand):
+    help = "Check that the card demand table matches the active decklists"
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--collection',
+            type=int,
+            help='Only check the demand of this collection id (default: all collections)'
+        )
+    
+    def handle(self, *args, **options):
+        collection_ids = None
+        if options['collection']:
+            if not Collection.objects.filter(id=options['collection']).exists():
+                raise CommandError(f"Collection {options['collection']} does not exist")
+            collection_ids = [options['collection']]
+        
+        mismatches = CardDemandTracker.check(collection_ids)
+        for collection_id, card_id, stored, expected in mismatches:
+            self.stdout.write(self.style.ERROR(
+                f"Collection {collection_id}, card {card_id}: stored {stored}, expected {expected}"
+            ))
+        
+        if mismatches:
+            raise CommandError(f"{len(mismatches)} card demand rows are wrong, run rebuild_card_demand to fix them")
+        
+        self.stdout.write(self.style.SUCCESS('Card demand matches the active decklists.'))
@@ -0,0 +1,111 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from collection.models import Collection
+from collection.services.card_query import CardQuery, CardQueryError
+from collection.services.card_search import CardSearch
+
+
+class Command(BaseCommand):
+    help = "Check with EXPLAIN QUERY PLAN that compiled card queries do not scan whole tables"
+    
+    DEFAULT_QUERIES = [
+        'bolt',
+        't:creature',
+        'o:"draw a card"',
+        'c:g',
+        'c<=wu',
+        'cmc<=3',
+        'cmc=0',
+        's:m10',
+        'is:owned',
+        't:creature cmc<=3 c:g o:"draw a card" is:owned',
+        't:instant -o:"draw a card" c:r',
+    ]
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'queries',
+            nargs='*',
+            help='Queries to check (default: a set covering every search key)'
+        )
+        parser.add_argument(
+            '--collection',
+            type=int,
+            help='Collection id used for is:owned (default: the first collection, or an empty one)'
+        )
+    
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Query plans can only be checked on SQLite')
+        if not CardSearch.is_available():
+            raise CommandError('The full-text card index is missing, run migrate first')
+        
+        # Without any collection, an empty one is created and rolled back, so is:owned is always checked
+        with transaction.atomic():
+            if options['collection']:
+                collection = Collection.objects.filter(id=options['collection']).first()
+                if collection is None:
+                    raise CommandError(f"Collection {options['collection']} does not exist")
+            else:
+                collection = Collection.objects.order_by('id').first()
+                if collection is None:
+                    collection = Collection.objects.create(name='check_card_queries')
+            
+            scanning, failing = self._check(options['queries'] or self.DEFAULT_QUERIES, collection, options['verbosity'])
+            transaction.set_rollback(True)
+        
+        if failing:
+            raise CommandError(f"{len(failing)} queries do not compile: {', '.join(failing)}")
+        if scanning:
+            raise CommandError(f"{len(scanning)} queries scan whole tables: {', '.join(scanning)}")
+        
+        self.stdout.write(self.style.SUCCESS('No compiled query scans a whole table.'))
+    
+    def _check(self, queries, collection, verbosity):
+        """
+        Compile and explain each query, reporting those that scan whole tables.
+        
+        Returns:
+            Tuple: (scanning, failing) lists of the queries that scan whole tables
+                and of those that do not compile
+        """
+        scanning = []
+        failing = []
+        for query in queries:
+            try:
+                queryset = CardQuery.compile(query, collection)[:20]
+            except CardQueryError as e:
+                failing.append(query)
+                self.stdout.write(self.style.ERROR(f"{query}: does not compile ({e})"))
+                continue
+            
+            plan = queryset.explain()
+            scans = [line.strip() for line in plan.splitlines() if self._is_full_scan(line)]
+            if scans:
+                scanning.append(query)
+                self.stdout.write(self.style.ERROR(f"{query}: full scan"))
+                for line in scans:
+                    self.stdout.write(f"    {line}")
+            else:
+                self.stdout.write(f"{query}: ok")
+            
+            if verbosity > 1:
+                self.stdout.write(plan)
+        
+        return scanning, failing
+    
+    @staticmethod
+    def _is_full_scan(line):
+        """
+        Whether a query plan line scans a whole table or index.
+        
+        FTS5 lookups show up as scans of the virtual table and subqueries as scans
+        of their results, neither of which reads a whole card table.
+        """
+        detail = line.split(' ', 3)[-1] if line[:1].isdigit() else line
+        detail = detail.strip()
+        return (
+            detail.startswith('SCAN ')
+            and 'VIRTUAL TABLE' not in detail
+            and not detail.startswith(('SCAN (subquery', 'SCAN CONSTANT ROW'))
+        )
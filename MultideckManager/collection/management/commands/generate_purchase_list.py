@@ -1,7 +1,10 @@
+import argparse
 import csv
 from collections import defaultdict
 from django.core.management.base import BaseCommand, CommandError
-from collection.models import Collection, Decklist, DecklistCard, CollectionCard, Card
+from django.db.models import Min, Sum
+from collection.models import Collection, Decklist, DecklistCard, Card
+from collection.services.deck_status import DeckStatusEngine
 
 
 class Command(BaseCommand):
@@ -25,6 +28,13 @@ class Command(BaseCommand):
             default=4,
             help='Target number of copies to have (default: 4)'
         )
+        parser.add_argument(
+            '--exact-printings',
+            action=argparse.BooleanOptionalAction,
+            default=None,
+            help="Only count owned copies of the printing a deck lists, or with --no-exact-printings "
+                 "copies of any printing (default: the collection's setting)"
+        )
 
     def handle(self, *args, **options):
         collection_id = options['collection_id']
@@ -52,43 +62,37 @@ class Command(BaseCommand):
         
         self.stdout.write(f"Found {len(decklists)} decklists to analyze.")
         
-        # Get all cards needed for decklists
+        exact_printings = options['exact_printings']
+        if exact_printings is None:
+            exact_printings = collection.exact_printings
+        field = DeckStatusEngine.card_field(exact_printings)
+        
+        # Maximum number of each card needed by any one decklist, mainboard and
+        # sideboard together, with the first printing listed for it
         needed_cards = defaultdict(int)
+        printings = {}
         
         # Track which decklists need each card
         card_usage = defaultdict(list)
         
-        # Find the maximum number of each card needed across all decklists
-        for decklist in decklists:
-            self.stdout.write(f"Processing decklist: {decklist.name}")
-            
-            # Get all cards in this decklist
-            decklist_cards = DecklistCard.objects.filter(decklist=decklist).select_related('card')
-            
-            # Track cards in this decklist
-            decklist_card_counts = defaultdict(int)
-            
-            for dc in decklist_cards:
-                card_id = dc.card_id
-                decklist_card_counts[card_id] += dc.quantity
+        decklist_names = {decklist.id: decklist.name for decklist in decklists}
+        for decklist_id, key, card_id, quantity in DecklistCard.objects.filter(
+            decklist_id__in=decklist_names
+        ).values('decklist_id', field).annotate(printing=Min('card_id'), total=Sum('quantity')).order_by(
+            'decklist_id'
+        ).values_list('decklist_id', field, 'printing', 'total'):
+            needed_cards[key] = max(needed_cards[key], quantity)
+            printings[key] = min(printings.get(key, card_id), card_id)
+            card_usage[key].append((decklist_names[decklist_id], quantity))
             
-            # Update global needed cards with max quantity needed
-            for card_id, quantity in decklist_card_counts.items():
-                needed_cards[card_id] = max(needed_cards[card_id], quantity)
-                card_usage[card_id].append((decklist.name, quantity))
-        
-        # Get current inventory from collection
-        inventory = {}
-        collection_cards = CollectionCard.objects.filter(collection=collection).select_related('card')
-        
-        for cc in collection_cards:
-            inventory[cc.card_id] = cc.quantity
+        # Get current inventory from collection, pooled over printings unless exact
+        inventory = DeckStatusEngine.inventory(collection, exact_printings)
         
         # Calculate purchase requirements
-        purchase_list = []
+        to_purchase_by_card = {}
         
-        for card_id, max_needed in needed_cards.items():
-            current_count = inventory.get(card_id, 0)
+        for key, max_needed in needed_cards.items():
+            current_count = inventory.get(key, 0)
             
             # If we have infinite copies (-1) or more than target, skip
             if current_count == -1 or current_count >= target_count:
@@ -100,26 +104,30 @@ class Command(BaseCommand):
             to_purchase = max(0, target - current_count)
             
             if to_purchase > 0:
-                try:
-                    card = Card.objects.get(id=card_id)
+                to_purchase_by_card[key] = (to_purchase, current_count, max_needed)
                     
-                    # Get usage info
-                    usage_info = ', '.join([f"{name} ({qty})" for name, qty in card_usage[card_id]])
+        cards = Card.objects.select_related('oracle_card').in_bulk(
+            [printings[key] for key in to_purchase_by_card]
+        )
+        purchase_list = []
+        for key, (to_purchase, current_count, max_needed) in to_purchase_by_card.items():
+            card = cards[printings[key]]
                     
-                    purchase_list.append({
-                        'card_id': card_id,
-                        'name': card.name,
-                        'set_code': card.set_code,
-                        'collector_number': card.collector_number,
-                        'type_line': card.type_line,
-                        'rarity': card.rarity,
-                        'to_purchase': to_purchase,
-                        'current_count': current_count,
-                        'max_needed': max_needed,
-                        'usage': usage_info
-                    })
-                except Card.DoesNotExist:
-                    self.stdout.write(self.style.WARNING(f"Card with ID {card_id} not found in database."))
+            # Get usage info
+            usage_info = ', '.join([f"{name} ({qty})" for name, qty in card_usage[key]])
+            
+            purchase_list.append({
+                'card_id': card.id,
+                'name': card.name,
+                'set_code': card.set_code,
+                'collector_number': card.collector_number,
+                'type_line': card.type_line,
+                'rarity': card.rarity,
+                'to_purchase': to_purchase,
+                'current_count': current_count,
+                'max_needed': max_needed,
+                'usage': usage_info
+            })
         
         # Sort the purchase list by card name
         purchase_list.sort(key=lambda x: x['name'])
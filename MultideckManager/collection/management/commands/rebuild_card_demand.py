@@ -0,0 +1,29 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from collection.models import Collection
+from collection.services.card_demand import CardDemandTracker
+
+
+class Command(BaseCommand):
+    help = "Recompute the per-collection card demand table from the active decklists"
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--collection',
+            type=int,
+            help='Only rebuild the demand of this collection id (default: all collections)'
+        )
+    
+    def handle(self, *args, **options):
+        collection_ids = None
+        if options['collection']:
+            if not Collection.objects.filter(id=options['collection']).exists():
+                raise CommandError(f"Collection {options['collection']} does not exist")
+            collection_ids = [options['collection']]
+        
+        start_time = time.time()
+        rows = CardDemandTracker.rebuild(collection_ids)
+        
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt card demand with {rows} rows in {time.time() - start_time:.2f} seconds."
+        ))
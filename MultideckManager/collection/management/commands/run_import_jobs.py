@@ -0,0 +1,42 @@
+import time
+from django.core.management.base import BaseCommand
+from collection.services.import_jobs import ImportJobRunner
+
+
+class Command(BaseCommand):
+    help = 'Run pending background import jobs'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once no job is pending instead of waiting for new ones'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2.0,
+            help='Seconds to wait between checks for new jobs (default: 2)'
+        )
+    
+    def handle(self, *args, **options):
+        once = options['once']
+        poll_interval = options['poll_interval']
+        
+        self.stdout.write("Waiting for import jobs..." if not once else "Running pending import jobs...")
+        
+        try:
+            while True:
+                job = ImportJobRunner.run_next()
+                if job is None:
+                    if once:
+                        break
+                    time.sleep(poll_interval)
+                    continue
+                
+                if job.status == job.STATUS_COMPLETED:
+                    self.stdout.write(self.style.SUCCESS(f"Completed {job}"))
+                else:
+                    self.stdout.write(self.style.ERROR(f"Failed {job}: {job.error}"))
+        except KeyboardInterrupt:
+            self.stdout.write("Stopped.")
@@ -14,17 +14,38 @@ class Command(BaseCommand):
             choices=['default_cards', 'oracle_cards', 'unique_artwork', 'all_cards'],
             help='Type of bulk data to download'
         )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Reseed even if the database already holds the latest bulk data'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Number of worker processes used to parse cards (default: 1, no pipeline)'
+        )
+        parser.add_argument(
+            '--bulk-load',
+            action='store_true',
+            help='Load through a staging table with relaxed SQLite durability settings'
+        )
 
     def handle(self, *args, **options):
         data_type = options['type']
+        force = options['force']
+        workers = options['workers']
+        bulk_load = options['bulk_load']
         
         self.stdout.write(f"Seeding database with {data_type} from Scryfall...")
         
         try:
-            seeder = CardSeeder(data_type=data_type)
-            success = seeder.run()
+            seeder = CardSeeder(data_type=data_type, workers=workers, bulk_load=bulk_load)
+            success = seeder.run(force=force)
             
             if success:
+                for phase, seconds in seeder.timings.items():
+                    self.stdout.write(f"  {phase}: {seconds:.2f}s")
                 self.stdout.write(self.style.SUCCESS('Successfully seeded the database with cards!'))
             else:
                 self.stdout.write(self.style.ERROR('Card seeding failed.'))
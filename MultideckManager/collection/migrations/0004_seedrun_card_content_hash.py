@@ -0,0 +1,36 @@
+# Generated by Django 5.1.7 on 2026-10-18 10:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('collection', '0003_decklist_active'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SeedRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data_type', models.CharField(max_length=50)),
+                ('updated_at', models.DateTimeField(help_text="Scryfall's updated_at timestamp for the bulk data file")),
+                ('checksum', models.CharField(help_text='SHA-256 checksum of the bulk data file', max_length=64)),
+                ('total_cards', models.IntegerField(default=0)),
+                ('imported_cards', models.IntegerField(default=0)),
+                ('updated_cards', models.IntegerField(default=0)),
+                ('unchanged_cards', models.IntegerField(default=0)),
+                ('skipped_cards', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-updated_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='card',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', help_text='Hash of the seeded card data, used to skip unchanged cards on reseed', max_length=40),
+        ),
+    ]
@@ -0,0 +1,126 @@
+# Generated by Django 5.1.7 on 2026-10-18 10:40
+
+import uuid
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+# Must match LEGACY_ORACLE_NAMESPACE in collection/services/card_rows.py
+LEGACY_ORACLE_NAMESPACE = uuid.UUID('799df14b-e496-4135-9688-46de52d8314d')
+
+ORACLE_FIELDS = ['mana_cost', 'cmc', 'type_line', 'oracle_text', 'power', 'toughness', 'loyalty']
+
+
+def link_oracle_cards(apps, schema_editor):
+    """
+    Create one OracleCard per distinct card name and point every printing at it.
+
+    Existing rows were seeded without Scryfall's oracle_id, so each name gets a
+    stable placeholder id. The next seed run replaces them with the real oracle
+    cards and removes the placeholders once no printing references them.
+    """
+    Card = apps.get_model('collection', 'Card')
+    OracleCard = apps.get_model('collection', 'OracleCard')
+
+    oracle_cards = {}
+    for values in Card.objects.order_by('name', 'id').values('name', *ORACLE_FIELDS):
+        name = values.pop('name')
+        if name not in oracle_cards:
+            oracle_cards[name] = OracleCard(
+                oracle_id=str(uuid.uuid5(LEGACY_ORACLE_NAMESPACE, name)),
+                name=name,
+                **values
+            )
+    OracleCard.objects.bulk_create(oracle_cards.values(), batch_size=500)
+
+    # A temporary index keeps the correlated name lookup below from scanning the table per row
+    name_index = models.Index(fields=['name'], name='collection_oraclecard_name_tmp')
+    schema_editor.add_index(OracleCard, name_index)
+
+    # Clearing the content hash makes the next seed run rewrite every printing
+    Card.objects.update(
+        oracle_card=Subquery(OracleCard.objects.filter(name=OuterRef('name')).values('id')[:1]),
+        content_hash='',
+    )
+
+    schema_editor.remove_index(OracleCard, name_index)
+
+
+def unlink_oracle_cards(apps, schema_editor):
+    """Copy the gameplay attributes back onto each printing."""
+    Card = apps.get_model('collection', 'Card')
+    OracleCard = apps.get_model('collection', 'OracleCard')
+
+    oracle_card = OracleCard.objects.filter(id=OuterRef('oracle_card_id'))
+    Card.objects.update(
+        content_hash='',
+        **{field: Subquery(oracle_card.values(field)[:1]) for field in ORACLE_FIELDS}
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('collection', '0004_seedrun_card_content_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OracleCard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('oracle_id', models.CharField(help_text='Scryfall oracle_id shared by every printing of the card', max_length=36, unique=True)),
+                ('name', models.CharField(max_length=255)),
+                ('mana_cost', models.CharField(blank=True, max_length=50, null=True)),
+                ('cmc', models.FloatField(default=0)),
+                ('type_line', models.CharField(blank=True, max_length=255, null=True)),
+                ('oracle_text', models.TextField(blank=True, null=True)),
+                ('power', models.CharField(blank=True, max_length=10, null=True)),
+                ('toughness', models.CharField(blank=True, max_length=10, null=True)),
+                ('loyalty', models.CharField(blank=True, max_length=10, null=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='card',
+            name='oracle_card',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='printings', to='collection.oraclecard'),
+        ),
+        migrations.RunPython(link_oracle_cards, unlink_oracle_cards),
+        migrations.AlterField(
+            model_name='card',
+            name='oracle_card',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='printings', to='collection.oraclecard'),
+        ),
+        migrations.RemoveField(
+            model_name='card',
+            name='cmc',
+        ),
+        migrations.RemoveField(
+            model_name='card',
+            name='loyalty',
+        ),
+        migrations.RemoveField(
+            model_name='card',
+            name='mana_cost',
+        ),
+        migrations.RemoveField(
+            model_name='card',
+            name='oracle_text',
+        ),
+        migrations.RemoveField(
+            model_name='card',
+            name='power',
+        ),
+        migrations.RemoveField(
+            model_name='card',
+            name='toughness',
+        ),
+        migrations.RemoveField(
+            model_name='card',
+            name='type_line',
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.1.7 on 2026-10-18 10:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def set_preferred_printings(apps, schema_editor):
+    """
+    Pick a preferred printing for every oracle card.
+
+    Release dates are only filled in by the next seed run, which recomputes the
+    preferred printings, so until then the set code ordering the importers used
+    before stands in for them.
+    """
+    Card = apps.get_model('collection', 'Card')
+    OracleCard = apps.get_model('collection', 'OracleCard')
+
+    printings = Card.objects.filter(oracle_card=OuterRef('pk')).order_by('-set_code', 'id')
+    OracleCard.objects.update(preferred_printing=Subquery(printings.values('id')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('collection', '0005_oraclecard_card_oracle_card'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='card',
+            name='released_at',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='oraclecard',
+            name='preferred_printing',
+            field=models.OneToOneField(blank=True, help_text='Most recently released printing, used when a card is looked up by name', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='preferred_for', to='collection.card'),
+        ),
+        migrations.RunPython(set_preferred_printings, migrations.RunPython.noop),
+    ]
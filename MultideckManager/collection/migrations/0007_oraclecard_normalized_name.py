@@ -0,0 +1,55 @@
+# Generated by Django 5.1.7 on 2026-10-18 10:22
+
+import unicodedata
+
+from django.db import migrations, models
+
+# Copies of the normalization at the time of this migration, so later changes to it cannot alter what it does
+_NAME_FOLDS = str.maketrans({'æ': 'ae', 'œ': 'oe', '\u2018': "'", '\u2019': "'"})
+
+
+def normalize_name(name):
+    decomposed = unicodedata.normalize('NFKD', name.casefold())
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(stripped.translate(_NAME_FOLDS).split())
+
+
+def face_name(name):
+    return name.split(' // ')[0]
+
+
+def fill_normalized_names(apps, schema_editor):
+    """Fill in the normalized names of the existing oracle cards."""
+    OracleCard = apps.get_model('collection', 'OracleCard')
+
+    rows = [
+        (normalize_name(name), normalize_name(face_name(name)), oracle_card_id)
+        for oracle_card_id, name in OracleCard.objects.values_list('id', 'name')
+    ]
+    # A single executemany avoids building a CASE expression per row as bulk_update would
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            f'UPDATE {OracleCard._meta.db_table} SET normalized_name = %s, normalized_face_name = %s WHERE id = %s',
+            rows
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('collection', '0006_card_released_at_preferred_printing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='oraclecard',
+            name='normalized_face_name',
+            field=models.CharField(db_index=True, default='', help_text='Normalized name of the front face, so split and double-faced cards can be found by it', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='oraclecard',
+            name='normalized_name',
+            field=models.CharField(db_index=True, default='', help_text='Casefolded, accent-stripped name used for lookups', max_length=255),
+        ),
+        migrations.RunPython(fill_normalized_names, migrations.RunPython.noop),
+    ]
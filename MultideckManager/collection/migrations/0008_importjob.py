@@ -0,0 +1,37 @@
+# Generated by Django 5.1.7 on 2026-10-18 10:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('collection', '0007_oraclecard_normalized_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('collection', 'Collection import'), ('decklist', 'Decklist import')], max_length=20)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], db_index=True, default='pending', max_length=20)),
+                ('input_format', models.CharField(default='text', help_text="Format of the card list: 'text' or 'csv'", max_length=10)),
+                ('input_data', models.TextField(help_text='The submitted card list')),
+                ('options', models.JSONField(blank=True, default=dict, help_text='Import options such as skip_unknown or clear_existing')),
+                ('total_lines', models.IntegerField(default=0)),
+                ('processed_lines', models.IntegerField(default=0)),
+                ('result', models.JSONField(blank=True, help_text='Result of the import, as returned by the import services', null=True)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('collection', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='import_jobs', to='collection.collection')),
+                ('decklist', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='import_jobs', to='collection.decklist')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
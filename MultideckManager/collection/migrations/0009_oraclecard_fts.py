@@ -0,0 +1,47 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:05
+
+from django.db import OperationalError, migrations
+
+# Must match CardSearch.FTS_TABLE in collection/services/card_search.py
+FTS_TABLE = 'collection_oraclecard_fts'
+
+
+def create_fts_index(apps, schema_editor):
+    """
+    Create and fill the FTS5 index over the oracle cards.
+
+    The index is an external-content table, so it stores only the index and
+    reads the columns from collection_oraclecard. Other backends, and SQLite
+    builds without FTS5, go without it and search falls back to substring matches.
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+
+    OracleCard = apps.get_model('collection', 'OracleCard')
+    try:
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5('
+            f'normalized_name, type_line, oracle_text, '
+            f"content='{OracleCard._meta.db_table}', content_rowid='id', "
+            f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+    except OperationalError:
+        # SQLite was built without FTS5
+        return
+    schema_editor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def drop_fts_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('collection', '0008_importjob'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_index, drop_fts_index),
+    ]
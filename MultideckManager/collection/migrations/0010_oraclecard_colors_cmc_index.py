@@ -0,0 +1,56 @@
+# Generated by Django 5.1.7 on 2026-10-18 10:47
+
+import re
+
+from django.db import migrations, models
+
+# Copies of the color computation at the time of this migration, so later changes to it cannot alter what it does
+COLOR_BITS = {'W': 1, 'U': 2, 'B': 4, 'R': 8, 'G': 16}
+
+_MANA_SYMBOL = re.compile(r'\{([^}]*)\}')
+
+
+def mana_cost_colors(mana_cost):
+    mask = 0
+    for color in ''.join(_MANA_SYMBOL.findall(mana_cost or '')).replace('/P', ''):
+        mask |= COLOR_BITS.get(color.upper(), 0)
+    return mask
+
+
+def fill_colors(apps, schema_editor):
+    """
+    Fill in the colors of the existing oracle cards from their mana costs.
+
+    Adding colors to the seeded fields changes every card's content hash, so the
+    next seed run rewrites them with Scryfall's colors, which also cover cards
+    colored by a color indicator.
+    """
+    OracleCard = apps.get_model('collection', 'OracleCard')
+
+    rows = [
+        (mana_cost_colors(mana_cost), oracle_card_id)
+        for oracle_card_id, mana_cost in OracleCard.objects.values_list('id', 'mana_cost')
+    ]
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(f'UPDATE {OracleCard._meta.db_table} SET colors = %s WHERE id = %s', rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('collection', '0009_oraclecard_fts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='oraclecard',
+            name='colors',
+            field=models.PositiveSmallIntegerField(db_index=True, default=0, help_text="Bitmask of the card's colors: W=1, U=2, B=4, R=8, G=16"),
+        ),
+        migrations.AlterField(
+            model_name='oraclecard',
+            name='cmc',
+            field=models.FloatField(db_index=True, default=0),
+        ),
+        migrations.RunPython(fill_colors, migrations.RunPython.noop),
+    ]
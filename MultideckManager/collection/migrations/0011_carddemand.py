@@ -0,0 +1,41 @@
+# Generated by Django 5.1.7 on 2026-10-18 10:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_card_demand(apps, schema_editor):
+    """Sum the demand of the active decklists already in the database."""
+    CardDemand = apps.get_model('collection', 'CardDemand')
+    Decklist = apps.get_model('collection', 'Decklist')
+    DecklistCard = apps.get_model('collection', 'DecklistCard')
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {CardDemand._meta.db_table} (collection_id, card_id, quantity) '
+            f'SELECT d.collection_id, dc.card_id, SUM(dc.quantity) '
+            f'FROM {DecklistCard._meta.db_table} dc JOIN {Decklist._meta.db_table} d ON d.id = dc.decklist_id '
+            f'WHERE d.active GROUP BY d.collection_id, dc.card_id'
+        )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('collection', '0010_oraclecard_colors_cmc_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CardDemand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField(default=0, help_text="Sum of the card's quantities in the collection's active decklists")),
+                ('card', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='collection.card')),
+                ('collection', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='card_demands', to='collection.collection')),
+            ],
+            options={
+                'unique_together': {('collection', 'card')},
+            },
+        ),
+        migrations.RunPython(fill_card_demand, migrations.RunPython.noop),
+    ]
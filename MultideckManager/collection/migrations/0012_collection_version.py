@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 10:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('collection', '0011_carddemand'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='collection',
+            name='version',
+            field=models.PositiveIntegerField(default=0, help_text="Incremented whenever the collection's cards or decklists change, so cached snapshots can tell they are stale"),
+        ),
+    ]
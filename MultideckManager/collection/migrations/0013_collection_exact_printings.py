@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 10:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('collection', '0012_collection_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='collection',
+            name='exact_printings',
+            field=models.BooleanField(default=False, help_text='Only count owned copies of the exact printing a deck lists, rather than any printing of the card'),
+        ),
+    ]
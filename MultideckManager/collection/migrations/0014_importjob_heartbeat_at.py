@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('collection', '0013_collection_exact_printings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, help_text='When the worker running the job last reported progress', null=True),
+        ),
+    ]
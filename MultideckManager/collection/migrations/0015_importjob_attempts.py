@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('collection', '0014_importjob_heartbeat_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='attempts',
+            field=models.IntegerField(default=0, help_text='Number of times a worker claimed the job, only the latest claim may write to it'),
+        ),
+    ]
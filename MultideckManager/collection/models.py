@@ -1,22 +1,48 @@
 from django.db import models
 from django.core.validators import MinValueValidator
 
-class Card(models.Model):
+class OracleCard(models.Model):
     """
-    Represents a unique Magic: The Gathering card in the collection.
+    Represents a unique Magic: The Gathering card as a gameplay object, shared by all of its printings.
     """
+    oracle_id = models.CharField(max_length=36, unique=True, help_text="Scryfall oracle_id shared by every printing of the card")
     name = models.CharField(max_length=255)
-    set_code = models.CharField(max_length=10)
-    collector_number = models.CharField(max_length=10)
     mana_cost = models.CharField(max_length=50, blank=True, null=True)
-    cmc = models.FloatField(default=0)
+    cmc = models.FloatField(default=0, db_index=True)
     type_line = models.CharField(max_length=255, blank=True, null=True)
     oracle_text = models.TextField(blank=True, null=True)
     power = models.CharField(max_length=10, blank=True, null=True)
     toughness = models.CharField(max_length=10, blank=True, null=True)
     loyalty = models.CharField(max_length=10, blank=True, null=True)
+    colors = models.PositiveSmallIntegerField(default=0, db_index=True, help_text="Bitmask of the card's colors: W=1, U=2, B=4, R=8, G=16")
+    normalized_name = models.CharField(max_length=255, db_index=True, default='', help_text="Casefolded, accent-stripped name used for lookups")
+    normalized_face_name = models.CharField(max_length=255, db_index=True, default='', help_text="Normalized name of the front face, so split and double-faced cards can be found by it")
+    preferred_printing = models.OneToOneField(
+        'Card', on_delete=models.SET_NULL, null=True, blank=True, related_name='preferred_for',
+        help_text="Most recently released printing, used when a card is looked up by name"
+    )
+    
+    class Meta:
+        ordering = ['name']
+    
+    def __str__(self):
+        return self.name
+
+
+class Card(models.Model):
+    """
+    Represents a single printing of a Magic: The Gathering card.
+    
+    Gameplay attributes live on the shared OracleCard and are exposed here as read-only properties.
+    """
+    oracle_card = models.ForeignKey(OracleCard, on_delete=models.PROTECT, related_name='printings')
+    name = models.CharField(max_length=255)
+    set_code = models.CharField(max_length=10)
+    collector_number = models.CharField(max_length=10)
     rarity = models.CharField(max_length=20, blank=True, null=True)
     scryfall_uri = models.URLField(max_length=255, blank=True, null=True)
+    released_at = models.DateField(blank=True, null=True)
+    content_hash = models.CharField(max_length=40, blank=True, default='', help_text="Hash of the seeded card data, used to skip unchanged cards on reseed")
     
     class Meta:
         unique_together = ['set_code', 'collector_number']
@@ -24,6 +50,55 @@ class Card(models.Model):
     
     def __str__(self):
         return f"{self.name} ({self.set_code} #{self.collector_number})"
+    
+    @property
+    def mana_cost(self):
+        return self.oracle_card.mana_cost
+    
+    @property
+    def cmc(self):
+        return self.oracle_card.cmc
+    
+    @property
+    def type_line(self):
+        return self.oracle_card.type_line
+    
+    @property
+    def oracle_text(self):
+        return self.oracle_card.oracle_text
+    
+    @property
+    def power(self):
+        return self.oracle_card.power
+    
+    @property
+    def toughness(self):
+        return self.oracle_card.toughness
+    
+    @property
+    def loyalty(self):
+        return self.oracle_card.loyalty
+
+
+class SeedRun(models.Model):
+    """
+    Records a completed seeding run from a Scryfall bulk data file.
+    """
+    data_type = models.CharField(max_length=50)
+    updated_at = models.DateTimeField(help_text="Scryfall's updated_at timestamp for the bulk data file")
+    checksum = models.CharField(max_length=64, help_text="SHA-256 checksum of the bulk data file")
+    total_cards = models.IntegerField(default=0)
+    imported_cards = models.IntegerField(default=0)
+    updated_cards = models.IntegerField(default=0)
+    unchanged_cards = models.IntegerField(default=0)
+    skipped_cards = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-updated_at']
+    
+    def __str__(self):
+        return f"{self.data_type} ({self.updated_at:%Y-%m-%d %H:%M})"
 
 
 class Collection(models.Model):
@@ -33,6 +108,8 @@ class Collection(models.Model):
     name = models.CharField(max_length=255)
     description = models.TextField(blank=True, null=True)
     cards = models.ManyToManyField(Card, through='CollectionCard')
+    exact_printings = models.BooleanField(default=False, help_text="Only count owned copies of the exact printing a deck lists, rather than any printing of the card")
+    version = models.PositiveIntegerField(default=0, help_text="Incremented whenever the collection's cards or decklists change, so cached snapshots can tell they are stale")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -80,90 +157,15 @@ class Decklist(models.Model):
         Checks if the deck can be built with the cards in the collection.
         Returns tuple: (can_be_built, conflict_info)
         
-        conflict_info is a dictionary with information about missing cards or conflicts
+        conflict_info is a list of dictionaries with information about missing cards or conflicts
         """
         if not self.active:
             return (True, None)
             
-        collection = self.collection
-        # Get all cards in this decklist
-        decklist_cards = self.decklistcard_set.all().select_related('card')
-        
-        # Get the quantities of cards in the collection
-        collection_cards = {cc.card_id: cc.quantity for cc in 
-                           CollectionCard.objects.filter(collection=collection)}
-        
-        # Check if all cards in the deck are available in sufficient quantities
-        conflicts = []
-        
-        # Keep track of used cards to detect conflicts with other active decklists
-        used_cards = {}
-        
-        for deck_card in decklist_cards:
-            card_id = deck_card.card_id
-            needed_quantity = deck_card.quantity
-            
-            # Track usage of this card
-            used_cards[card_id] = needed_quantity
-            
-            # Check if card exists in collection
-            if card_id not in collection_cards:
-                conflicts.append({
-                    'card': deck_card.card,
-                    'needed': needed_quantity,
-                    'available': 0,
-                    'type': 'missing'
-                })
-            elif collection_cards[card_id] != -1 and collection_cards[card_id] < needed_quantity:
-                # Not enough of this card (-1 means infinite)
-                conflicts.append({
-                    'card': deck_card.card,
-                    'needed': needed_quantity,
-                    'available': collection_cards[card_id],
-                    'type': 'insufficient'
-                })
-        
-        # Check for conflicts with other active decklists
-        other_decklists = Decklist.objects.filter(
-            collection=collection, 
-            active=True
-        ).exclude(id=self.id)
+        from collection.services.deck_status import DeckStatusEngine
+        conflicts = DeckStatusEngine.deck_conflicts(self)
         
-        # Calculate card usage across all active decklists
-        all_deck_usage = {}
-        for deck in other_decklists:
-            for deck_card in deck.decklistcard_set.all():
-                card_id = deck_card.card_id
-                if card_id in all_deck_usage:
-                    all_deck_usage[card_id] += deck_card.quantity
-                else:
-                    all_deck_usage[card_id] = deck_card.quantity
-        
-        # Check for conflicts based on total card usage
-        for card_id, quantity in used_cards.items():
-            if card_id in all_deck_usage:
-                total_needed = quantity + all_deck_usage[card_id]
-                
-                # If card in collection and quantity is not infinite
-                if card_id in collection_cards and collection_cards[card_id] != -1:
-                    if total_needed > collection_cards[card_id]:
-                        # Conflict with other decks
-                        try:
-                            card = Card.objects.get(id=card_id)
-                            conflicts.append({
-                                'card': card,
-                                'needed': total_needed,
-                                'available': collection_cards.get(card_id, 0),
-                                'current_deck_needs': quantity,
-                                'other_decks_need': all_deck_usage[card_id],
-                                'type': 'conflict'
-                            })
-                        except Card.DoesNotExist:
-                            pass
-        
-        can_be_built = len(conflicts) == 0
-        
-        return (can_be_built, conflicts if conflicts else None)
+        return (not conflicts, conflicts or None)
     
     def get_status(self):
         """
@@ -175,28 +177,18 @@ class Decklist(models.Model):
         - ok: Deck is active and has no conflicts
         - conflict: Deck is active but has conflicts with other active decks
         - error: Deck cannot be built with the available cards
+        
+        Statuses computed for the whole collection by DeckStatusEngine.attach are
+        returned as they are.
         """
-        if not self.active:
-            return ('inactive', 'Inactive', None)
+        status = getattr(self, '_status', None)
+        if status is not None:
+            return status
             
         can_be_built, conflicts = self.can_be_built()
         
-        if can_be_built:
-            return ('ok', 'Active', None)
-            
-        if not conflicts:
-            return ('ok', 'Active', None)
-            
-        # Check if any conflicts are of type 'missing' or 'insufficient'
-        error_conflicts = [c for c in conflicts if c['type'] in ('missing', 'insufficient')]
-        conflict_conflicts = [c for c in conflicts if c['type'] == 'conflict']
-        
-        if error_conflicts:
-            return ('error', 'Error', error_conflicts)
-        elif conflict_conflicts:
-            return ('conflict', 'Conflict', conflict_conflicts)
-        else:
-            return ('ok', 'Active', None)
+        from collection.services.deck_status import DeckStatusEngine
+        return DeckStatusEngine.status(self.active, conflicts)
 
 
 class DecklistCard(models.Model):
@@ -213,4 +205,71 @@ class DecklistCard(models.Model):
     
     def __str__(self):
         location = "Sideboard" if self.is_sideboard else "Mainboard"
-        return f"{self.quantity}x {self.card.name} in {self.decklist.name} ({location})"
\ No newline at end of file
+        return f"{self.quantity}x {self.card.name} in {self.decklist.name} ({location})"
+
+
+class CardDemand(models.Model):
+    """
+    Total quantity of a card needed by the active decklists of a collection.
+    
+    Maintained by CardDemandTracker whenever decklist cards or a decklist's active
+    state change, so conflicts between decks can be checked without summing every deck.
+    """
+    collection = models.ForeignKey(Collection, on_delete=models.CASCADE, related_name='card_demands')
+    card = models.ForeignKey(Card, on_delete=models.PROTECT)
+    quantity = models.IntegerField(default=0, help_text="Sum of the card's quantities in the collection's active decklists")
+    
+    class Meta:
+        unique_together = ['collection', 'card']
+    
+    def __str__(self):
+        return f"{self.quantity}x {self.card.name} needed in {self.collection.name}"
+
+
+class ImportJob(models.Model):
+    """
+    A collection or decklist import that runs in the background.
+    
+    The submitted card list is stored with the job so that any worker, in the web
+    process or in the run_import_jobs command, can pick it up.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_COMPLETED, 'Completed'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+    
+    KIND_COLLECTION = 'collection'
+    KIND_DECKLIST = 'decklist'
+    KIND_CHOICES = [
+        (KIND_COLLECTION, 'Collection import'),
+        (KIND_DECKLIST, 'Decklist import'),
+    ]
+    
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    collection = models.ForeignKey(Collection, on_delete=models.CASCADE, related_name='import_jobs')
+    decklist = models.ForeignKey(Decklist, on_delete=models.CASCADE, null=True, blank=True, related_name='import_jobs')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING, db_index=True)
+    input_format = models.CharField(max_length=10, default='text', help_text="Format of the card list: 'text' or 'csv'")
+    input_data = models.TextField(help_text="The submitted card list")
+    options = models.JSONField(default=dict, blank=True, help_text="Import options such as skip_unknown or clear_existing")
+    total_lines = models.IntegerField(default=0)
+    processed_lines = models.IntegerField(default=0)
+    result = models.JSONField(null=True, blank=True, help_text="Result of the import, as returned by the import services")
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True, help_text="When the worker running the job last reported progress")
+    attempts = models.IntegerField(default=0, help_text="Number of times a worker claimed the job, only the latest claim may write to it")
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.id} ({self.status})"
@@ -0,0 +1,240 @@
+# services/bulk_load.py
+import time
+import logging
+from typing import Dict, List, Tuple
+from django.db import connection, transaction
+
+from collection.models import Card, OracleCard
+from collection.services.card_rows import ORACLE_FIELDS, PRINTING_FIELDS, ROW_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteBulkLoad:
+    """
+    Bulk-load card rows into SQLite through an unindexed staging table.
+    
+    Loading relaxes the connection's durability settings and switches the database
+    to WAL, then merges the staging table into the oracle card and card tables in a
+    single transaction with their secondary indexes rebuilt afterwards. The original journal
+    mode is recorded in a state table so it can be restored by recover() if a
+    previous load was killed before it could clean up.
+    """
+    STAGING_TABLE = 'collection_card_bulk_staging'
+    STATE_TABLE = 'collection_card_bulk_state'
+    CONNECTION_PRAGMAS = {
+        'synchronous': 'NORMAL',
+        'cache_size': -256 * 1024,  # 256MB, negative values are in KiB
+        'temp_store': 'MEMORY',
+    }
+    
+    def __init__(self):
+        self.card_table = Card._meta.db_table
+        self.oracle_table = OracleCard._meta.db_table
+        self.saved_pragmas = {}
+        self.batches = 0
+    
+    @staticmethod
+    def is_supported() -> bool:
+        """Whether the default database backend is SQLite."""
+        return connection.vendor == 'sqlite'
+    
+    @classmethod
+    def recover(cls) -> bool:
+        """
+        Clean up after a bulk load that did not finish.
+        
+        Returns:
+            bool: True if leftovers from an interrupted load were found
+        """
+        if not cls.is_supported():
+            return False
+        
+        with connection.cursor() as cursor:
+            if cls.STATE_TABLE not in connection.introspection.table_names(cursor):
+                return False
+            cls._teardown(cursor)
+        
+        logger.warning("Restored database settings after an interrupted bulk load")
+        return True
+    
+    @classmethod
+    def _teardown(cls, cursor):
+        """Restore the recorded journal mode and drop the load tables."""
+        cursor.execute(f'SELECT journal_mode FROM {cls.STATE_TABLE}')
+        row = cursor.fetchone()
+        if row:
+            cursor.execute(f'PRAGMA journal_mode={row[0]}')
+        cursor.execute(f'DROP TABLE IF EXISTS {cls.STAGING_TABLE}')
+        cursor.execute(f'DROP TABLE {cls.STATE_TABLE}')
+    
+    def start(self):
+        """Switch the database to bulk-load settings and create the staging table."""
+        self.recover()
+        
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            journal_mode = cursor.fetchone()[0]
+            
+            # Record the journal mode first so an interrupted load can be undone
+            cursor.execute(f'CREATE TABLE {self.STATE_TABLE} (journal_mode TEXT NOT NULL)')
+            cursor.execute(f'INSERT INTO {self.STATE_TABLE} (journal_mode) VALUES (%s)', [journal_mode])
+            # Rows keep the number of the batch they were staged with, so merge() counts them per batch
+            cursor.execute(f'CREATE TABLE {self.STAGING_TABLE} ({", ".join(ROW_COLUMNS)}, batch)')
+            cursor.execute('PRAGMA journal_mode=WAL')
+        
+        self.saved_pragmas = self.configure_connection()
+    
+    def configure_connection(self) -> Dict[str, str]:
+        """
+        Apply the relaxed per-connection settings to the current thread's connection.
+        
+        Returns:
+            Dict: The previous value of each setting
+        """
+        saved = {}
+        with connection.cursor() as cursor:
+            for pragma, value in self.CONNECTION_PRAGMAS.items():
+                cursor.execute(f'PRAGMA {pragma}')
+                saved[pragma] = cursor.fetchone()[0]
+                cursor.execute(f'PRAGMA {pragma}={value}')
+        return saved
+    
+    @transaction.atomic
+    def stage(self, rows: List[Tuple]):
+        """Append a batch of row tuples, ordered as ROW_COLUMNS, to the staging table."""
+        if not rows:
+            return
+        
+        self.batches += 1
+        placeholders = ', '.join(['%s'] * (len(ROW_COLUMNS) + 1))
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {self.STAGING_TABLE} ({", ".join(ROW_COLUMNS)}, batch) VALUES ({placeholders})',
+                [row + (self.batches,) for row in rows]
+            )
+    
+    def merge(self, timings: Dict[str, float] = None) -> Dict[str, int]:
+        """
+        Merge the staging table into the oracle card and card tables.
+        
+        Secondary indexes on both tables are dropped for the duration of the
+        merge and rebuilt in the same transaction, so an interrupted merge leaves
+        them untouched. Rows are counted as CardSeeder._write_rows counts them
+        batch by batch: duplicates within a batch are skipped, and a printing
+        repeated in a later batch is compared with its row from the batch before.
+        
+        Args:
+            timings: Optional dict that receives the duration of each merge phase
+            
+        Returns:
+            Dict: Counts of imported, updated, unchanged and duplicate rows
+        """
+        timings = timings if timings is not None else {}
+        staging = self.STAGING_TABLE
+        oracle_columns = ', '.join(['oracle_id'] + ORACLE_FIELDS)
+        oracle_updates = ', '.join(f'{field} = excluded.{field}' for field in ORACLE_FIELDS)
+        card_fields = PRINTING_FIELDS + ['content_hash']
+        card_updates = ', '.join(f'{field} = excluded.{field}' for field in ['oracle_card_id'] + card_fields)
+        
+        # Staged printings that are new or whose content hash changed
+        changed = (
+            f'NOT EXISTS (SELECT 1 FROM {self.card_table} c '
+            f'WHERE c.set_code = s.set_code AND c.collector_number = s.collector_number '
+            f'AND c.content_hash = s.content_hash)'
+        )
+        
+        with transaction.atomic(), connection.cursor() as cursor:
+            start = time.time()
+            
+            # Deferred index on the staging table, built once all rows are loaded
+            cursor.execute(f'CREATE INDEX {staging}_key ON {staging} (set_code, collector_number)')
+            
+            # The last row of each printing in each batch, with the hash of its row from the batch before
+            cursor.execute(
+                f'WITH last_rows AS ('
+                f'SELECT set_code, collector_number, content_hash, batch, ROW_NUMBER() OVER ('
+                f'PARTITION BY set_code, collector_number, batch ORDER BY rowid DESC) AS position '
+                f'FROM {staging}), '
+                f'batch_rows AS ('
+                f'SELECT set_code, collector_number, content_hash, LAG(content_hash) OVER ('
+                f'PARTITION BY set_code, collector_number ORDER BY batch) AS previous_hash '
+                f'FROM last_rows WHERE position = 1) '
+                f'SELECT '
+                f'COUNT(*), '
+                f'SUM(s.previous_hash IS NULL AND c.id IS NULL), '
+                f'SUM(CASE WHEN s.previous_hash IS NOT NULL THEN s.previous_hash != s.content_hash '
+                f'ELSE c.id IS NOT NULL AND c.content_hash IS NOT s.content_hash END) '
+                f'FROM batch_rows s LEFT JOIN {self.card_table} c '
+                f'ON c.set_code = s.set_code AND c.collector_number = s.collector_number'
+            )
+            counted, imported, updated = (count or 0 for count in cursor.fetchone())
+            unchanged = counted - imported - updated
+            cursor.execute(f'SELECT COUNT(*) FROM {staging}')
+            duplicates = cursor.fetchone()[0] - counted
+            
+            # Later duplicates of a printing replace earlier ones
+            cursor.execute(
+                f'DELETE FROM {staging} WHERE rowid NOT IN ('
+                f'SELECT MAX(rowid) FROM {staging} GROUP BY set_code, collector_number)'
+            )
+            timings['prepare'] = time.time() - start
+            
+            start = time.time()
+            indexes = self._drop_secondary_indexes(cursor, [self.card_table, self.oracle_table])
+            
+            cursor.execute(
+                f'INSERT INTO {self.oracle_table} ({oracle_columns}) '
+                f'SELECT {oracle_columns} FROM {staging} WHERE rowid IN ('
+                f'SELECT MAX(s.rowid) FROM {staging} s WHERE {changed} GROUP BY s.oracle_id) '
+                f'ON CONFLICT (oracle_id) DO UPDATE SET {oracle_updates}'
+            )
+            cursor.execute(
+                f'INSERT INTO {self.card_table} '
+                f'(set_code, collector_number, oracle_card_id, {", ".join(card_fields)}) '
+                f'SELECT s.set_code, s.collector_number, o.id, '
+                f'{", ".join("s." + field for field in card_fields)} '
+                f'FROM {staging} s JOIN {self.oracle_table} o ON o.oracle_id = s.oracle_id '
+                f'WHERE {changed} '
+                f'ON CONFLICT (set_code, collector_number) DO UPDATE SET {card_updates}'
+            )
+            timings['merge'] = time.time() - start
+            
+            start = time.time()
+            for sql in indexes:
+                cursor.execute(sql)
+            timings['index rebuild'] = time.time() - start
+        
+        return {
+            'imported': imported,
+            'updated': updated,
+            'unchanged': unchanged,
+            'duplicates': duplicates,
+        }
+    
+    @staticmethod
+    def _drop_secondary_indexes(cursor, tables: List[str]) -> List[str]:
+        """
+        Drop the non-unique indexes of the given tables.
+        
+        Returns:
+            List: The CREATE INDEX statements needed to rebuild them
+        """
+        placeholders = ', '.join(['%s'] * len(tables))
+        cursor.execute(
+            f"SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name IN ({placeholders}) "
+            f"AND sql IS NOT NULL AND sql NOT LIKE 'CREATE UNIQUE%%'",
+            tables
+        )
+        indexes = cursor.fetchall()
+        for name, _ in indexes:
+            cursor.execute(f'DROP INDEX {connection.ops.quote_name(name)}')
+        return [sql for _, sql in indexes]
+    
+    def finish(self):
+        """Drop the staging table and restore the original database settings."""
+        with connection.cursor() as cursor:
+            for pragma, value in self.saved_pragmas.items():
+                cursor.execute(f'PRAGMA {pragma}={value}')
+            self._teardown(cursor)
+        self.saved_pragmas = {}
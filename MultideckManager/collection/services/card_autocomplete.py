@@ -0,0 +1,171 @@
+# services/card_autocomplete.py
+import threading
+import time
+import logging
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Tuple
+
+from collection.models import Card, OracleCard, SeedRun
+from collection.services.card_rows import normalize_name
+
+logger = logging.getLogger(__name__)
+
+
+class CardAutocomplete:
+    """
+    Process-wide in-memory prefix index over card names for typeahead search.
+    
+    The index holds two sorted lists of normalized keys, searched with bisect:
+    full card names, and the rest of each name from the start of every later
+    word, so "bolt" finds "Lightning Bolt". Every printing of each card is
+    kept with the fields shown in search results, preferred printing first as
+    CardSearch.search_cards orders them, so a typeahead response can be served
+    from memory. Like the CardResolver index it is loaded on first
+    use and tagged with the latest SeedRun, but the seed run is checked at most
+    every VERSION_CHECK_INTERVAL seconds so that most lookups do not touch the
+    database at all.
+    """
+    VERSION_CHECK_INTERVAL = 5.0
+    
+    # Fields kept for each printing, as named on Card
+    DISPLAY_FIELDS = ('id', 'name', 'set_code', 'collector_number', 'mana_cost', 'type_line', 'rarity', 'scryfall_uri')
+    # Display fields that Card reads from its oracle card
+    ORACLE_FIELDS = ('mana_cost', 'type_line')
+    
+    _lock = threading.Lock()
+    _index = None
+    _version = None
+    _checked_at = 0.0
+    
+    @classmethod
+    def invalidate(cls):
+        """Drop the index so the next lookup rebuilds it."""
+        with cls._lock:
+            cls._index = None
+            cls._version = None
+            cls._checked_at = 0.0
+    
+    @staticmethod
+    def _current_version() -> Optional[int]:
+        """Get the id of the latest seed run, which identifies the card data."""
+        return SeedRun.objects.order_by('-id').values_list('id', flat=True).first()
+    
+    @classmethod
+    def _load(cls) -> Tuple[Tuple[List[str], List[int]], Tuple[List[str], List[int]], Dict[int, List[Dict[str, Any]]]]:
+        """
+        Get the name and word indexes, building them if they are missing or stale.
+        
+        Returns:
+            Tuple: (names, words, printings), names and words each a pair of sorted
+                keys and the oracle card id at the same position, and printings the
+                DISPLAY_FIELDS of each oracle card's printings, preferred first
+        """
+        now = time.monotonic()
+        if cls._index is not None and now - cls._checked_at < cls.VERSION_CHECK_INTERVAL:
+            return cls._index
+        
+        version = cls._current_version()
+        
+        with cls._lock:
+            if cls._index is None or cls._version != version:
+                names = []
+                words = []
+                printings = {}
+                for oracle_card_id, *fields, preferred_printing_id in Card.objects.filter(
+                    oracle_card__preferred_printing__isnull=False
+                ).order_by('oracle_card_id', 'id').values_list(
+                    'oracle_card_id',
+                    *(f'oracle_card__{field}' if field in cls.ORACLE_FIELDS else field for field in cls.DISPLAY_FIELDS),
+                    'oracle_card__preferred_printing_id',
+                ).iterator(chunk_size=10000):
+                    card = dict(zip(cls.DISPLAY_FIELDS, fields))
+                    card_printings = printings.setdefault(oracle_card_id, [])
+                    if card['id'] == preferred_printing_id:
+                        card_printings.insert(0, card)
+                    else:
+                        card_printings.append(card)
+                
+                for oracle_card_id, normalized_name in OracleCard.objects.filter(
+                    preferred_printing__isnull=False
+                ).values_list('id', 'normalized_name').iterator(chunk_size=10000):
+                    names.append((normalized_name, oracle_card_id))
+                    # Every later word starts a key running to the end of the name
+                    start = normalized_name.find(' ')
+                    while start != -1:
+                        words.append((normalized_name[start + 1:], oracle_card_id))
+                        start = normalized_name.find(' ', start + 1)
+                
+                names.sort()
+                words.sort()
+                cls._index = (
+                    ([key for key, _ in names], [card_id for _, card_id in names]),
+                    ([key for key, _ in words], [card_id for _, card_id in words]),
+                    printings,
+                )
+                cls._version = version
+                logger.info(f"Built card autocomplete index with {len(names)} names "
+                            f"and {len(words)} word starts")
+            
+            cls._checked_at = now
+            return cls._index
+    
+    @staticmethod
+    def _match(names: Tuple[List[str], List[int]], words: Tuple[List[str], List[int]],
+               prefix: str, limit: int) -> List[int]:
+        """Find the oracle card ids whose name, or a word of it, starts with a normalized prefix."""
+        oracle_ids = []
+        seen = set()
+        for keys, card_ids in (names, words):
+            position = bisect_left(keys, prefix)
+            while position < len(keys) and len(oracle_ids) < limit and keys[position].startswith(prefix):
+                card_id = card_ids[position]
+                if card_id not in seen:
+                    seen.add(card_id)
+                    oracle_ids.append(card_id)
+                position += 1
+        return oracle_ids
+    
+    @classmethod
+    def complete(cls, query: str, limit: int = 20) -> List[int]:
+        """
+        Find the cards whose name, or a word of it, starts with the search text.
+        
+        Args:
+            query (str): Search text as entered
+            limit (int): Largest number of ids returned
+            
+        Returns:
+            List: Oracle card ids, whole-name matches first and each group in name order
+        """
+        prefix = normalize_name(query)
+        if not prefix:
+            return []
+        
+        names, words, _ = cls._load()
+        return cls._match(names, words, prefix, limit)
+    
+    @classmethod
+    def complete_cards(cls, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Find the cards whose name, or a word of it, starts with the search text, without a query.
+        
+        Args:
+            query (str): Search text as entered
+            limit (int): Largest number of cards returned
+            
+        Returns:
+            List: DISPLAY_FIELDS of the cards' printings, in the order of complete()
+                and each card's preferred printing first, as CardSearch.search_cards
+                returns them. The dicts are shared by all lookups and must not be changed
+        """
+        prefix = normalize_name(query)
+        if not prefix:
+            return []
+        
+        names, words, printings = cls._load()
+        cards = []
+        for oracle_id in cls._match(names, words, prefix, limit):
+            cards.extend(printings[oracle_id][:limit - len(cards)])
+            if len(cards) >= limit:
+                break
+        return cards
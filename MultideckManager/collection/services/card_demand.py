@@ -0,0 +1,137 @@
+# services/card_demand.py
+from typing import Iterable, List, Optional, Tuple
+from django.db import transaction
+from django.db.models import Sum
+
+from collection.models import CardDemand, Decklist, DecklistCard
+
+
+class CardDemandTracker:
+    """
+    Service class maintaining the CardDemand table.
+    
+    Whenever decklist cards or a decklist's active state change, the demand of
+    the affected cards is recomputed from the active decklists, so the table
+    cannot drift whatever the change was. rebuild() recomputes it entirely and
+    check() reports rows that differ from a fresh computation.
+    """
+    
+    @staticmethod
+    def _expected(collection_ids: Optional[Iterable[int]] = None,
+                  card_ids: Optional[Iterable[int]] = None) -> dict:
+        """
+        Sum the active decklists' demand per collection and card.
+        
+        Returns:
+            Dict: Quantity keyed by (collection id, card id), for cards with any demand
+        """
+        decklist_cards = DecklistCard.objects.filter(decklist__active=True)
+        if collection_ids is not None:
+            decklist_cards = decklist_cards.filter(decklist__collection_id__in=collection_ids)
+        if card_ids is not None:
+            decklist_cards = decklist_cards.filter(card_id__in=card_ids)
+        
+        return {
+            (collection_id, card_id): quantity
+            for collection_id, card_id, quantity in decklist_cards.values(
+                'decklist__collection_id', 'card_id'
+            ).annotate(total=Sum('quantity')).order_by().values_list('decklist__collection_id', 'card_id', 'total')
+        }
+    
+    @staticmethod
+    @transaction.atomic
+    def refresh(collection_id: int, card_ids: Iterable[int]):
+        """
+        Recompute the demand of some cards in a collection.
+        
+        Args:
+            collection_id (int): Id of the collection
+            card_ids: Ids of the cards whose decklist quantities changed
+        """
+        card_ids = set(card_ids)
+        if not card_ids:
+            return
+        
+        expected = CardDemandTracker._expected([collection_id], card_ids)
+        
+        CardDemand.objects.filter(collection_id=collection_id, card_id__in=card_ids - {
+            card_id for _, card_id in expected
+        }).delete()
+        CardDemand.objects.bulk_create(
+            [
+                CardDemand(collection_id=collection_id, card_id=card_id, quantity=quantity)
+                for (_, card_id), quantity in expected.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['collection', 'card'],
+            update_fields=['quantity'],
+        )
+    
+    @staticmethod
+    def refresh_decklist(decklist: Decklist, card_ids: Optional[Iterable[int]] = None):
+        """
+        Recompute the demand of a decklist's cards, after its cards or active state changed.
+        
+        Args:
+            decklist: Decklist model instance
+            card_ids: Ids of the cards that changed, all cards of the decklist if not given
+        """
+        if card_ids is None:
+            card_ids = DecklistCard.objects.filter(decklist=decklist).values_list('card_id', flat=True)
+        CardDemandTracker.refresh(decklist.collection_id, card_ids)
+    
+    @staticmethod
+    @transaction.atomic
+    def rebuild(collection_ids: Optional[Iterable[int]] = None) -> int:
+        """
+        Recompute the whole table, or the rows of some collections.
+        
+        Args:
+            collection_ids: Ids of the collections to rebuild, all of them if not given
+            
+        Returns:
+            int: Number of rows written
+        """
+        rows = CardDemand.objects.all()
+        if collection_ids is not None:
+            collection_ids = list(collection_ids)
+            rows = rows.filter(collection_id__in=collection_ids)
+        
+        rows.delete()
+        created = CardDemand.objects.bulk_create(
+            [
+                CardDemand(collection_id=collection_id, card_id=card_id, quantity=quantity)
+                for (collection_id, card_id), quantity in CardDemandTracker._expected(collection_ids).items()
+            ],
+            batch_size=1000,
+        )
+        return len(created)
+    
+    @staticmethod
+    def check(collection_ids: Optional[Iterable[int]] = None) -> List[Tuple[int, int, int, int]]:
+        """
+        Compare the table with the demand computed from the decklists.
+        
+        Args:
+            collection_ids: Ids of the collections to check, all of them if not given
+            
+        Returns:
+            List: (collection id, card id, stored quantity, expected quantity) for
+                every row that is wrong or missing, with 0 standing for no row
+        """
+        rows = CardDemand.objects.all()
+        if collection_ids is not None:
+            collection_ids = list(collection_ids)
+            rows = rows.filter(collection_id__in=collection_ids)
+        
+        stored = {
+            (collection_id, card_id): quantity
+            for collection_id, card_id, quantity in rows.values_list('collection_id', 'card_id', 'quantity')
+        }
+        expected = CardDemandTracker._expected(collection_ids)
+        
+        return sorted(
+            key + (stored.get(key, 0), expected.get(key, 0))
+            for key in stored.keys() | expected.keys()
+            if stored.get(key, 0) != expected.get(key, 0)
+        )
@@ -0,0 +1,231 @@
+# services/card_list_parser.py
+import codecs
+import csv
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Section headers such as "Sideboard", "SIDEBOARD:", "// Sideboard" or "Deck (60)"
+_SECTION_HEADER = re.compile(
+    r'^\W*(mainboard|main|deck|commander|sideboard|side|companion)\W*(?:\d+\W*)?$',
+    re.IGNORECASE
+)
+
+_SECTIONS = {
+    'mainboard': 'mainboard',
+    'main': 'mainboard',
+    'deck': 'mainboard',
+    'commander': 'mainboard',
+    'sideboard': 'sideboard',
+    'side': 'sideboard',
+    'companion': 'sideboard',
+}
+
+# A single pattern covers the supported line formats:
+#   MTGO/plain:  "4 Lightning Bolt", "4x Lightning Bolt", "Lightning Bolt"
+#   Quantity after the name:  "Lightning Bolt (4)"
+#   Arena:  "4 Lightning Bolt (M10) 146"
+#   Moxfield:  "4 Lightning Bolt (2XM) 141 *F*"
+#   MTGO .dec sideboard lines:  "SB: 2 Duress"
+_CARD_LINE = re.compile(r"""
+    ^(?P<sideboard>SB:\s*)?
+    (?:(?P<quantity>\d+)[xX]?\s+)?
+    (?P<name>.+?)
+    (?:\s+\((?P<set_code>[A-Za-z0-9]+)\)(?:\s+(?P<collector_number>[^\s*]+))?)?
+    (?:\s+\*[A-Za-z]+\*)*
+    $""", re.VERBOSE)
+
+# Comment lines, as long as they are not section headers
+_COMMENT = re.compile(r'^(#|//)')
+
+
+class CardListParser:
+    """Single-pass parser for pasted card lists, deck exports and CSV files."""
+    
+    @staticmethod
+    def parse_line(line: str) -> Optional[Dict[str, Any]]:
+        """
+        Parse a single card line.
+        
+        Args:
+            line (str): Stripped, non-empty line that is not a section header
+            
+        Returns:
+            Dict: Card with name and quantity, plus set_code and collector_number
+                when the line names a printing and is_sideboard for "SB:" lines,
+                or None if the line is not a card
+        """
+        match = _CARD_LINE.match(line)
+        if not match:
+            return None
+        
+        quantity, name, set_code, collector_number = match.group('quantity', 'name', 'set_code', 'collector_number')
+        
+        if quantity is None and set_code and set_code.isdigit() and collector_number is None:
+            # "Lightning Bolt (4)" gives the quantity in parentheses
+            quantity, set_code = set_code, None
+        
+        card_data = {'name': name.strip(), 'quantity': int(quantity) if quantity else 1}
+        if set_code and collector_number:
+            card_data['set_code'] = set_code
+            card_data['collector_number'] = collector_number
+        if match.group('sideboard'):
+            card_data['is_sideboard'] = True
+        return card_data
+    
+    @staticmethod
+    def iter_lines(lines: Iterable[str]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Parse lines of card text one at a time.
+        
+        Args:
+            lines: Lines of text, with or without line endings
+            
+        Yields:
+            Tuple: (section, card) where section is 'mainboard' or 'sideboard'
+        """
+        current_section = 'mainboard'
+        
+        header_match = _SECTION_HEADER.match
+        comment_match = _COMMENT.match
+        parse_line = CardListParser.parse_line
+        
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            
+            header = header_match(line)
+            if header:
+                current_section = _SECTIONS[header.group(1).lower()]
+                continue
+            
+            if comment_match(line):
+                continue
+            
+            card_data = parse_line(line)
+            if card_data is None:
+                continue
+            
+            yield 'sideboard' if card_data.pop('is_sideboard', False) else current_section, card_data
+    
+    @staticmethod
+    def parse_lines(lines: Iterable[str], merge: bool = True) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Parse lines of card text, separating mainboard and sideboard.
+        
+        Args:
+            lines: Lines of text, with or without line endings
+            merge (bool): Whether to add up repeated cards within a section
+            
+        Returns:
+            Dict: Dictionary with 'mainboard' and 'sideboard' lists of cards
+        """
+        return CardListParser._collect(CardListParser.iter_lines(lines), merge)
+    
+    @staticmethod
+    def parse_text(text: str, merge: bool = True) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Parse pasted card text, separating mainboard and sideboard.
+        
+        Args:
+            text (str): Text containing card data
+            merge (bool): Whether to add up repeated cards within a section
+            
+        Returns:
+            Dict: Dictionary with 'mainboard' and 'sideboard' lists of cards
+        """
+        return CardListParser.parse_lines(text.splitlines(), merge)
+    
+    @staticmethod
+    def iter_csv(lines: Iterable[str]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Parse CSV rows of quantity, name and optionally set code and collector number.
+        
+        Rows whose first cell is a section header switch sections, and rows
+        without a numeric quantity are read as a card name with quantity 1.
+        
+        Args:
+            lines: Lines of CSV text
+            
+        Yields:
+            Tuple: (section, card) where section is 'mainboard' or 'sideboard'
+        """
+        current_section = 'mainboard'
+        
+        for row in csv.reader(lines):
+            if not row:
+                continue
+            
+            first_cell = row[0].strip()
+            header = _SECTION_HEADER.match(first_cell)
+            if header and not any(cell.strip() for cell in row[1:]):
+                current_section = _SECTIONS[header.group(1).lower()]
+                continue
+            
+            try:
+                card_data = {'name': row[1].strip(), 'quantity': int(first_cell)}
+                # Exported collections also carry the set code and collector number
+                if len(row) >= 4 and row[2].strip() and row[3].strip():
+                    card_data['set_code'] = row[2].strip()
+                    card_data['collector_number'] = row[3].strip()
+            except (ValueError, IndexError):
+                # If first column is not a number, or the only one, assume it's the name with quantity 1
+                card_data = {'name': first_cell, 'quantity': 1}
+            
+            yield current_section, card_data
+    
+    @staticmethod
+    def parse_csv(lines: Iterable[str], merge: bool = True) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Parse CSV card rows, separating mainboard and sideboard.
+        
+        Args:
+            lines: Lines of CSV text
+            merge (bool): Whether to add up repeated cards within a section
+            
+        Returns:
+            Dict: Dictionary with 'mainboard' and 'sideboard' lists of cards
+        """
+        return CardListParser._collect(CardListParser.iter_csv(lines), merge)
+    
+    @staticmethod
+    def read_file_lines(file, encoding: str = 'utf-8-sig') -> Iterator[str]:
+        """
+        Decode an uploaded file line by line.
+        
+        Django's File objects read uploads chunk by chunk when iterated, so only
+        the current chunk is held in memory however large the file is.
+        
+        Args:
+            file: Uploaded file, or any binary file object
+            encoding (str): Text encoding, the default also strips a UTF-8 byte order mark
+            
+        Yields:
+            str: Decoded lines, including their line endings
+        """
+        return codecs.iterdecode(file, encoding)
+    
+    @staticmethod
+    def _collect(cards: Iterable[Tuple[str, Dict[str, Any]]], merge: bool) -> Dict[str, List[Dict[str, Any]]]:
+        """Group parsed cards by section, merging repeated cards with a dict keyed by name and printing."""
+        sections = {'mainboard': {}, 'sideboard': {}}
+        if not merge:
+            sections = {'mainboard': [], 'sideboard': []}
+            for section, card_data in cards:
+                sections[section].append(card_data)
+            return sections
+        
+        for section, card_data in cards:
+            # Lines naming different printings of a card stay apart
+            key = (
+                card_data['name'].lower(),
+                card_data.get('set_code', '').lower(),
+                card_data.get('collector_number', ''),
+            )
+            existing = sections[section].get(key)
+            if existing:
+                existing['quantity'] += card_data['quantity']
+            else:
+                sections[section][key] = card_data
+        
+        return {section: list(merged.values()) for section, merged in sections.items()}
@@ -0,0 +1,215 @@
+# services/card_query.py
+import re
+from typing import List, Optional, Tuple
+from django.db.models import Q, QuerySet
+from django.db.models.expressions import RawSQL
+
+from collection.models import Card, Collection, CollectionCard, OracleCard
+from collection.services.card_rows import COLOR_BITS, normalize_name
+from collection.services.card_search import CardSearch
+
+# A term is an optional "-", then either key, operator and value, or a bare word or quoted phrase
+_TERM = re.compile(r"""
+    (?P<negate>-)?
+    (?:
+        (?P<key>[A-Za-z]+)(?P<op><=|>=|!=|:|=|<|>)(?P<value>"[^"]*"|\S+)
+        |
+        (?P<text>"[^"]*"|\S+)
+    )""", re.VERBOSE)
+
+_WORD = re.compile(r'\w+')
+
+_KEYS = {
+    't': 'type', 'type': 'type',
+    'o': 'oracle', 'oracle': 'oracle',
+    'c': 'color', 'color': 'color',
+    'cmc': 'cmc', 'mv': 'cmc',
+    's': 'set', 'set': 'set', 'e': 'set',
+    'is': 'is',
+}
+
+# FTS5 columns searched by each text key, bare words search the name
+_FTS_COLUMNS = {'type': 'type_line', 'oracle': 'oracle_text', 'name': 'normalized_name'}
+
+_COLOR_NAMES = {
+    'white': 'w', 'blue': 'u', 'black': 'b', 'red': 'r', 'green': 'g', 'colorless': 'c',
+}
+
+_CMC_LOOKUPS = {':': 'exact', '=': 'exact', '<': 'lt', '<=': 'lte', '>': 'gt', '>=': 'gte'}
+
+_ALL_COLOR_MASKS = range(2 ** len(COLOR_BITS))
+
+
+class CardQueryError(ValueError):
+    """Raised for search text that is not a valid card query."""
+
+
+class CardQuery:
+    """
+    Parser and compiler for Scryfall-style card searches.
+    
+    Supported terms, all combined with AND and each negated by a leading "-":
+    
+        t:creature          type line contains the words (also type:)
+        o:"draw a card"     oracle text contains the phrase (also oracle:)
+        c:gu, c=gu, c<=gu   colors include, equal, or are within the colors (also color:)
+        cmc<=3              mana value comparison with : = < <= > >= != (also mv)
+        s:m10               printing is from the set (also set:, e:)
+        is:owned            printing is in the collection searched from
+        bolt, "fire ice"    name contains the words
+        
+    Text terms compile to a single FTS5 match and the others to filters on
+    indexed columns, so queries are answered without scanning the card tables.
+    """
+    
+    @staticmethod
+    def is_query(text: str) -> bool:
+        """Whether search text uses query syntax rather than being a plain name."""
+        return any(match.group('key') or match.group('negate') or (match.group('text') or '').startswith('"')
+                   for match in _TERM.finditer(text))
+    
+    @staticmethod
+    def parse(text: str) -> List[Tuple[bool, str, str, str]]:
+        """
+        Split search text into terms.
+        
+        Args:
+            text (str): Search text as entered
+            
+        Returns:
+            List: (negated, key, operator, value) for each term, where key is the
+                canonical key and bare words have the key 'name'
+                
+        Raises:
+            CardQueryError: If a term uses an unknown key
+        """
+        terms = []
+        for match in _TERM.finditer(text):
+            negated = bool(match.group('negate'))
+            if match.group('key'):
+                key = _KEYS.get(match.group('key').lower())
+                if key is None:
+                    raise CardQueryError(f"Unknown search key: {match.group('key')}")
+                op, value = match.group('op'), match.group('value')
+            else:
+                key, op, value = 'name', ':', match.group('text')
+            terms.append((negated, key, op, value.strip('"')))
+        return terms
+    
+    @staticmethod
+    def compile(text: str, collection: Optional[Collection] = None) -> QuerySet:
+        """
+        Compile search text into a queryset of matching printings.
+        
+        Args:
+            text (str): Search text as entered
+            collection: Collection searched from, needed for is:owned
+            
+        Returns:
+            QuerySet: Matching Card rows ordered by name
+            
+        Raises:
+            CardQueryError: If the text is not a valid query
+        """
+        fts_terms = []
+        oracle_filter = Q()
+        card_filter = Q()
+        
+        for negated, key, op, value in CardQuery.parse(text):
+            if key in _FTS_COLUMNS:
+                expression = CardQuery._fts_term(key, op, value)
+                if expression is None:
+                    continue
+                if negated:
+                    # FTS5 has no unary NOT, so excluded text is matched on its own
+                    oracle_filter &= ~Q(id__in=CardQuery._fts_match(expression))
+                else:
+                    fts_terms.append(expression)
+            elif key in ('color', 'cmc'):
+                condition = CardQuery._color_filter(op, value) if key == 'color' else CardQuery._cmc_filter(op, value)
+                oracle_filter &= ~condition if negated else condition
+            else:
+                condition = CardQuery._card_filter(key, op, value, collection)
+                card_filter &= ~condition if negated else condition
+        
+        if fts_terms:
+            oracle_filter &= Q(id__in=CardQuery._fts_match(' AND '.join(fts_terms)))
+        
+        cards = Card.objects.filter(card_filter)
+        if oracle_filter:
+            cards = cards.filter(oracle_card__in=OracleCard.objects.filter(oracle_filter).values('id'))
+        return cards.select_related('oracle_card').order_by('name')
+    
+    @staticmethod
+    def _fts_term(key: str, op: str, value: str) -> Optional[str]:
+        """Build the FTS5 expression matching a text term in its column."""
+        if op != ':':
+            raise CardQueryError(f"Use ':' to search text, not '{op}'")
+        
+        words = _WORD.findall(normalize_name(value))
+        if not words:
+            return None
+        
+        column = _FTS_COLUMNS[key]
+        if key == 'name':
+            # Names match as you type, word by word
+            return ' AND '.join(f'{column} : "{word}"*' for word in words)
+        return f'{column} : "{" ".join(words)}"'
+    
+    @staticmethod
+    def _fts_match(expression: str) -> RawSQL:
+        """Subquery of the oracle card ids matching an FTS5 expression."""
+        if not CardSearch.is_available():
+            raise CardQueryError("Text searches need the full-text index, which this database does not have")
+        table = CardSearch.FTS_TABLE
+        return RawSQL(f'SELECT rowid FROM {table} WHERE {table} MATCH %s', [expression])
+    
+    @staticmethod
+    def _color_filter(op: str, value: str) -> Q:
+        """Filter on the colors bitmask, listing the matching masks so the index is used."""
+        letters = _COLOR_NAMES.get(value.lower(), value.lower())
+        if any(letter.upper() not in COLOR_BITS and letter != 'c' for letter in letters):
+            raise CardQueryError(f"Unknown colors: {value}")
+        
+        mask = sum(COLOR_BITS[letter.upper()] for letter in set(letters) if letter != 'c')
+        if mask == 0:
+            # Colorless cards have no colors, whichever way they are compared
+            masks = [0]
+        elif op in (':', '>='):
+            masks = [m for m in _ALL_COLOR_MASKS if m & mask == mask]
+        elif op == '=':
+            masks = [mask]
+        elif op == '<=':
+            masks = [m for m in _ALL_COLOR_MASKS if m & ~mask == 0]
+        else:
+            raise CardQueryError(f"Colors can be compared with ':', '=', '>=' or '<=', not '{op}'")
+        
+        return Q(colors__in=masks)
+    
+    @staticmethod
+    def _cmc_filter(op: str, value: str) -> Q:
+        """Compare the mana value."""
+        try:
+            number = float(value)
+        except ValueError:
+            raise CardQueryError(f"Mana value must be a number: {value}")
+        
+        if op == '!=':
+            return ~Q(cmc=number)
+        return Q(**{f'cmc__{_CMC_LOOKUPS[op]}': number})
+    
+    @staticmethod
+    def _card_filter(key: str, op: str, value: str, collection: Optional[Collection]) -> Q:
+        """Filter on the printing itself."""
+        if op != ':':
+            raise CardQueryError(f"Use ':' with {key}, not '{op}'")
+        
+        if key == 'set':
+            return Q(set_code=value.lower())
+        
+        if value.lower() != 'owned':
+            raise CardQueryError(f"Unknown filter: is:{value}")
+        if collection is None:
+            raise CardQueryError("is:owned needs a collection")
+        owned = CollectionCard.objects.filter(collection=collection).exclude(quantity=0)
+        return Q(id__in=owned.values('card_id'))
@@ -0,0 +1,156 @@
+# services/card_resolver.py
+import threading
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from collection.models import Card, OracleCard, SeedRun
+from collection.services.card_rows import face_name, normalize_name
+
+logger = logging.getLogger(__name__)
+
+
+class CardResolver:
+    """
+    Process-wide in-memory index from card names and printings to card ids.
+    
+    The index is loaded on first use and shared by every importer in the process.
+    It is tagged with the latest SeedRun, so a seed run recorded by any process
+    makes the next lookup reload it, and the seeder invalidates it directly when
+    it runs in the same process.
+    """
+    _lock = threading.Lock()
+    _names = None
+    _printings = None
+    _version = None
+    
+    @classmethod
+    def invalidate(cls):
+        """Drop the index so the next lookup reloads it."""
+        with cls._lock:
+            cls._names = None
+            cls._printings = None
+            cls._version = None
+    
+    @staticmethod
+    def _current_version() -> Optional[int]:
+        """Get the id of the latest seed run, which identifies the card data."""
+        return SeedRun.objects.order_by('-id').values_list('id', flat=True).first()
+    
+    @classmethod
+    def _load(cls) -> Tuple[Dict[str, int], Dict[Tuple[str, str], int]]:
+        """
+        Get the name and printing indexes, loading them if they are missing or stale.
+        
+        Returns:
+            Tuple: (names, printings) mapping normalized names and (set code,
+                collector number) pairs to card ids
+        """
+        version = cls._current_version()
+        
+        with cls._lock:
+            if cls._names is None or cls._version != version:
+                names = {}
+                # Front face aliases are added first so full names take precedence
+                oracle_cards = list(OracleCard.objects.filter(preferred_printing__isnull=False).values_list(
+                    'normalized_name', 'normalized_face_name', 'preferred_printing_id'
+                ))
+                for _, face_name, card_id in oracle_cards:
+                    names.setdefault(face_name, card_id)
+                for normalized_name, _, card_id in oracle_cards:
+                    names[normalized_name] = card_id
+                
+                printings = {
+                    (set_code.lower(), collector_number): card_id
+                    for card_id, set_code, collector_number in Card.objects.values_list(
+                        'id', 'set_code', 'collector_number'
+                    ).iterator(chunk_size=10000)
+                }
+                
+                cls._names, cls._printings, cls._version = names, printings, version
+                logger.info(f"Loaded card resolver index with {len(names)} names "
+                            f"and {len(printings)} printings")
+            
+            return cls._names, cls._printings
+    
+    @classmethod
+    def resolve_names(cls, names: Iterable[str]) -> Dict[str, int]:
+        """
+        Resolve card names to the ids of their preferred printings.
+        
+        Args:
+            names: Card names as entered, in any case or accent form
+            
+        Returns:
+            Dict: Card id for each name that was found, keyed by the name as given
+        """
+        index, _ = cls._load()
+        resolved = {}
+        for name in names:
+            card_id = index.get(normalize_name(name))
+            if card_id is not None:
+                resolved[name] = card_id
+        return resolved
+    
+    @classmethod
+    def resolve_printings(cls, printings: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], int]:
+        """
+        Resolve (set code, collector number) pairs to card ids.
+        
+        Args:
+            printings: Pairs of set code, in any case, and collector number
+            
+        Returns:
+            Dict: Card id for each printing that was found, keyed by the pair as given
+        """
+        _, index = cls._load()
+        resolved = {}
+        for set_code, collector_number in printings:
+            card_id = index.get((set_code.lower(), collector_number))
+            if card_id is not None:
+                resolved[(set_code, collector_number)] = card_id
+        return resolved
+    
+    @classmethod
+    def get_cards(cls, card_infos: List[Dict[str, Any]],
+                  fetched: Optional[Dict[int, Card]] = None) -> List[Optional[Card]]:
+        """
+        Resolve imported card lines and fetch the matching cards with a single query.
+        
+        Lines that carry a set code and collector number resolve to that exact
+        printing, as long as it is a printing of the named card. The others
+        resolve by name to the preferred printing.
+        
+        Args:
+            card_infos: Card lines with a name and optionally set_code and collector_number
+            fetched: Cards fetched by earlier calls, keyed by id, which are reused and
+                extended in place so that batches of one import fetch each card once
+            
+        Returns:
+            List: The matching card, or None, for each line in order
+        """
+        names, printings = cls._load()
+        candidates = []
+        for card_info in card_infos:
+            key = normalize_name(card_info['name'])
+            printing_id = None
+            if card_info.get('set_code') and card_info.get('collector_number'):
+                printing_id = printings.get((card_info['set_code'].lower(), card_info['collector_number']))
+            candidates.append((key, printing_id, names.get(key)))
+        
+        # Both candidates of every line are fetched together
+        cards = fetched if fetched is not None else {}
+        missing = {
+            card_id for _, printing_id, name_id in candidates for card_id in (printing_id, name_id)
+            if card_id is not None and card_id not in cards
+        }
+        if missing:
+            cards.update(Card.objects.in_bulk(missing))
+        
+        resolved = []
+        for key, printing_id, name_id in candidates:
+            printing = cards.get(printing_id)
+            if printing and key in (normalize_name(printing.name), normalize_name(face_name(printing.name))):
+                resolved.append(printing)
+            else:
+                resolved.append(cards.get(name_id))
+        return resolved
@@ -0,0 +1,205 @@
+# services/card_rows.py
+"""
+Normalization of Scryfall card objects into plain row tuples.
+
+This module deliberately avoids importing Django so that it can be loaded by
+the seeder's worker processes without configuring settings.
+"""
+import re
+import json
+import uuid
+import hashlib
+import logging
+import unicodedata
+from typing import Any, Dict, List, Optional, Tuple
+
+# Placeholder oracle ids for cards Scryfall gives none are derived from the card name.
+# Must match LEGACY_ORACLE_NAMESPACE in migration 0005.
+LEGACY_ORACLE_NAMESPACE = uuid.UUID('799df14b-e496-4135-9688-46de52d8314d')
+
+# Gameplay fields stored once per OracleCard
+ORACLE_FIELDS = [
+    'name', 'mana_cost', 'cmc', 'type_line', 'oracle_text',
+    'power', 'toughness', 'loyalty', 'normalized_name', 'normalized_face_name', 'colors',
+]
+
+# Printing-specific fields stored on each Card
+PRINTING_FIELDS = ['name', 'rarity', 'scryfall_uri', 'released_at']
+
+# Seeded fields covered by the content hash, in row order
+HASHED_FIELDS = ['oracle_id'] + ORACLE_FIELDS + ['rarity', 'scryfall_uri', 'released_at']
+
+# Column order of the tuples produced by normalize_card
+ROW_COLUMNS = ['set_code', 'collector_number'] + HASHED_FIELDS + ['content_hash']
+
+# Bit of each color in OracleCard.colors
+COLOR_BITS = {'W': 1, 'U': 2, 'B': 4, 'R': 8, 'G': 16}
+
+_MANA_SYMBOL = re.compile(r'\{([^}]*)\}')
+
+# Letters that survive accent stripping but are commonly typed out, plus typographic apostrophes
+_NAME_FOLDS = str.maketrans({'æ': 'ae', 'œ': 'oe', '\u2018': "'", '\u2019': "'"})
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_name(name: str) -> str:
+    """
+    Normalize a card name for case- and accent-insensitive lookups.
+    
+    "Æther Vial", "aether vial" and "AETHER  VIAL" all normalize to "aether vial".
+    """
+    decomposed = unicodedata.normalize('NFKD', name.casefold())
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(stripped.translate(_NAME_FOLDS).split())
+
+
+def face_name(name: str) -> str:
+    """Get the front face of a split, adventure or double-faced card name like "Fire // Ice"."""
+    return name.split(' // ')[0]
+
+
+def color_mask(colors) -> int:
+    """Combine color letters such as ['G', 'U'] into a bitmask of COLOR_BITS."""
+    mask = 0
+    for color in colors:
+        mask |= COLOR_BITS.get(color.upper(), 0)
+    return mask
+
+
+def mana_cost_colors(mana_cost: str) -> int:
+    """
+    Get the colors of a mana cost as a bitmask.
+    
+    Hybrid and Phyrexian symbols such as {G/U} and {G/P} count for each of their colors.
+    """
+    return color_mask(''.join(_MANA_SYMBOL.findall(mana_cost or '')).replace('/P', ''))
+
+
+def card_colors(card_data: Dict[str, Any]) -> int:
+    """
+    Get the colors of a Scryfall card object as a bitmask.
+    
+    Double-faced cards carry their colors on each face, and objects without
+    colors fall back to the symbols of their mana costs.
+    """
+    if card_data.get('colors') is not None:
+        return color_mask(card_data['colors'])
+    
+    faces = card_data.get('card_faces') or []
+    if any(face.get('colors') is not None for face in faces):
+        return color_mask(color for face in faces for color in face.get('colors') or [])
+    
+    mana_costs = [card_data.get('mana_cost')] + [face.get('mana_cost') for face in faces]
+    return mana_cost_colors(''.join(cost for cost in mana_costs if cost))
+
+
+def get_oracle_id(card_data: Dict[str, Any]) -> str:
+    """
+    Get the oracle_id of a Scryfall card object.
+    
+    Reversible cards only carry oracle_id on their faces, and a few objects have
+    none at all, in which case a stable id is derived from the card name.
+    """
+    if card_data.get('oracle_id'):
+        return card_data['oracle_id']
+    
+    for face in card_data.get('card_faces') or []:
+        if face.get('oracle_id'):
+            return face['oracle_id']
+    
+    return str(uuid.uuid5(LEGACY_ORACLE_NAMESPACE, card_data.get('name', '')))
+
+
+def normalize_card(card_data: Dict[str, Any]) -> Optional[Tuple]:
+    """
+    Convert a Scryfall card object into a row tuple ordered as ROW_COLUMNS.
+    
+    Args:
+        card_data: Card object from a Scryfall bulk data file
+        
+    Returns:
+        Tuple: Row values, or None if the object should be skipped
+    """
+    # Skip cards without collector numbers or set codes
+    if not card_data.get('collector_number') or not card_data.get('set'):
+        return None
+    
+    # Skip non-card objects like tokens, emblems, etc.
+    if card_data.get('object') != 'card':
+        return None
+    
+    name = card_data.get('name', '')
+    values = (
+        get_oracle_id(card_data),
+        name,
+        card_data.get('mana_cost', ''),
+        float(card_data.get('cmc', 0)),
+        card_data.get('type_line', ''),
+        card_data.get('oracle_text', ''),
+        card_data.get('power', ''),
+        card_data.get('toughness', ''),
+        card_data.get('loyalty', ''),
+        normalize_name(name),
+        normalize_name(face_name(name)),
+        card_colors(card_data),
+        card_data.get('rarity', ''),
+        card_data.get('scryfall_uri', ''),
+        card_data.get('released_at') or None,
+    )
+    content_hash = hashlib.sha1(repr(values).encode('utf-8')).hexdigest()
+    
+    return (card_data.get('set'), card_data.get('collector_number')) + values + (content_hash,)
+
+
+def normalize_cards(batch: List[Dict[str, Any]]) -> Tuple[List[Tuple], int]:
+    """
+    Normalize a batch of Scryfall card objects.
+    
+    Args:
+        batch: List of card objects
+        
+    Returns:
+        Tuple: (rows, skipped) where rows are tuples ordered as ROW_COLUMNS
+    """
+    rows = []
+    skipped = 0
+    
+    for card_data in batch:
+        try:
+            row = normalize_card(card_data)
+        except Exception as e:
+            logger.error(f"Error processing card: {card_data.get('name', 'Unknown')} - {e}")
+            row = None
+        
+        if row is None:
+            skipped += 1
+        else:
+            rows.append(row)
+    
+    return rows, skipped
+
+
+def parse_card_lines(lines: List[str]) -> Tuple[List[Tuple], int, int]:
+    """
+    Decode and normalize a block of lines from a one-card-per-line bulk data file.
+    
+    Scryfall writes its bulk files as a JSON array with one card object per line,
+    so each line can be decoded on its own once the array brackets and trailing
+    commas are stripped.
+    
+    Args:
+        lines: Raw lines read from the bulk data file
+        
+    Returns:
+        Tuple: (rows, skipped, total) where total is the number of card objects read
+    """
+    batch = []
+    for line in lines:
+        text = line.strip().rstrip(',')
+        if text in ('', '[', ']'):
+            continue
+        batch.append(json.loads(text))
+    
+    rows, skipped = normalize_cards(batch)
+    return rows, skipped, len(batch)
@@ -0,0 +1,174 @@
+# services/card_search.py
+import re
+from typing import Any, Dict, List, Optional
+from django.db import connection
+from django.db.models import Case, F, QuerySet, When
+from django.db.models.expressions import RawSQL
+
+from collection.models import Card, OracleCard
+from collection.services.card_autocomplete import CardAutocomplete
+from collection.services.card_rows import normalize_name
+
+_WORD = re.compile(r'\w+')
+
+
+class CardSearch:
+    """
+    Full-text card search backed by an SQLite FTS5 index over the oracle cards.
+    
+    The index covers the normalized name, type line and oracle text of every
+    oracle card and is rebuilt by the seeder after each run that changes cards.
+    On other database backends, or SQLite builds without FTS5, searches fall back
+    to substring matches on the normalized name.
+    """
+    # Must match FTS_TABLE in migrations/0009_oraclecard_fts.py
+    FTS_TABLE = 'collection_oraclecard_fts'
+    # bm25 weights of the name, type line and oracle text columns
+    RANK_WEIGHTS = (10.0, 3.0, 1.0)
+    
+    _available = None
+    
+    @classmethod
+    def is_available(cls) -> bool:
+        """Whether the database has the full-text index."""
+        if cls._available is None:
+            cls._available = (
+                connection.vendor == 'sqlite'
+                and cls.FTS_TABLE in connection.introspection.table_names()
+            )
+        return cls._available
+    
+    @staticmethod
+    def match_expression(query: str) -> Optional[str]:
+        """
+        Build an FTS5 query matching every word of the search text as a prefix.
+        
+        Args:
+            query (str): Search text as entered
+            
+        Returns:
+            str: The MATCH expression, or None if the text has no words
+        """
+        words = _WORD.findall(normalize_name(query))
+        if not words:
+            return None
+        return ' '.join(f'"{word}"*' for word in words)
+    
+    @classmethod
+    def rebuild(cls):
+        """Rebuild the full-text index from the oracle card table."""
+        if not cls.is_available():
+            return
+        
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {cls.FTS_TABLE} ({cls.FTS_TABLE}) VALUES ('rebuild')")
+    
+    @classmethod
+    def ranked_oracle_ids(cls, query: str, limit: int) -> List[int]:
+        """
+        Get the ids of the oracle cards best matching the search text, best first.
+        
+        Args:
+            query (str): Search text as entered
+            limit (int): Largest number of ids returned
+            
+        Returns:
+            List: Oracle card ids ordered by relevance
+        """
+        expression = cls.match_expression(query)
+        if expression is None:
+            return []
+        
+        weights = ', '.join(str(weight) for weight in cls.RANK_WEIGHTS)
+        with connection.cursor() as cursor:
+            # An exact name match comes first, whatever its score
+            cursor.execute(
+                f'SELECT rowid FROM {cls.FTS_TABLE} WHERE {cls.FTS_TABLE} MATCH %s '
+                f'ORDER BY normalized_name != %s, bm25({cls.FTS_TABLE}, {weights}) LIMIT %s',
+                [expression, normalize_name(query), limit]
+            )
+            return [row[0] for row in cursor.fetchall()]
+    
+    @classmethod
+    def search_cards(cls, query: str, limit: int = 20) -> List[Card]:
+        """
+        Find the printings of the cards matching the search text.
+        
+        Cards whose name or a word of it starts with the search text are found in
+        the in-memory autocomplete index. Only when there are none is the
+        full-text index searched, or the names by substring without it.
+        
+        Args:
+            query (str): Search text as entered
+            limit (int): Largest number of printings returned
+            
+        Returns:
+            List: Matching printings, with their oracle cards loaded, and each
+                card's preferred printing first
+        """
+        cards = Card.objects.select_related('oracle_card')
+        preferred_first = Case(When(oracle_card__preferred_printing_id=F('id'), then=0), default=1)
+        
+        oracle_ids = CardAutocomplete.complete(query, limit)
+        if not oracle_ids:
+            if not cls.is_available():
+                return list(cards.filter(
+                    oracle_card__in=OracleCard.objects.filter(normalized_name__contains=normalize_name(query))
+                ).order_by('name', 'oracle_card_id', preferred_first, 'id')[:limit])
+        
+            oracle_ids = cls.ranked_oracle_ids(query, limit)
+            if not oracle_ids:
+                return []
+        
+        rank = Case(*[When(oracle_card_id=oracle_id, then=position) for position, oracle_id in enumerate(oracle_ids)])
+        return list(cards.filter(oracle_card_id__in=oracle_ids).order_by(rank, preferred_first, 'id')[:limit])
+    
+    @staticmethod
+    def card_fields(card: Card) -> Dict[str, Any]:
+        """Get the fields of a printing shown in search results, as kept by CardAutocomplete."""
+        return {field: getattr(card, field) for field in CardAutocomplete.DISPLAY_FIELDS}
+    
+    @classmethod
+    def typeahead(cls, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Find the cards matching the search text, as the fields shown in search results.
+        
+        Cards whose name or a word of it starts with the search text are served
+        from the autocomplete index without a query, with the same printings in
+        the same order as search_cards returns them. Only when there are none
+        are the printings found by search_cards loaded from the database.
+        
+        Args:
+            query (str): Search text as entered
+            limit (int): Largest number of results
+            
+        Returns:
+            List: Fields of the matching printings as returned by card_fields
+        """
+        cards = CardAutocomplete.complete_cards(query, limit)
+        if cards:
+            return cards
+        return [cls.card_fields(card) for card in cls.search_cards(query, limit)]
+    
+    @classmethod
+    def filter_queryset(cls, queryset: QuerySet, query: str, oracle_field: str = 'id') -> Optional[QuerySet]:
+        """
+        Restrict a queryset to the rows whose oracle card matches the search text.
+        
+        Args:
+            queryset: OracleCard or Card queryset
+            query (str): Search text as entered
+            oracle_field (str): Field of the queryset's model holding the oracle card id
+            
+        Returns:
+            QuerySet: The filtered queryset, or None if the full-text index is not available
+        """
+        if not cls.is_available():
+            return None
+        
+        expression = cls.match_expression(query)
+        if expression is None:
+            return queryset
+        
+        matches = RawSQL(f'SELECT rowid FROM {cls.FTS_TABLE} WHERE {cls.FTS_TABLE} MATCH %s', [expression])
+        return queryset.filter(**{f'{oracle_field}__in': matches})
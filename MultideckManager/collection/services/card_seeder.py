@@ -1,16 +1,111 @@
 import os
+import re
 import json
+import queue
+import hashlib
 import requests
+import threading
 import time
 import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from itertools import islice
 from pathlib import Path
 from django.conf import settings
-from django.db import transaction
-from collection.models import Card
+from django.db import connection, transaction
+from django.db.models import F, OuterRef, Subquery
+from collection.models import Card, OracleCard, SeedRun
+from collection.services.bulk_load import SQLiteBulkLoad
+from collection.services.card_autocomplete import CardAutocomplete
+from collection.services.card_resolver import CardResolver
+from collection.services.card_search import CardSearch
+from collection.services.card_suggester import CardSuggester
+from collection.services.deck_simulator import DeckSimulator
+from collection.services.card_rows import (
+    ORACLE_FIELDS, PRINTING_FIELDS, ROW_COLUMNS, normalize_cards, parse_card_lines
+)
 
 logger = logging.getLogger(__name__)
 
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+def iter_json_array(fileobj, chunk_size=1024 * 1024):
+    """
+    Incrementally parse a top-level JSON array, yielding one element at a time.
+    
+    Only a single read chunk plus the element being decoded is held in memory,
+    so memory use stays flat no matter how large the file is.
+    
+    Args:
+        fileobj: Text file object positioned at the start of the array
+        chunk_size (int): Number of characters to read at a time
+        
+    Yields:
+        The decoded elements of the array, in order
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    eof = False
+    
+    def fill():
+        nonlocal buffer, pos, eof
+        chunk = fileobj.read(chunk_size)
+        if not chunk:
+            eof = True
+        buffer = buffer[pos:] + chunk
+        pos = 0
+    
+    def next_token():
+        nonlocal pos
+        while True:
+            pos = _WHITESPACE.match(buffer, pos).end()
+            if pos < len(buffer):
+                return buffer[pos]
+            if eof:
+                raise ValueError("Unexpected end of JSON data")
+            fill()
+    
+    if next_token() != '[':
+        raise ValueError("Expected a JSON array")
+    pos += 1
+    
+    if next_token() == ']':
+        return
+    
+    while True:
+        next_token()
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            # The element is most likely cut off by the end of the buffer
+            if eof:
+                raise
+            fill()
+            continue
+        
+        # A value ending at the buffer edge, or a number not followed by a
+        # delimiter, may have been truncated by the read
+        truncated = end == len(buffer) or (
+            isinstance(item, (int, float)) and buffer[end] not in ' \t\n\r,]'
+        )
+        if truncated and not eof:
+            fill()
+            continue
+        
+        pos = end
+        yield item
+        
+        token = next_token()
+        pos += 1
+        if token == ']':
+            return
+        if token != ',':
+            raise ValueError(f"Expected ',' or ']' in JSON array, found {token!r}")
+
+
 class CardSeeder:
     """
     Service to download and seed the database with MTG cards from Scryfall.
@@ -21,8 +116,10 @@ class CardSeeder:
         'User-Agent': 'MultideckManager/1.0',
         'Accept': 'application/json'
     }
+    UNIQUE_FIELDS = ['set_code', 'collector_number']
+    UPDATE_FIELDS = ['oracle_card'] + PRINTING_FIELDS + ['content_hash']
     
-    def __init__(self, data_type='default_cards'):
+    def __init__(self, data_type='default_cards', workers=1, bulk_load=False):
         """
         Initialize the card seeder.
         
@@ -32,8 +129,17 @@ class CardSeeder:
                 - 'oracle_cards': One card per Oracle ID (unique gameplay entity)
                 - 'unique_artwork': One card per unique artwork
                 - 'all_cards': All cards in all languages (largest file)
+            workers (int): Number of worker processes used to parse and normalize cards.
+                With more than one worker, seeding runs as a parse/write pipeline.
+            bulk_load (bool): Load cards through a staging table with relaxed durability
+                settings. Only supported on SQLite.
         """
         self.data_type = data_type
+        self.workers = workers
+        self.bulk_load = bulk_load
+        self.loader = None
+        self.updated_at = None
+        self.timings = {}
         os.makedirs(self.DOWNLOAD_DIR, exist_ok=True)
     
     def _get_bulk_data_info(self):
@@ -84,13 +190,40 @@ class CardSeeder:
         
         logger.info(f"Download complete: {filename}")
     
-    def download_bulk_data(self):
-        """Download the bulk data file from Scryfall."""
+    def _get_last_run(self):
+        """Return the most recent recorded seed run for this data type, if any."""
+        return SeedRun.objects.filter(data_type=self.data_type).order_by('-updated_at').first()
+    
+    @staticmethod
+    def _file_checksum(filepath):
+        """Compute the SHA-256 checksum of a file without reading it all into memory."""
+        digest = hashlib.sha256()
+        with open(filepath, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    def download_bulk_data(self, force=False):
+        """
+        Download the bulk data file from Scryfall.
+        
+        Args:
+            force (bool): Download even if the database already holds this version
+            
+        Returns:
+            str: Path to the bulk data file, or None if the last seed run is already up to date
+        """
         info = self._get_bulk_data_info()
         download_uri = info.get('download_uri')
-        updated_at = info.get('updated_at')
+        updated_at = datetime.fromisoformat(info.get('updated_at').replace('Z', '+00:00'))
+        self.updated_at = updated_at
+        
+        last_run = self._get_last_run()
+        if last_run and last_run.updated_at >= updated_at and not force:
+            logger.info(f"Database already seeded from {self.data_type} updated at {last_run.updated_at}")
+            return None
         
-        timestamp = datetime.fromisoformat(updated_at.replace('Z', '+00:00')).strftime('%Y%m%d%H%M%S')
+        timestamp = updated_at.strftime('%Y%m%d%H%M%S')
         filename = f"{self.data_type}_{timestamp}.json"
         filepath = os.path.join(self.DOWNLOAD_DIR, filename)
         
@@ -108,96 +241,333 @@ class CardSeeder:
         Args:
             filepath (str): Path to the downloaded JSON file
             batch_size (int): Number of cards to process in each batch
+            
+        Returns:
+            Dict: Card counts for the run (total, imported, updated, unchanged, skipped)
         """
         logger.info(f"Processing cards from {filepath}")
         
-        total_cards = 0
-        imported_cards = 0
-        skipped_cards = 0
+        stats = {'total': 0, 'imported': 0, 'updated': 0, 'unchanged': 0, 'skipped': 0}
         
-        with open(filepath, 'r', encoding='utf-8') as f:
-            cards_data = json.load(f)
+        # Undo the settings of a bulk load that was killed before it could clean up
+        SQLiteBulkLoad.recover()
+        
+        if self.bulk_load and not SQLiteBulkLoad.is_supported():
+            logger.warning("Bulk-load mode requires SQLite, writing cards directly instead")
+        elif self.bulk_load:
+            self.loader = SQLiteBulkLoad()
+            self.loader.start()
+        
+        try:
+            start = time.time()
+            self._read_cards(filepath, batch_size, stats)
+            self.timings['stage' if self.loader else 'process'] = time.time() - start
+            
+            if self.loader:
+                counts = self.loader.merge(self.timings)
+                stats['imported'] = counts['imported']
+                stats['updated'] = counts['updated']
+                stats['unchanged'] = counts['unchanged']
+                stats['skipped'] += counts['duplicates']
+        finally:
+            if self.loader:
+                self.loader.finish()
+                self.loader = None
         
-        total_cards = len(cards_data)
-        logger.info(f"Found {total_cards} cards in file")
+        self._remove_orphaned_oracle_cards()
         
-        # Process in batches to avoid memory issues
-        for i in range(0, total_cards, batch_size):
-            batch = cards_data[i:i+batch_size]
-            imported, skipped = self._process_batch(batch)
-            imported_cards += imported
-            skipped_cards += skipped
+        if stats['imported'] or stats['updated']:
+            start = time.time()
+            self._update_preferred_printings()
+            self.timings['preferred printings'] = time.time() - start
             
-            logger.info(f"Processed {i + len(batch)}/{total_cards} cards. "
-                       f"Imported: {imported_cards}, Skipped: {skipped_cards}")
+            start = time.time()
+            CardSearch.rebuild()
+            self.timings['search index'] = time.time() - start
         
-        logger.info(f"Import complete. Total cards: {total_cards}, "
-                   f"Imported: {imported_cards}, Skipped: {skipped_cards}")
+        CardResolver.invalidate()
+        CardSuggester.invalidate()
+        CardAutocomplete.invalidate()
+        DeckSimulator.invalidate_all()
+        
+        logger.info(f"Import complete. Total cards: {stats['total']}, "
+                   f"Imported: {stats['imported']}, Updated: {stats['updated']}, "
+                   f"Unchanged: {stats['unchanged']}, Skipped: {stats['skipped']}")
+        logger.info("Phase timings: " + ", ".join(
+            f"{phase} {seconds:.2f}s" for phase, seconds in self.timings.items()
+        ))
+        return stats
     
-    @transaction.atomic
-    def _process_batch(self, batch):
-        """Process a batch of cards and add them to the database."""
-        imported = 0
-        skipped = 0
+    def _read_cards(self, filepath, batch_size, stats):
+        """Read, normalize and write every card in the file, batch by batch."""
+        if self.workers > 1 and self._is_line_delimited(filepath):
+            self._process_cards_pipelined(filepath, batch_size, stats)
+            return
+        
+        if self.workers > 1:
+            logger.warning(f"{filepath} does not hold one card per line, "
+                           f"processing sequentially instead")
+        
+        with open(filepath, 'r', encoding='utf-8') as f:
+            # Cards are streamed out of the file so only one batch is in memory at a time
+            cards = iter_json_array(f)
+            while True:
+                batch = list(islice(cards, batch_size))
+                if not batch:
+                    break
+                
+                rows, skipped = normalize_cards(batch)
+                self._record_batch(stats, rows, skipped, len(batch))
+    
+    @staticmethod
+    def _is_line_delimited(filepath):
+        """Check whether a bulk data file uses Scryfall's one-card-per-line layout."""
+        with open(filepath, 'r', encoding='utf-8') as f:
+            first_line = f.readline().strip()
+            second_line = f.readline().strip().rstrip(',')
+        
+        return first_line == '[' and (
+            second_line == ']' or (second_line.startswith('{') and second_line.endswith('}'))
+        )
+    
+    def _process_cards_pipelined(self, filepath, batch_size, stats):
+        """
+        Process cards with a pool of parser processes feeding a single writer thread.
+        
+        The main thread reads blocks of lines and hands them to the worker pool, which
+        decodes and normalizes them into row tuples. Finished batches are passed in file
+        order to the writer thread through a bounded queue, so at most a few batches per
+        worker are held in memory at once.
+        
+        Args:
+            filepath (str): Path to a one-card-per-line JSON file
+            batch_size (int): Number of lines sent to a worker at a time
+            stats (dict): Card counts, updated in place
+        """
+        max_pending = self.workers * 2
+        results = queue.Queue(maxsize=max_pending)
+        errors = []
         
-        for card_data in batch:
+        def write_results():
             try:
-                # Skip cards without collector numbers or set codes
-                if not card_data.get('collector_number') or not card_data.get('set'):
-                    skipped += 1
-                    continue
+                if self.loader:
+                    self.loader.configure_connection()
+                while True:
+                    result = results.get()
+                    if result is None:
+                        return
+                    if not errors:
+                        rows, skipped, total = result
+                        self._record_batch(stats, rows, skipped, total)
+            except Exception as e:
+                errors.append(e)
+                # Keep draining so the reader never blocks on a full queue
+                while results.get() is not None:
+                    pass
+            finally:
+                connection.close()
+        
+        writer = threading.Thread(target=write_results, name='card-seeder-writer')
+        writer.start()
+        
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool, \
+                    open(filepath, 'r', encoding='utf-8') as f:
+                # Skip the opening bracket so blocks hold batch_size cards, as in the other modes
+                f.readline()
+                pending = deque()
+                while not errors:
+                    lines = list(islice(f, batch_size))
+                    if not lines:
+                        break
+                    
+                    pending.append(pool.submit(parse_card_lines, lines))
+                    if len(pending) >= max_pending:
+                        results.put(pending.popleft().result())
                 
-                # Skip non-card objects like tokens, emblems, etc.
-                if card_data.get('object') != 'card':
-                    skipped += 1
+                while pending and not errors:
+                    results.put(pending.popleft().result())
+                for future in pending:
+                    future.cancel()
+        finally:
+            results.put(None)
+            writer.join()
+        
+        if errors:
+            raise errors[0]
+    
+    def _record_batch(self, stats, rows, skipped, total):
+        """Write a batch of normalized rows and add its counts to the running stats."""
+        stats['total'] += total
+        stats['skipped'] += skipped
+        
+        if self.loader:
+            # Imported/updated/unchanged counts are only known once the staging table is merged
+            self.loader.stage(rows)
+            logger.info(f"Staged {stats['total']} cards. Skipped: {stats['skipped']}")
+            return
+        
+        imported, updated, unchanged = self._write_rows(rows)
+        stats['imported'] += imported
+        stats['updated'] += updated
+        stats['unchanged'] += unchanged
+        stats['skipped'] += len(rows) - imported - updated - unchanged
+        
+        logger.info(f"Processed {stats['total']} cards. "
+                   f"Imported: {stats['imported']}, Updated: {stats['updated']}, "
+                   f"Unchanged: {stats['unchanged']}, Skipped: {stats['skipped']}")
+    
+    @transaction.atomic
+    def _write_rows(self, rows):
+        """
+        Upsert a batch of normalized card rows into the database.
+        
+        Only printings that are new or whose content hash changed are written. Their
+        oracle cards and then the printings themselves are each written with one
+        multi-row INSERT ... ON CONFLICT. Later duplicates of the same printing
+        replace earlier ones.
+        
+        Args:
+            rows (list): Row tuples ordered as ROW_COLUMNS
+            
+        Returns:
+            tuple: (imported, updated, unchanged) card counts
+        """
+        cards = {}
+        for row in rows:
+            values = dict(zip(ROW_COLUMNS, row))
+            cards[(values['set_code'], values['collector_number'])] = values
+        
+        if not cards:
+            return 0, 0, 0
+        
+        # One query fetches the stored hashes so only new or changed cards are written
+        existing = {
+            (set_code, number): content_hash
+            for set_code, number, content_hash in Card.objects.filter(
+                set_code__in={set_code for set_code, _ in cards},
+                collector_number__in={number for _, number in cards},
+            ).values_list('set_code', 'collector_number', 'content_hash')
+        }
+        
+        changed = []
+        updated = 0
+        for key, values in cards.items():
+            if key in existing:
+                if existing[key] == values['content_hash']:
                     continue
-                
-                # Create or update card
-                card, created = Card.objects.update_or_create(
-                    set_code=card_data.get('set'),
-                    collector_number=card_data.get('collector_number'),
-                    defaults={
-                        'name': card_data.get('name', ''),
-                        'mana_cost': card_data.get('mana_cost', ''),
-                        'cmc': float(card_data.get('cmc', 0)),
-                        'type_line': card_data.get('type_line', ''),
-                        'oracle_text': card_data.get('oracle_text', ''),
-                        'power': card_data.get('power', ''),
-                        'toughness': card_data.get('toughness', ''),
-                        'loyalty': card_data.get('loyalty', ''),
-                        'rarity': card_data.get('rarity', ''),
-                        'scryfall_uri': card_data.get('scryfall_uri', ''),
-                    }
+                updated += 1
+            changed.append(values)
+        
+        imported = len(changed) - updated
+        unchanged = len(cards) - len(changed)
+        
+        if changed:
+            oracle_cards = {
+                values['oracle_id']: OracleCard(
+                    oracle_id=values['oracle_id'],
+                    **{field: values[field] for field in ORACLE_FIELDS}
                 )
-                
-                if created:
-                    imported += 1
-                else:
-                    skipped += 1
+                for values in changed
+            }
+            OracleCard.objects.bulk_create(
+                oracle_cards.values(),
+                update_conflicts=True,
+                unique_fields=['oracle_id'],
+                update_fields=ORACLE_FIELDS,
+            )
+            oracle_card_ids = dict(
+                OracleCard.objects.filter(oracle_id__in=oracle_cards).values_list('oracle_id', 'id')
+            )
             
-            except Exception as e:
-                logger.error(f"Error processing card: {card_data.get('name', 'Unknown')} - {e}")
-                skipped += 1
+            Card.objects.bulk_create(
+                [
+                    Card(
+                        oracle_card_id=oracle_card_ids[values['oracle_id']],
+                        set_code=values['set_code'],
+                        collector_number=values['collector_number'],
+                        content_hash=values['content_hash'],
+                        **{field: values[field] for field in PRINTING_FIELDS}
+                    )
+                    for values in changed
+                ],
+                update_conflicts=True,
+                unique_fields=self.UNIQUE_FIELDS,
+                update_fields=self.UPDATE_FIELDS,
+            )
         
-        return imported, skipped
+        return imported, updated, unchanged
+    
+    @staticmethod
+    def _remove_orphaned_oracle_cards():
+        """Delete oracle cards that no printing refers to any more."""
+        deleted, _ = OracleCard.objects.filter(printings__isnull=True).delete()
+        if deleted:
+            logger.info(f"Removed {deleted} oracle cards without printings")
     
-    def run(self):
-        """Download and process cards."""
+    @staticmethod
+    def _update_preferred_printings():
+        """
+        Point every oracle card at its most recently released printing.
+        
+        Printings released on the same day are ordered by set code, which is
+        also the fallback for printings without a release date.
+        """
+        printings = Card.objects.filter(oracle_card=OuterRef('pk')).order_by(
+            F('released_at').desc(nulls_last=True), '-set_code', 'id'
+        )
+        OracleCard.objects.update(preferred_printing=Subquery(printings.values('id')[:1]))
+    
+    def run(self, force=False):
+        """
+        Download and process cards, recording the run once it completes.
+        
+        Args:
+            force (bool): Reseed even if the database is already up to date
+        """
         try:
-            filepath = self.download_bulk_data()
-            self.process_cards(filepath)
+            start = time.time()
+            filepath = self.download_bulk_data(force=force)
+            self.timings['download'] = time.time() - start
+            if filepath is None:
+                return True
+            
+            checksum = self._file_checksum(filepath)
+            last_run = self._get_last_run()
+            if last_run and last_run.checksum == checksum and not force:
+                # Record the newer timestamp so the next run can skip the download too
+                logger.info(f"Bulk data file is unchanged since the last seed run, skipping: {filepath}")
+                stats = {'total': last_run.total_cards, 'imported': 0, 'updated': 0,
+                         'unchanged': last_run.total_cards - last_run.skipped_cards,
+                         'skipped': last_run.skipped_cards}
+            else:
+                stats = self.process_cards(filepath)
+            
+            SeedRun.objects.create(
+                data_type=self.data_type,
+                updated_at=self.updated_at,
+                checksum=checksum,
+                total_cards=stats['total'],
+                imported_cards=stats['imported'],
+                updated_cards=stats['updated'],
+                unchanged_cards=stats['unchanged'],
+                skipped_cards=stats['skipped'],
+            )
             return True
         except Exception as e:
             logger.error(f"Error in card seeder: {e}")
             return False
 
 
-def seed_cards(data_type='default_cards'):
+def seed_cards(data_type='default_cards', force=False, workers=1, bulk_load=False):
     """
     Convenience function to seed the database with cards.
     
     Args:
         data_type (str): Type of bulk data to download
+        force (bool): Reseed even if the database is already up to date
+        workers (int): Number of worker processes used to parse cards
+        bulk_load (bool): Use the SQLite bulk-load mode
     """
-    seeder = CardSeeder(data_type=data_type)
-    return seeder.run()
\ No newline at end of file
+    seeder = CardSeeder(data_type=data_type, workers=workers, bulk_load=bulk_load)
+    return seeder.run(force=force)
\ No newline at end of file
@@ -0,0 +1,137 @@
+# services/card_suggester.py
+import heapq
+import threading
+import logging
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from collection.models import OracleCard, SeedRun
+from collection.services.card_rows import normalize_name
+
+logger = logging.getLogger(__name__)
+
+
+def trigrams(normalized_name: str) -> Set[str]:
+    """
+    Get the character trigrams of a normalized name.
+    
+    The name is padded with two leading spaces and one trailing space, so the
+    start of a name weighs more than its middle, as in PostgreSQL's pg_trgm.
+    """
+    padded = f"  {normalized_name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class CardSuggester:
+    """
+    Process-wide in-memory trigram index over card names for "did you mean" suggestions.
+    
+    Like the CardResolver index, it is loaded on first use and tagged with the
+    latest SeedRun, so it is rebuilt after every seed run.
+    """
+    # Smallest share of trigrams a suggestion must have in common with the name
+    MIN_SIMILARITY = 0.3
+    
+    _lock = threading.Lock()
+    _names = None
+    _sizes = None
+    _postings = None
+    _version = None
+    
+    @classmethod
+    def invalidate(cls):
+        """Drop the index so the next lookup rebuilds it."""
+        with cls._lock:
+            cls._names = None
+            cls._sizes = None
+            cls._postings = None
+            cls._version = None
+    
+    @staticmethod
+    def _current_version() -> Optional[int]:
+        """Get the id of the latest seed run, which identifies the card data."""
+        return SeedRun.objects.order_by('-id').values_list('id', flat=True).first()
+    
+    @classmethod
+    def _load(cls) -> Tuple[List[str], List[int], Dict[str, List[int]]]:
+        """
+        Get the trigram index, building it if it is missing or stale.
+        
+        Returns:
+            Tuple: (names, sizes, postings) with the card names, the number of
+                trigrams of each, and the positions of the names holding each trigram
+        """
+        version = cls._current_version()
+        
+        with cls._lock:
+            if cls._names is None or cls._version != version:
+                names = []
+                sizes = []
+                postings = {}
+                for name, normalized_name in OracleCard.objects.filter(
+                    preferred_printing__isnull=False
+                ).values_list('name', 'normalized_name').iterator(chunk_size=10000):
+                    grams = trigrams(normalized_name)
+                    position = len(names)
+                    names.append(name)
+                    sizes.append(len(grams))
+                    for gram in grams:
+                        postings.setdefault(gram, []).append(position)
+                
+                cls._names, cls._sizes, cls._postings, cls._version = names, sizes, postings, version
+                logger.info(f"Built card name trigram index with {len(names)} names "
+                            f"and {len(postings)} trigrams")
+            
+            return cls._names, cls._sizes, cls._postings
+    
+    @classmethod
+    def suggest(cls, names: Iterable[str], limit: int = 3) -> Dict[str, List[str]]:
+        """
+        Find the closest card names for each of the given names.
+        
+        Names are compared by the Jaccard similarity of their trigram sets, and
+        every name is looked up in the same pass over the in-memory index.
+        
+        Args:
+            names: Card names as entered, typically the ones that failed to resolve
+            limit (int): Largest number of suggestions per name
+            
+        Returns:
+            Dict: Card names ordered by similarity, keyed by the name as given,
+                for each name that has any
+        """
+        card_names, sizes, postings = cls._load()
+        
+        suggestions = {}
+        # Names that normalize alike share their suggestions
+        by_key = {}
+        for name in names:
+            key = normalize_name(name)
+            if key not in by_key:
+                by_key[key] = cls._closest(key, card_names, sizes, postings, limit)
+            if by_key[key]:
+                suggestions[name] = by_key[key]
+        return suggestions
+    
+    @classmethod
+    def _closest(cls, key: str, card_names: List[str], sizes: List[int],
+                 postings: Dict[str, List[int]], limit: int) -> List[str]:
+        """Rank the indexed names sharing trigrams with a normalized name."""
+        grams = trigrams(key)
+        if not key or not grams:
+            return []
+        
+        shared = Counter()
+        for gram in grams:
+            posting = postings.get(gram)
+            if posting:
+                shared.update(posting)
+        
+        scored = []
+        for position, count in shared.items():
+            similarity = count / (len(grams) + sizes[position] - count)
+            if similarity >= cls.MIN_SIMILARITY:
+                scored.append((similarity, position))
+        
+        best = heapq.nlargest(limit, scored, key=lambda item: (item[0], -item[1]))
+        return [card_names[position] for _, position in best]
@@ -0,0 +1,142 @@
+# services/deck_allocation.py
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+import numpy as np
+from django.db.models import Min, Sum
+
+from collection.models import Collection, Decklist, DecklistCard
+from collection.services.deck_status import DeckStatusEngine
+
+
+class DeckAllocator:
+    """
+    Service class deciding which decks of a collection can be built at the same time.
+    
+    The card demand of the decks is loaded into a decks x cards matrix and the
+    collection's inventory into a supply vector over the same cards, each with
+    one query, after which allocation is vector arithmetic. Every deck has a
+    row, so a deck without cards can always be built. Cards the collection
+    has infinitely many of are left out, since they never run short.
+    Printings are pooled as in DeckStatusEngine unless the collection requires
+    exact printings.
+    """
+    
+    @staticmethod
+    def demand_matrix(collection: Collection, decklist_ids: Optional[Iterable[int]] = None
+                      ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Load the decks' demand and the collection's supply of the cards they use.
+        
+        Args:
+            collection: Collection model instance
+            decklist_ids: Ids of the decks to load, the active decks if not given
+            
+        Returns:
+            Tuple: (deck_ids, card_ids, demand, supply), where demand[i, j] is the
+                quantity of card_ids[j] needed by deck_ids[i], mainboard and
+                sideboard together, and supply[j] the quantity owned. With pooled
+                printings card_ids holds the first printing the decks list
+        """
+        field = DeckStatusEngine.card_field(collection.exact_printings)
+        
+        decklists = Decklist.objects.filter(collection=collection)
+        if decklist_ids is None:
+            decklists = decklists.filter(active=True)
+        else:
+            decklists = decklists.filter(id__in=list(decklist_ids))
+        deck_ids = np.array(sorted(decklists.values_list('id', flat=True)), dtype=np.int64)
+        
+        decklist_cards = DecklistCard.objects.filter(decklist__in=decklists)
+        rows = np.array(
+            list(decklist_cards.values('decklist_id', field).annotate(
+                printing=Min('card_id'), total=Sum('quantity')
+            ).order_by().values_list('decklist_id', field, 'printing', 'total')),
+            dtype=np.int64,
+        ).reshape(-1, 4)
+        
+        deck_index = np.searchsorted(deck_ids, rows[:, 0])
+        card_keys, card_index = np.unique(rows[:, 1], return_inverse=True)
+        demand = np.zeros((len(deck_ids), len(card_keys)), dtype=np.int64)
+        demand[deck_index, card_index] = rows[:, 3]
+        
+        card_ids = np.full(len(card_keys), np.iinfo(np.int64).max)
+        np.minimum.at(card_ids, card_index, rows[:, 2])
+        
+        # Cards not in the collection have a supply of 0
+        inventory = DeckStatusEngine.inventory(collection)
+        supply = np.array([inventory.get(key, 0) for key in card_keys.tolist()], dtype=np.int64)
+        
+        # -1 means infinite
+        finite = supply != -1
+        return deck_ids, card_ids[finite], demand[:, finite], supply[finite]
+    
+    @staticmethod
+    def allocate(demand: np.ndarray, supply: np.ndarray, prefer: Optional[Sequence[int]] = None) -> np.ndarray:
+        """
+        Choose a maximal set of decks that can be built together from the supply.
+        
+        Decks are taken one at a time while their cards are still left over, so
+        no deck outside the set could be added to it. Preferred decks are taken
+        first, then the others from the least to the most demanding of scarce
+        cards, where a card's scarcity is its total demand over its supply.
+        
+        Args:
+            demand: Decks x cards matrix of the quantities needed
+            supply: Quantity owned of each card
+            prefer: Row indexes of the decks to take first, in order
+            
+        Returns:
+            np.ndarray: Boolean mask of the decks in the set
+        """
+        scarcity = demand.sum(axis=0) / np.maximum(supply, 1)
+        order = np.argsort(demand @ scarcity, kind='stable')
+        if prefer:
+            preferred = np.asarray(prefer, dtype=np.int64)
+            order = np.concatenate([preferred, order[~np.isin(order, preferred)]])
+        
+        remaining = supply.copy()
+        chosen = np.zeros(len(demand), dtype=bool)
+        for deck in order:
+            if not chosen[deck] and np.all(demand[deck] <= remaining):
+                remaining -= demand[deck]
+                chosen[deck] = True
+        return chosen
+    
+    @staticmethod
+    def shortfall(demand: np.ndarray, supply: np.ndarray) -> np.ndarray:
+        """
+        Get the quantity of each card to buy so that all the decks can be built together.
+        
+        Returns:
+            np.ndarray: Quantity missing of each card, 0 for cards with enough supply
+        """
+        return np.maximum(demand.sum(axis=0) - supply, 0)
+    
+    @staticmethod
+    def solve(collection: Collection, prefer: Optional[Sequence[int]] = None) -> Dict[str, Any]:
+        """
+        Allocate the collection's cards to its active decks.
+        
+        Args:
+            collection: Collection model instance
+            prefer: Ids of the decks to build first, in order
+            
+        Returns:
+            Dict: 'buildable' and 'unbuildable' lists of deck ids, where the
+                buildable decks can all be built at the same time, and
+                'shortfall', the quantity to buy of each card id so that every
+                active deck can be built together
+        """
+        deck_ids, card_ids, demand, supply = DeckAllocator.demand_matrix(collection)
+        
+        positions = {deck_id: position for position, deck_id in enumerate(deck_ids.tolist())}
+        chosen = DeckAllocator.allocate(
+            demand, supply, [positions[deck_id] for deck_id in prefer or () if deck_id in positions]
+        )
+        
+        missing = DeckAllocator.shortfall(demand, supply)
+        needed = missing > 0
+        return {
+            'buildable': deck_ids[chosen].tolist(),
+            'unbuildable': deck_ids[~chosen].tolist(),
+            'shortfall': dict(zip(card_ids[needed].tolist(), missing[needed].tolist())),
+        }
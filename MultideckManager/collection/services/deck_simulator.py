@@ -0,0 +1,204 @@
+# services/deck_simulator.py
+import threading
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from django.db import connection
+from django.db.models import F, Min, Sum
+
+from collection.models import Card, Collection, Decklist, DecklistCard
+from collection.services.deck_status import DeckStatusEngine
+
+logger = logging.getLogger(__name__)
+
+
+class DeckSimulator:
+    """
+    Process-wide cache of collection snapshots for what-if deck activation.
+    
+    A snapshot holds a collection's inventory and the card demand of all of its
+    decks, active or not, as NumPy arrays, with printings pooled as in
+    DeckStatusEngine unless the collection requires exact printings. The status
+    of every deck under any proposed active set is then found with vector
+    arithmetic and no writes.
+    Snapshots are tagged with the collection's version, which invalidate()
+    increments whenever the collection's cards or decklists change, and
+    invalidate_all() after a seed run, and are rebuilt when the version in the
+    database no longer matches.
+    """
+    # Largest number of collections kept in memory, least recently used dropped first
+    MAX_SNAPSHOTS = 16
+    
+    _lock = threading.Lock()
+    _snapshots = OrderedDict()
+    
+    @classmethod
+    def invalidate(cls, collection_id: int):
+        """Mark a collection as changed, so every process rebuilds its snapshot."""
+        Collection.objects.filter(id=collection_id).update(version=F('version') + 1)
+        with cls._lock:
+            cls._snapshots.pop(collection_id, None)
+    
+    @classmethod
+    def invalidate_all(cls):
+        """Mark every collection as changed, after a seed run changed the cards under all of them."""
+        Collection.objects.update(version=F('version') + 1)
+        with cls._lock:
+            cls._snapshots.clear()
+    
+    @staticmethod
+    def _build(collection_id: int) -> Dict[str, Any]:
+        """
+        Load a collection's decks, their demand and the inventory of the cards they use.
+        
+        Returns:
+            Dict: Arrays of the deck ids and active states, one row per deck and
+                card with the deck index, card index, printing the deck lists and
+                quantity needed, and for each card whether and how many are owned
+        """
+        collection = Collection.objects.get(id=collection_id)
+        field = DeckStatusEngine.card_field(collection.exact_printings)
+        
+        decks = list(Decklist.objects.filter(collection=collection).order_by('id').values_list('id', 'active'))
+        deck_ids = np.array([deck_id for deck_id, _ in decks], dtype=np.int64)
+        
+        rows = np.array(
+            list(DecklistCard.objects.filter(decklist__collection=collection).values(
+                'decklist_id', field
+            ).annotate(printing=Min('card_id'), total=Sum('quantity')).order_by('decklist_id', 'printing').values_list(
+                'decklist_id', field, 'printing', 'total'
+            )),
+            dtype=np.int64,
+        ).reshape(-1, 4)
+        card_keys, card_index = np.unique(rows[:, 1], return_inverse=True)
+        
+        inventory = DeckStatusEngine.inventory(collection)
+        owned = np.array([key in inventory for key in card_keys.tolist()], dtype=bool)
+        supply = np.array([inventory.get(key, 0) for key in card_keys.tolist()], dtype=np.int64)
+        
+        return {
+            'deck_ids': deck_ids,
+            'active': np.array([active for _, active in decks], dtype=bool),
+            'row_deck': np.searchsorted(deck_ids, rows[:, 0]),
+            'row_card': card_index,
+            'row_printing': rows[:, 2],
+            'row_quantity': rows[:, 3],
+            'card_count': len(card_keys),
+            'owned': owned,
+            'supply': supply,
+            'card_names': dict(Card.objects.filter(id__in=rows[:, 2].tolist()).values_list('id', 'name')),
+        }
+    
+    @classmethod
+    def snapshot(cls, collection_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Get the collection's snapshot, building it if it is missing or stale.
+        
+        Returns:
+            Dict: The snapshot, or None if the collection does not exist
+        """
+        # A plain query, as the ORM would take longer than the simulation itself
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT version FROM {Collection._meta.db_table} WHERE id = %s', [collection_id])
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        version = row[0]
+        
+        with cls._lock:
+            cached = cls._snapshots.get(collection_id)
+            if cached is not None and cached[0] == version:
+                cls._snapshots.move_to_end(collection_id)
+                return cached[1]
+        
+        # Built without the lock, so other collections are served meanwhile. A change
+        # made during the build bumps the version, and the next call builds again
+        snapshot = cls._build(collection_id)
+        logger.info(f"Built deck snapshot of collection {collection_id} at version {version} "
+                    f"with {len(snapshot['deck_ids'])} decks and {snapshot['card_count']} cards")
+        
+        with cls._lock:
+            cached = cls._snapshots.get(collection_id)
+            # Keep a snapshot of a later version that another thread built meanwhile
+            if cached is not None and cached[0] > version:
+                return snapshot
+            
+            cls._snapshots[collection_id] = (version, snapshot)
+            cls._snapshots.move_to_end(collection_id)
+            while len(cls._snapshots) > cls.MAX_SNAPSHOTS:
+                cls._snapshots.popitem(last=False)
+        return snapshot
+    
+    @classmethod
+    def simulate(cls, collection_id: int, active_ids: Optional[Iterable[int]] = None
+                 ) -> Optional[Dict[int, Tuple[str, str, Optional[List[Dict[str, Any]]]]]]:
+        """
+        Get every deck's status as if exactly the given decks were active.
+        
+        Args:
+            collection_id (int): Id of the collection
+            active_ids: Ids of the decks to treat as active, the decks currently
+                active if not given. Ids of other collections' decks are ignored
+                
+        Returns:
+            Dict: (status_code, message, details) for each deck as returned by
+                Decklist.get_status, keyed by deck id, with conflicts naming their
+                card by id and name. None if the collection does not exist
+        """
+        snapshot = cls.snapshot(collection_id)
+        if snapshot is None:
+            return None
+        
+        deck_ids = snapshot['deck_ids']
+        if active_ids is None:
+            active = snapshot['active']
+        else:
+            active = np.isin(deck_ids, np.fromiter(active_ids, dtype=np.int64))
+        
+        # Only the rows of active decks take part, in deck then card order
+        rows = np.flatnonzero(active[snapshot['row_deck']])
+        row_card = snapshot['row_card'][rows]
+        needed = snapshot['row_quantity'][rows]
+        total = np.bincount(row_card, weights=needed, minlength=snapshot['card_count']).astype(np.int64)[row_card]
+        available = snapshot['supply'][row_card]
+        owned = snapshot['owned'][row_card]
+        
+        # -1 means infinite
+        limited = owned & (available != -1)
+        missing = ~owned
+        insufficient = limited & (available < needed)
+        clashing = limited & (total > needed) & (total > available)
+        
+        shortages = {}
+        clashes = {}
+        printings = snapshot['row_printing'][rows]
+        card_names = snapshot['card_names']
+        row_deck = snapshot['row_deck'][rows]
+        for position in np.flatnonzero(missing | insufficient | clashing).tolist():
+            deck_id = int(deck_ids[row_deck[position]])
+            card_id = int(printings[position])
+            card = {'id': card_id, 'name': card_names.get(card_id, '')}
+            if missing[position] or insufficient[position]:
+                shortages.setdefault(deck_id, []).append({
+                    'card': card,
+                    'needed': int(needed[position]),
+                    'available': int(available[position]),
+                    'type': 'missing' if missing[position] else 'insufficient'
+                })
+            if clashing[position]:
+                clashes.setdefault(deck_id, []).append({
+                    'card': card,
+                    'needed': int(total[position]),
+                    'available': int(available[position]),
+                    'current_deck_needs': int(needed[position]),
+                    'other_decks_need': int(total[position] - needed[position]),
+                    'type': 'conflict'
+                })
+        
+        return {
+            deck_id: DeckStatusEngine.status(
+                bool(is_active), shortages.get(deck_id, []) + clashes.get(deck_id, [])
+            )
+            for deck_id, is_active in zip(deck_ids.tolist(), active.tolist())
+        }
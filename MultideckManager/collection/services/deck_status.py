@@ -0,0 +1,251 @@
+# services/deck_status.py
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from django.db.models import Case, F, Min, OuterRef, Subquery, Sum, When
+
+from collection.models import Card, CardDemand, Collection, CollectionCard, Decklist, DecklistCard
+
+
+class DeckStatusEngine:
+    """
+    Service class computing the status of every deck in a collection at once.
+    
+    The collection's inventory and the card demand of all its active decks are
+    each loaded with one query, so checking every deck costs the same as
+    checking one. Cards named in conflicts are fetched with one more query.
+    A single deck is checked against the CardDemand table instead.
+    
+    Unless the collection requires exact printings, owned copies and demand are
+    pooled across the printings of each card through Card.oracle_card, so a
+    deck listing one printing can use copies of another.
+    """
+    
+    @staticmethod
+    def card_field(exact_printings: bool) -> str:
+        """
+        Get the field that identifies a card when comparing demand with the inventory.
+        
+        Returns:
+            str: 'card_id' for printings, 'card__oracle_card_id' for pooled printings
+        """
+        return 'card_id' if exact_printings else 'card__oracle_card_id'
+    
+    @staticmethod
+    def _available(total: str) -> Case:
+        """Total owned over grouped rows, -1 (infinite) if any of them is infinite."""
+        return Case(When(lowest=-1, then=-1), default=F(total))
+    
+    @staticmethod
+    def inventory(collection: Collection, exact_printings: Optional[bool] = None) -> Dict[int, int]:
+        """
+        Get the quantity owned of each card, with a single GROUP BY query.
+        
+        Args:
+            collection: Collection model instance
+            exact_printings: Whether printings are counted apart, the collection's
+                setting if not given
+                
+        Returns:
+            Dict: Quantity owned keyed by card id, or by oracle card id when
+                printings are pooled, with -1 for infinite
+        """
+        if exact_printings is None:
+            exact_printings = collection.exact_printings
+        field = DeckStatusEngine.card_field(exact_printings)
+        
+        return dict(
+            CollectionCard.objects.filter(collection=collection).values(field).annotate(
+                lowest=Min('quantity'), total=Sum('quantity')
+            ).annotate(available=DeckStatusEngine._available('total')).order_by().values_list(field, 'available')
+        )
+    
+    @staticmethod
+    def conflicts(collection: Collection, exact_printings: Optional[bool] = None) -> Dict[int, List[Dict[str, Any]]]:
+        """
+        Check every active deck of the collection against the inventory and each other.
+        
+        Args:
+            collection: Collection model instance
+            exact_printings: Whether printings are counted apart, the collection's
+                setting if not given
+            
+        Returns:
+            Dict: Conflicts of each active deck that has cards, keyed by deck id. A
+                conflict is a dictionary with the card, the quantities needed and
+                available, and its type: 'missing', 'insufficient' or 'conflict'.
+                With pooled printings the card is the first printing the deck lists
+        """
+        if exact_printings is None:
+            exact_printings = collection.exact_printings
+        field = DeckStatusEngine.card_field(exact_printings)
+        inventory = DeckStatusEngine.inventory(collection, exact_printings)
+        
+        # Quantity of each card needed by each active deck, mainboard and sideboard together
+        demand = defaultdict(dict)
+        total_demand = defaultdict(int)
+        for decklist_id, key, card_id, quantity in DecklistCard.objects.filter(
+            decklist__collection=collection, decklist__active=True
+        ).values('decklist_id', field).annotate(printing=Min('card_id'), total=Sum('quantity')).order_by(
+            'decklist_id', 'printing'
+        ).values_list('decklist_id', field, 'printing', 'total'):
+            demand[decklist_id][key] = (card_id, quantity)
+            total_demand[key] += quantity
+        
+        conflicts = {
+            decklist_id: DeckStatusEngine._check_cards(
+                (card_id, needed, inventory.get(key), total_demand[key])
+                for key, (card_id, needed) in cards.items()
+            )
+            for decklist_id, cards in demand.items()
+        }
+                
+        DeckStatusEngine._load_cards(conflicts.values())
+        return conflicts
+                
+    @staticmethod
+    def deck_conflicts(decklist: Decklist, exact_printings: Optional[bool] = None) -> List[Dict[str, Any]]:
+        """
+        Check a single active deck against the inventory and the other active decks.
+                
+        The deck's cards are joined with the collection's CardDemand and
+        inventory rows on indexed keys, so the check is one query however many
+        decks the collection has. Cards named in conflicts are fetched with one
+        more query.
+        
+        Args:
+            decklist: Decklist model instance
+            exact_printings: Whether printings are counted apart, the collection's
+                setting if not given
+            
+        Returns:
+            List: The deck's conflicts, as in conflicts()
+        """
+        if exact_printings is None:
+            exact_printings = decklist.collection.exact_printings
+        field = DeckStatusEngine.card_field(exact_printings)
+        
+        # Owned copies and demand of each of the deck's cards, summed over its printings when pooled
+        collection_cards = CollectionCard.objects.filter(
+            collection_id=decklist.collection_id, **{field: OuterRef(field)}
+        ).values(field).annotate(lowest=Min('quantity'), total=Sum('quantity'))
+        demand = CardDemand.objects.filter(
+            collection_id=decklist.collection_id, **{field: OuterRef(field)}
+        ).values(field).annotate(total=Sum('quantity'))
+        
+        rows = DecklistCard.objects.filter(decklist=decklist).values(field).annotate(
+            printing=Min('card_id'),
+            needed=Sum('quantity'),
+            available=Subquery(collection_cards.annotate(
+                available=DeckStatusEngine._available('total')
+            ).values('available')),
+            total=Subquery(demand.values('total')),
+        ).order_by('printing').values_list('printing', 'needed', 'available', 'total')
+        
+        conflicts = DeckStatusEngine._check_cards(rows)
+        DeckStatusEngine._load_cards([conflicts])
+        return conflicts
+    
+    @staticmethod
+    def _check_cards(rows: Iterable[Tuple[int, int, Optional[int], Optional[int]]]) -> List[Dict[str, Any]]:
+        """
+        Find a deck's conflicts from its cards' demand and availability.
+        
+        Args:
+            rows: (card id, quantity the deck needs, quantity in the collection or
+                None if not owned, quantity all active decks need) for each card
+                
+        Returns:
+            List: Shortages followed by conflicts with other decks, naming cards by id
+        """
+        shortages = []
+        clashes = []
+        for card_id, needed, available, total in rows:
+            if available is None:
+                shortages.append({'card': card_id, 'needed': needed, 'available': 0, 'type': 'missing'})
+                continue
+            
+            # -1 means infinite
+            if available == -1:
+                continue
+            
+            if available < needed:
+                shortages.append({'card': card_id, 'needed': needed, 'available': available, 'type': 'insufficient'})
+            
+            # An inactive deck's cards are not in the total, so only its own need counts
+            total = max(total or 0, needed)
+            other_decks_need = total - needed
+            if other_decks_need and total > available:
+                clashes.append({
+                    'card': card_id,
+                    'needed': total,
+                    'available': available,
+                    'current_deck_needs': needed,
+                    'other_decks_need': other_decks_need,
+                    'type': 'conflict'
+                })
+        return shortages + clashes
+    
+    @staticmethod
+    def _load_cards(deck_conflicts: Iterable[List[Dict[str, Any]]]):
+        """Replace the card ids in the conflicts with the cards, fetched together."""
+        deck_conflicts = list(deck_conflicts)
+        card_ids = {conflict['card'] for conflicts in deck_conflicts for conflict in conflicts}
+        if card_ids:
+            cards = Card.objects.in_bulk(card_ids)
+            for conflicts in deck_conflicts:
+                for conflict in conflicts:
+                    conflict['card'] = cards[conflict['card']]
+    
+    @staticmethod
+    def status(active: bool, conflicts: Optional[List[Dict[str, Any]]]) -> Tuple[str, str, Optional[List[Dict[str, Any]]]]:
+        """
+        Get a deck's status from its active state and conflicts.
+        
+        Returns:
+            Tuple: (status_code, message, details) as returned by Decklist.get_status
+        """
+        if not active:
+            return ('inactive', 'Inactive', None)
+        
+        if not conflicts:
+            return ('ok', 'Active', None)
+        
+        # Missing or insufficient cards are errors, which outweigh conflicts with other decks
+        error_conflicts = [c for c in conflicts if c['type'] in ('missing', 'insufficient')]
+        if error_conflicts:
+            return ('error', 'Error', error_conflicts)
+        
+        return ('conflict', 'Conflict', conflicts)
+    
+    @staticmethod
+    def statuses(collection: Collection) -> Dict[int, Tuple[str, str, Optional[List[Dict[str, Any]]]]]:
+        """
+        Get the status of every deck in the collection.
+        
+        Args:
+            collection: Collection model instance
+            
+        Returns:
+            Dict: (status_code, message, details) for each deck, keyed by deck id
+        """
+        conflicts = DeckStatusEngine.conflicts(collection)
+        return {
+            decklist_id: DeckStatusEngine.status(active, conflicts.get(decklist_id))
+            for decklist_id, active in Decklist.objects.filter(collection=collection).values_list('id', 'active')
+        }
+    
+    @staticmethod
+    def attach(collection: Collection, decklists: Iterable[Decklist]) -> List[Decklist]:
+        """
+        Compute the status of the given decks of a collection and store it on each.
+        
+        Decklist.get_status returns the stored status instead of computing it again.
+        
+        Returns:
+            List: The decks
+        """
+        decklists = list(decklists)
+        conflicts = DeckStatusEngine.conflicts(collection)
+        for decklist in decklists:
+            decklist._status = DeckStatusEngine.status(decklist.active, conflicts.get(decklist.id))
+        return decklists
@@ -1,12 +1,14 @@
 # services/decklist_importer.py
-import csv
-import io
-import re
 import requests
 from typing import Dict, List, Tuple, Any, Optional
 from django.db import transaction
 
 from collection.models import Decklist, Card, DecklistCard
+from collection.services.card_demand import CardDemandTracker
+from collection.services.card_list_parser import CardListParser
+from collection.services.card_resolver import CardResolver
+from collection.services.card_suggester import CardSuggester
+from collection.services.deck_simulator import DeckSimulator
 
 
 class DecklistImporter:
@@ -23,73 +25,7 @@ class DecklistImporter:
         Returns:
             Dict: Dictionary with 'mainboard' and 'sideboard' lists of cards
         """
-        mainboard = []
-        sideboard = []
-        
-        current_section = 'mainboard'
-        lines = text.strip().split('\n')
-        
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-            
-            # Check for section headers
-            # temporarily remove special characters
-            cleaned = re.sub(r'[^\w\s]', '', line)
-            if cleaned.upper() == 'MAINBOARD' or cleaned.upper() == 'MAIN':
-                current_section = 'mainboard'
-                continue
-            elif cleaned.upper() == 'SIDEBOARD' or cleaned.upper() == 'SIDE':
-                current_section = 'sideboard'
-                continue
-            
-            # Try to match the line with different formats
-            # Format 1: "2 Lightning Bolt"
-            quantity_name_match = re.match(r'^(\d+)\s+(.+)$', line)
-            # Format 2: "Lightning Bolt (2)"
-            name_quantity_match = re.match(r'^(.+)\s+\((\d+)\)$', line)
-            # Format 3: "Lightning Bolt"
-            name_only_match = re.match(r'^([^0-9]+)$', line)
-            # Format 4: "4 Candy Trail (WOE) 243"
-            quantity_name_set_number_match = re.match(r'^(\d+)\s+(.+)\s+\(([A-Z0-9]+)\)\s+([A-Za-z0-9\-]+)$', line)
-            
-            card_data = None
-            if quantity_name_set_number_match:
-                quantity = int(quantity_name_set_number_match.group(1))
-                name = quantity_name_set_number_match.group(2).strip()
-                set_code = quantity_name_set_number_match.group(3)
-                collector_number = quantity_name_set_number_match.group(4)
-                card_data = {'name': name, 'quantity': quantity}
-            elif quantity_name_match:
-                quantity = int(quantity_name_match.group(1))
-                name = quantity_name_match.group(2).strip()
-                card_data = {'name': name, 'quantity': quantity}
-            elif name_quantity_match:
-                name = name_quantity_match.group(1).strip()
-                quantity = int(name_quantity_match.group(2))
-                card_data = {'name': name, 'quantity': quantity}
-            elif name_only_match:
-                name = name_only_match.group(1).strip()
-                card_data = {'name': name, 'quantity': 1}
-            
-            if card_data:
-                if current_section == 'mainboard':
-                    # check if card is already in mainboard
-                    existing_card = next((card for card in mainboard if card['name'].lower() == card_data['name'].lower()), None)
-                    if existing_card:
-                        existing_card['quantity'] += card_data['quantity']
-                    else:
-                        mainboard.append(card_data)
-                else:
-                    # check if card is already in sideboard
-                    existing_card = next((card for card in sideboard if card['name'].lower() == card_data['name'].lower()), None)
-                    if existing_card:
-                        existing_card['quantity'] += card_data['quantity']
-                    else:
-                        sideboard.append(card_data)
-        
-        return {'mainboard': mainboard, 'sideboard': sideboard}
+        return CardListParser.parse_text(text)
     
     @staticmethod
     def parse_csv_file(file) -> Dict[str, List[Dict[str, Any]]]:
@@ -102,58 +38,20 @@ class DecklistImporter:
         Returns:
             Dict: Dictionary with 'mainboard' and 'sideboard' lists of cards
         """
-        mainboard = []
-        sideboard = []
-        
-        current_section = 'mainboard'
-        decoded_file = file.read().decode('utf-8')
-        csv_reader = csv.reader(io.StringIO(decoded_file))
+        return CardListParser.parse_csv(CardListParser.read_file_lines(file))
+    
+    @staticmethod
+    def parse_text_file(file) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Parse a text file with cards line by line, separating mainboard and sideboard.
         
-        for row in csv_reader:
-            if not row:
-                continue
-            
-            # Check for section headers
-            first_cell = row[0].strip().upper() if row else ""
-            if first_cell == 'MAINBOARD' or first_cell == 'MAIN':
-                current_section = 'mainboard'
-                continue
-            elif first_cell == 'SIDEBOARD' or first_cell == 'SIDE':
-                current_section = 'sideboard'
-                continue
+        Args:
+            file: File object containing card lines
             
-            # Check if the row has at least 2 columns (quantity, name)
-            if len(row) >= 2:
-                try:
-                    quantity = int(row[0].strip())
-                    name = row[1].strip()
-                    
-                    card_data = {'name': name, 'quantity': quantity}
-                    
-                    if current_section == 'mainboard':
-                        mainboard.append(card_data)
-                    else:
-                        sideboard.append(card_data)
-                except (ValueError, IndexError):
-                    # If first column is not a number, assume it's the name with quantity 1
-                    name = row[0].strip()
-                    card_data = {'name': name, 'quantity': 1}
-                    
-                    if current_section == 'mainboard':
-                        mainboard.append(card_data)
-                    else:
-                        sideboard.append(card_data)
-            else:
-                # If there's only one column, assume it's the name with quantity 1
-                name = row[0].strip()
-                card_data = {'name': name, 'quantity': 1}
-                
-                if current_section == 'mainboard':
-                    mainboard.append(card_data)
-                else:
-                    sideboard.append(card_data)
-        
-        return {'mainboard': mainboard, 'sideboard': sideboard}
+        Returns:
+            Dict: Dictionary with 'mainboard' and 'sideboard' lists of cards
+        """
+        return CardListParser.parse_lines(CardListParser.read_file_lines(file))
     
     @staticmethod
     def import_from_archidekt(deck_id: str) -> Dict[str, List[Dict[str, Any]]]:
@@ -188,7 +86,7 @@ class DecklistImporter:
             
             # For now, just return the placeholder
             return result
-            
+        
         except Exception as e:
             raise Exception(f"Error importing from Archidekt: {str(e)}")
     
@@ -202,7 +100,7 @@ class DecklistImporter:
         Args:
             decklist: Decklist model instance
             card_data: Dictionary with 'mainboard' and 'sideboard' lists of cards
-            clear_existing: Whether to clear existing cards before import
+            clear_existing: Whether to remove existing cards that are not part of the import
             
         Returns:
             Dict: Result of the import operation
@@ -215,27 +113,45 @@ class DecklistImporter:
         skipped_cards = []
         warnings = []
         
-        # Clear existing cards if requested
-        if clear_existing:
-            DecklistCard.objects.filter(decklist=decklist).delete()
+        # Resolve every line at once through the shared in-memory index, using the
+        # exact printing where the line names one and the card name otherwise
+        cards = CardResolver.get_cards(mainboard + sideboard)
+        mainboard_cards, sideboard_cards = cards[:len(mainboard)], cards[len(mainboard):]
+        
+        # Quantity each (card, board) pair should end up with, summed over lines resolving to the same card
+        desired = {}
         
         # Process mainboard
-        for card_info in mainboard:
-            result = DecklistImporter._process_card(decklist, card_info, False)
+        for card_info, card in zip(mainboard, mainboard_cards):
+            result = DecklistImporter._process_card(card_info, False, card)
             if result['success']:
                 added_mainboard.append(result['card_data'])
+                key = (result['card'].id, False)
+                desired[key] = desired.get(key, 0) + card_info['quantity']
             else:
                 skipped_cards.append({**result['card_data'], 'reason': result['reason']})
-                warnings.append(f"Skipped mainboard card: {card_info['name']} - {result['reason']}")
         
         # Process sideboard
-        for card_info in sideboard:
-            result = DecklistImporter._process_card(decklist, card_info, True)
+        for card_info, card in zip(sideboard, sideboard_cards):
+            result = DecklistImporter._process_card(card_info, True, card)
             if result['success']:
                 added_sideboard.append(result['card_data'])
+                key = (result['card'].id, True)
+                desired[key] = desired.get(key, 0) + card_info['quantity']
             else:
                 skipped_cards.append({**result['card_data'], 'reason': result['reason']})
-                warnings.append(f"Skipped sideboard card: {card_info['name']} - {result['reason']}")
+        
+        # Close matches for every unknown name are found in one pass
+        suggestions = CardSuggester.suggest(card['name'] for card in skipped_cards if card['name'])
+        for card in skipped_cards:
+            card['suggestions'] = suggestions.get(card['name'], [])
+            board = 'sideboard' if card['is_sideboard'] else 'mainboard'
+            warning = f"Skipped {board} card: {card['name']} - {card['reason']}"
+            if card['suggestions']:
+                warning += f" (did you mean {' or '.join(card['suggestions'])}?)"
+            warnings.append(warning)
+        
+        DecklistImporter._apply_changes(decklist, desired, clear_existing)
         
         return {
             'success': True,
@@ -249,17 +165,64 @@ class DecklistImporter:
         }
     
     @staticmethod
-    def _process_card(decklist: Decklist, card_info: Dict[str, Any], is_sideboard: bool) -> Dict[str, Any]:
+    def _apply_changes(decklist: Decklist, desired: Dict[Tuple[int, bool], int], clear_existing: bool):
         """
-        Process a single card for import into a decklist.
+        Bring the decklist's cards in line with the imported ones.
+        
+        Only the differences to the current rows are written: new cards are
+        inserted, changed quantities updated and, when clearing existing cards,
+        cards missing from the import deleted, each with a single bulk query.
+        The collection's card demand is then refreshed for the cards that changed.
         
         Args:
             decklist: Decklist model instance
+            desired: Quantity for each imported (card id, is_sideboard) pair
+            clear_existing: Whether cards missing from the import are removed
+        """
+        existing = {
+            (decklist_card.card_id, decklist_card.is_sideboard): decklist_card
+            for decklist_card in DecklistCard.objects.filter(decklist=decklist)
+        }
+        
+        new_cards = []
+        changed_cards = []
+        for (card_id, is_sideboard), quantity in desired.items():
+            decklist_card = existing.get((card_id, is_sideboard))
+            if decklist_card is None:
+                new_cards.append(DecklistCard(
+                    decklist=decklist, card_id=card_id, is_sideboard=is_sideboard, quantity=quantity
+                ))
+            elif decklist_card.quantity != quantity:
+                decklist_card.quantity = quantity
+                changed_cards.append(decklist_card)
+        
+        removed_cards = []
+        if clear_existing:
+            removed_cards = [decklist_card for key, decklist_card in existing.items() if key not in desired]
+            if removed_cards:
+                DecklistCard.objects.filter(id__in=[decklist_card.id for decklist_card in removed_cards]).delete()
+        
+        DecklistCard.objects.bulk_create(new_cards)
+        DecklistCard.objects.bulk_update(changed_cards, ['quantity'])
+        
+        if decklist.active:
+            CardDemandTracker.refresh_decklist(decklist, {
+                decklist_card.card_id for decklist_card in new_cards + changed_cards + removed_cards
+            })
+        DeckSimulator.invalidate(decklist.collection_id)
+    
+    @staticmethod
+    def _process_card(card_info: Dict[str, Any], is_sideboard: bool, card: Optional[Card]) -> Dict[str, Any]:
+        """
+        Check a single imported card against the card it resolved to.
+        
+        Args:
             card_info: Dictionary with card name and quantity
             is_sideboard: Whether the card is part of the sideboard
+            card: The resolved card, or None if it was not found
             
         Returns:
-            Dict: Result of processing the card
+            Dict: Result of processing the card, including the matched card on success
         """
         name = card_info['name']
         quantity = card_info['quantity']
@@ -272,34 +235,16 @@ class DecklistImporter:
                 'reason': 'Empty card name'
             }
         
-        # Try to find the card in the database
-        cards = Card.objects.filter(name__iexact=name)
-        
-        if not cards.exists():
+        if card is None:
             return {
                 'success': False,
                 'card_data': {'name': name, 'quantity': quantity, 'is_sideboard': is_sideboard},
                 'reason': 'Card not found in database'
             }
         
-        # Get latest printing of the card
-        card = cards.order_by('-set_code').first()
-        
-        # Check if card is already in decklist
-        decklist_card, created = DecklistCard.objects.get_or_create(
-            decklist=decklist,
-            card=card,
-            is_sideboard=is_sideboard,
-            defaults={'quantity': quantity}
-        )
-        
-        # If card exists, update quantity
-        if not created:
-            decklist_card.quantity = quantity
-            decklist_card.save()
-        
         return {
             'success': True,
+            'card': card,
             'card_data': {
                 'name': card.name,
                 'quantity': quantity,
@@ -1,16 +1,25 @@
 import csv
-import io
-import re
-from typing import Dict, List, Tuple, Any, Optional
+import json
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Tuple, Any, Optional
 from django.db import transaction
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db.models import QuerySet
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 
 from collection.models import Collection, Card, CollectionCard
+from collection.services.card_list_parser import CardListParser
+from collection.services.card_resolver import CardResolver
+from collection.services.card_suggester import CardSuggester
+from collection.services.deck_simulator import DeckSimulator
 
 
 class ImportExport:
     """Service class for handling collection operations like import and export."""
+    # Most added cards, skipped cards and warnings listed in the result of a whole import
+    RESULT_SAMPLE_SIZE = 100
+    # Most cards kept between chunks of an import, so its memory use stays bounded
+    FETCHED_CARDS_LIMIT = 10000
     
     @staticmethod
     def parse_text_input(text: str) -> List[Dict[str, Any]]:
@@ -21,99 +30,139 @@ class ImportExport:
             text (str): Text containing card data
             
         Returns:
-            List[Dict]: List of cards with name and quantity
+            List[Dict]: List of cards with name and quantity, plus set_code and
+                collector_number for lines that name a printing
         """
-        cards_to_import = []
-        lines = text.strip().split('\n')
-        
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-            
-            # Try to match the line with different formats
-            # Format 1: "2 Lightning Bolt"
-            quantity_name_match = re.match(r'^(\d+)\s+(.+)$', line)
-            # Format 2: "Lightning Bolt (2)"
-            name_quantity_match = re.match(r'^(.+)\s+\((\d+)\)$', line)
-            # Format 3: "Lightning Bolt"
-            name_only_match = re.match(r'^([^0-9]+)$', line)
-            # Format 4: "4 Candy Trail (WOE) 243"
-            quantity_name_set_number_match = re.match(r'^(\d+)\s+(.+)\s+\(([A-Z0-9]+)\)\s+([A-Za-z0-9\-]+)$', line)
-            
-            card_data = None
-            if quantity_name_set_number_match:
-                quantity = int(quantity_name_set_number_match.group(1))
-                name = quantity_name_set_number_match.group(2).strip()
-                cards_to_import.append({'name': name, 'quantity': quantity})
-            elif quantity_name_match:
-                quantity = int(quantity_name_match.group(1))
-                name = quantity_name_match.group(2).strip()
-                cards_to_import.append({'name': name, 'quantity': quantity})
-            elif name_quantity_match:
-                name = name_quantity_match.group(1).strip()
-                quantity = int(name_quantity_match.group(2))
-                cards_to_import.append({'name': name, 'quantity': quantity})
-            elif name_only_match:
-                name = name_only_match.group(1).strip()
-                cards_to_import.append({'name': name, 'quantity': 1})
-        
-        return cards_to_import
+        cards = CardListParser.parse_text(text, merge=False)
+        return cards['mainboard'] + cards['sideboard']
     
     @staticmethod
-    def parse_csv_file(file) -> List[Dict[str, Any]]:
+    def parse_csv_file(file) -> Iterator[Dict[str, Any]]:
         """
-        Parse CSV file with cards.
+        Parse CSV file with cards, streaming it row by row.
         
         Args:
             file: File object containing CSV data
             
         Returns:
-            List[Dict]: List of cards with name and quantity
+            Iterator[Dict]: Cards with name and quantity, plus set_code and
+                collector_number for rows that name a printing
         """
-        cards_to_import = []
-        decoded_file = file.read().decode('utf-8')
-        csv_reader = csv.reader(io.StringIO(decoded_file))
+        lines = CardListParser.read_file_lines(file)
+        return (card_data for _, card_data in CardListParser.iter_csv(lines))
+    
+    @staticmethod
+    def parse_text_file(file) -> Iterator[Dict[str, Any]]:
+        """
+        Parse a text file with cards, streaming it line by line.
         
-        for row in csv_reader:
-            if not row:
-                continue
+        Args:
+            file: File object containing card lines
             
-            # Check if the row has at least 2 columns (quantity, name)
-            if len(row) >= 2:
-                try:
-                    quantity = int(row[0].strip())
-                    name = row[1].strip()
-                    cards_to_import.append({'name': name, 'quantity': quantity})
-                except (ValueError, IndexError):
-                    # If first column is not a number, assume it's the name with quantity 1
-                    cards_to_import.append({'name': row[0].strip(), 'quantity': 1})
-            else:
-                # If there's only one column, assume it's the name with quantity 1
-                cards_to_import.append({'name': row[0].strip(), 'quantity': 1})
-        
-        return cards_to_import
+        Returns:
+            Iterator[Dict]: Cards with name and quantity, plus set_code and
+                collector_number for lines that name a printing
+        """
+        lines = CardListParser.read_file_lines(file)
+        return (card_data for _, card_data in CardListParser.iter_lines(lines))
+    
+    @staticmethod
+    def empty_result() -> Dict[str, Any]:
+        """Get the result of an import that has not added or skipped anything yet."""
+        return {
+            'success': True,
+            'added_count': 0,
+            'skipped_count': 0,
+            'added_cards': [],
+            'skipped_cards': [],
+            'warnings': []
+        }
+    
+    @staticmethod
+    def merge_result(result: Dict[str, Any], batch_result: Dict[str, Any]):
+        """
+        Add a batch's result to the result of a whole import, in place.
+        
+        Counts are added up, while the added and skipped cards and the warnings
+        are only kept up to RESULT_SAMPLE_SIZE each, so the result of an import
+        does not grow with its input.
+        """
+        result['added_count'] += batch_result['added_count']
+        result['skipped_count'] += batch_result['skipped_count']
+        for key in ('added_cards', 'skipped_cards', 'warnings'):
+            result[key].extend(batch_result[key][:ImportExport.RESULT_SAMPLE_SIZE - len(result[key])])
     
     @staticmethod
-    @transaction.atomic
-    def process_card_import(collection: Collection, cards_to_import: List[Dict[str, Any]], 
-                           skip_unknown: bool = False) -> Dict[str, Any]:
+    def process_card_import(collection: Collection, cards_to_import: Iterable[Dict[str, Any]], 
+                           skip_unknown: bool = False, batch_size: int = 1000) -> Dict[str, Any]:
         """
         Process cards to import and add them to the collection.
         
+        Cards are resolved and written batch by batch, each batch committed on
+        its own, so a streamed upload starts writing before it has been read in
+        full and the database is only locked while a batch is written. Batches
+        committed before a failure stay imported, and an upload that turns out
+        not to be UTF-8 part way through returns the result of the cards
+        imported up to that point along with an error.
+        
+        Args:
+            collection: Collection model instance
+            cards_to_import: Cards with name and quantity, and optionally set_code and collector_number
+            skip_unknown: Whether to skip unknown cards or report them as warnings
+            batch_size: Number of cards resolved and written at a time
+            
+        Returns:
+            Dict: Result containing success status, the number of added and
+                skipped cards, and the first RESULT_SAMPLE_SIZE added cards,
+                skipped cards and warnings
+        """
+        result = ImportExport.empty_result()
+        processed = 0
+        try:
+            for processed, batch_result in ImportExport.iter_card_import(
+                collection, cards_to_import, skip_unknown, batch_size
+            ):
+                ImportExport.merge_result(result, batch_result)
+        except UnicodeDecodeError:
+            result['success'] = False
+            result['error'] = ImportExport.decode_error(processed)
+        return result
+    
+    @staticmethod
+    def decode_error(processed: int) -> str:
+        """Get the error for an upload that is not valid UTF-8 after its first processed cards."""
+        if not processed:
+            return 'The uploaded file is not valid UTF-8 text.'
+        return (f'The uploaded file is not valid UTF-8 text after its first {processed} cards, '
+                f'which were imported. The rest of the file was not.')
+    
+    @staticmethod
+    def _import_batch(collection: Collection, batch: List[Dict[str, Any]], skip_unknown: bool,
+                      fetched: Dict[int, Card]) -> Dict[str, Any]:
+        """
+        Resolve a batch of cards and add them to the collection in one transaction.
+        
         Args:
             collection: Collection model instance
-            cards_to_import: List of cards with name and quantity
+            batch: Cards with name and quantity, and optionally set_code and collector_number
             skip_unknown: Whether to skip unknown cards or report them as warnings
+            fetched: Cards fetched by earlier batches, keyed by id, extended in place
             
         Returns:
-            Dict: Result containing success status, added cards, skipped cards, and warnings
+            Dict: Result of the batch, listing all of its added and skipped cards
         """
         added_cards = []
         skipped_cards = []
         warnings = []
         
-        for card_data in cards_to_import:
+        # Resolve the batch at once through the shared in-memory index, using the
+        # exact printing where the line names one and the card name otherwise
+        cards = CardResolver.get_cards(batch, fetched)
+        
+        # Total quantity to add per card, so duplicate lines become a single write
+        quantities = {}
+            
+        for card_data, card in zip(batch, cards):
             name = card_data['name']
             quantity = card_data['quantity']
             
@@ -121,36 +170,16 @@ class ImportExport:
             if not name:
                 continue
             
-            # Try to find the card in the database
-            cards = Card.objects.filter(name__iexact=name)
-            
-            if not cards.exists():
+            if card is None:
                 # If card not found, add to skipped list
                 skipped_cards.append({
                     'name': name,
                     'quantity': quantity,
                     'reason': 'Card not found in database'
                 })
-                
-                if not skip_unknown:
-                    warnings.append(f"Card not found: {name}")
-                
                 continue
             
-            # Get latest printing of the card
-            card = cards.order_by('-set_code').first()
-            
-            # Check if card is already in collection
-            collection_card, created = CollectionCard.objects.get_or_create(
-                collection=collection,
-                card=card,
-                defaults={'quantity': 0}
-            )
-            
-            # Update quantity (skip if the card is marked as infinite)
-            if collection_card.quantity != -1:
-                collection_card.quantity += quantity
-                collection_card.save()
+            quantities[card.id] = quantities.get(card.id, 0) + quantity
             
             added_cards.append({
                 'name': card.name,
@@ -159,6 +188,46 @@ class ImportExport:
                 'collector_number': card.collector_number
             })
         
+        if skipped_cards:
+            # Close matches for every unknown name of the batch are found in one pass
+            suggestions = CardSuggester.suggest(card_data['name'] for card_data in skipped_cards)
+            for card_data in skipped_cards:
+                card_data['suggestions'] = suggestions.get(card_data['name'], [])
+                if not skip_unknown:
+                    warning = f"Card not found: {card_data['name']}"
+                    if card_data['suggestions']:
+                        warning += f" (did you mean {' or '.join(card_data['suggestions'])}?)"
+                    warnings.append(warning)
+        
+        if quantities:
+            with transaction.atomic():
+                # Current quantities are read in the batch's transaction, so changes
+                # committed between batches are added to rather than overwritten
+                existing = dict(
+                    CollectionCard.objects.filter(
+                        collection=collection, card_id__in=list(quantities)
+                    ).values_list('card_id', 'quantity')
+                )
+            
+                # New rows and changed quantities are written with one multi-row
+                # INSERT ... ON CONFLICT, which is much cheaper than bulk_update's CASE
+                collection_cards = []
+                for card_id, quantity in quantities.items():
+                    current = existing.get(card_id, 0)
+                    # Cards marked as infinite keep their quantity
+                    if current != -1:
+                        collection_cards.append(
+                            CollectionCard(collection=collection, card_id=card_id, quantity=current + quantity)
+                        )
+            
+                CollectionCard.objects.bulk_create(
+                    collection_cards,
+                    update_conflicts=True,
+                    unique_fields=['collection', 'card'],
+                    update_fields=['quantity'],
+                )
+                DeckSimulator.invalidate(collection.id)
+        
         return {
             'success': True,
             'added_count': len(added_cards),
@@ -168,6 +237,109 @@ class ImportExport:
             'warnings': warnings
         }
     
+    @staticmethod
+    def iter_card_import(collection: Collection, cards_to_import: Iterable[Dict[str, Any]],
+                         skip_unknown: bool = False, batch_size: int = 1000,
+                         first_batch_size: Optional[int] = None) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """
+        Import cards into the collection chunk by chunk, committing each chunk on its own.
+        
+        Chunks start at first_batch_size and double up to batch_size, so the first
+        results are ready quickly while large imports still write in big batches.
+        
+        Args:
+            collection: Collection model instance
+            cards_to_import: Cards with name and quantity, and optionally set_code and collector_number
+            skip_unknown: Whether to skip unknown cards or report them as warnings
+            batch_size: Largest number of cards imported per chunk
+            first_batch_size: Number of cards in the first chunk, batch_size if not given
+            
+        Yields:
+            Tuple: (processed, result) with the number of lines processed so far and
+                the result of the chunk, listing all of its added and skipped cards
+        """
+        cards_to_import = iter(cards_to_import)
+        size = min(first_batch_size or batch_size, batch_size)
+        processed = 0
+        # Cards fetched so far, so cards repeated across chunks are fetched once
+        fetched = {}
+        while True:
+            chunk = list(islice(cards_to_import, size))
+            if not chunk:
+                break
+            
+            if len(fetched) > ImportExport.FETCHED_CARDS_LIMIT:
+                fetched.clear()
+            
+            result = ImportExport._import_batch(collection, chunk, skip_unknown, fetched)
+            processed += len(chunk)
+            yield processed, result
+            size = min(size * 2, batch_size)
+    
+    @staticmethod
+    def stream_card_import(collection: Collection, cards_to_import: Iterable[Dict[str, Any]],
+                           skip_unknown: bool = False) -> StreamingHttpResponse:
+        """
+        Import cards into the collection, streaming the results as server-sent events.
+        
+        Each chunk emits an "added" or "skipped" event per line followed by a
+        "progress" event, and the stream ends with a "done" event holding the
+        totals and warnings, or an "error" event holding the totals of the
+        chunks committed before the failure.
+        
+        Args:
+            collection: Collection model instance
+            cards_to_import: Cards with name and quantity, read lazily as the import runs
+            skip_unknown: Whether to skip unknown cards or report them as warnings
+            
+        Returns:
+            StreamingHttpResponse: text/event-stream response running the import
+        """
+        def event(name, data):
+            return f"event: {name}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
+        
+        def events():
+            totals = ImportExport.empty_result()
+            processed = 0
+            try:
+                for processed, result in ImportExport.iter_card_import(
+                    collection, cards_to_import, skip_unknown, first_batch_size=50
+                ):
+                    for card in result['added_cards']:
+                        yield event('added', card)
+                    for card in result['skipped_cards']:
+                        yield event('skipped', card)
+                    
+                    ImportExport.merge_result(totals, result)
+                    yield event('progress', {
+                        'processed': processed,
+                        'added_count': totals['added_count'],
+                        'skipped_count': totals['skipped_count']
+                    })
+            except Exception as e:
+                # Chunks committed before the failure stay imported
+                yield event('error', {
+                    'success': False,
+                    'error': ImportExport.decode_error(processed) if isinstance(e, UnicodeDecodeError) else str(e),
+                    'processed': processed,
+                    'added_count': totals['added_count'],
+                    'skipped_count': totals['skipped_count']
+                })
+                return
+            
+            yield event('done', {
+                'success': True,
+                'added_count': totals['added_count'],
+                'skipped_count': totals['skipped_count'],
+                'warnings': totals['warnings']
+            })
+        
+        response = StreamingHttpResponse(events(), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Stop nginx from buffering the stream
+        response['X-Accel-Buffering'] = 'no'
+        return response
+    
     @staticmethod
     def export_collection_to_csv(collection: Collection) -> HttpResponse:
         """
@@ -182,7 +354,7 @@ class ImportExport:
         # Get all cards in the collection
         collection_cards = CollectionCard.objects.filter(
             collection=collection
-        ).select_related('card')
+        ).select_related('card__oracle_card')
         
         # Create CSV response
         response = HttpResponse(content_type='text/csv')
@@ -0,0 +1,299 @@
+# services/import_jobs.py
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from itertools import islice
+from typing import Any, Dict, Iterator, Optional
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from collection.models import Collection, Decklist, ImportJob
+from collection.services.card_list_parser import CardListParser
+from collection.services.decklist_importer import DecklistImporter
+from collection.services.import_export import ImportExport
+
+logger = logging.getLogger(__name__)
+
+
+class ImportJobSuperseded(Exception):
+    """Raised when a job was queued again and claimed by another worker while this one ran it."""
+
+
+class ImportJobRunner:
+    """
+    Service class for submitting and running background import jobs.
+    
+    Submitted jobs wait for the run_import_jobs management command, or are
+    also handed to a thread pool in the web process when IMPORT_JOB_WORKERS is
+    set above zero. Either way a job is claimed with an atomic status update,
+    so no two workers run it at once.
+    Running jobs record a heartbeat as they progress. A job whose heartbeat is
+    older than IMPORT_JOB_STALE_SECONDS lost its worker, and run_next queues it
+    again. Collection imports commit their progress with each chunk, so a job
+    queued again resumes after the last chunk it imported.
+    Each claim counts an attempt, and every write a worker makes to its job is
+    filtered on the attempt it claimed. A worker that only looked stale finds
+    its job claimed again at its next write, rolls that write back and stops.
+    """
+    # Cards committed per transaction, so progress is visible while a collection import runs
+    CHUNK_SIZE = 1000
+    
+    _executor = None
+    _executor_lock = threading.Lock()
+    
+    @staticmethod
+    def submit_collection_import(collection: Collection, input_data: str, input_format: str = 'text',
+                                 skip_unknown: bool = False) -> ImportJob:
+        """
+        Queue an import of cards into a collection.
+        
+        Args:
+            collection: Collection model instance
+            input_data: The card list as text or CSV
+            input_format: 'text' or 'csv'
+            skip_unknown: Whether to skip unknown cards or report them as warnings
+            
+        Returns:
+            ImportJob: The pending job
+        """
+        job = ImportJob.objects.create(
+            kind=ImportJob.KIND_COLLECTION,
+            collection=collection,
+            input_format=input_format,
+            input_data=input_data,
+            options={'skip_unknown': skip_unknown},
+            total_lines=ImportJobRunner._count_lines(input_data, input_format),
+        )
+        ImportJobRunner._dispatch(job)
+        return job
+    
+    @staticmethod
+    def submit_decklist_import(decklist: Decklist, input_data: str, input_format: str = 'text',
+                               clear_existing: bool = False) -> ImportJob:
+        """
+        Queue an import of cards into a decklist.
+        
+        Args:
+            decklist: Decklist model instance
+            input_data: The deck list as text or CSV
+            input_format: 'text' or 'csv'
+            clear_existing: Whether to remove existing cards that are not part of the import
+            
+        Returns:
+            ImportJob: The pending job
+        """
+        job = ImportJob.objects.create(
+            kind=ImportJob.KIND_DECKLIST,
+            collection=decklist.collection,
+            decklist=decklist,
+            input_format=input_format,
+            input_data=input_data,
+            options={'clear_existing': clear_existing},
+            total_lines=ImportJobRunner._count_lines(input_data, input_format),
+        )
+        ImportJobRunner._dispatch(job)
+        return job
+    
+    @staticmethod
+    def _count_lines(input_data: str, input_format: str) -> int:
+        """Count the cards of a card list as the parser reads them, used as the job's progress total."""
+        return sum(1 for _ in ImportJobRunner._iter_cards(input_data, input_format))
+    
+    @classmethod
+    def _dispatch(cls, job: ImportJob):
+        """Hand a job to the local worker pool once it is committed, if the pool is enabled."""
+        workers = getattr(settings, 'IMPORT_JOB_WORKERS', 0)
+        if workers <= 0:
+            return
+        
+        with cls._executor_lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='import-job')
+        
+        job_id = job.id
+        transaction.on_commit(lambda: cls._executor.submit(cls._run_in_thread, job_id))
+    
+    @classmethod
+    def _run_in_thread(cls, job_id: int):
+        """Run a job in a pool thread, closing the thread's database connection afterwards."""
+        try:
+            cls.run_job(job_id)
+        finally:
+            connection.close()
+    
+    @staticmethod
+    def claim(job_id: int) -> Optional[ImportJob]:
+        """
+        Mark a pending job as running.
+        
+        Returns:
+            ImportJob: The claimed job, or None if it is no longer pending
+        """
+        now = timezone.now()
+        claimed = ImportJob.objects.filter(id=job_id, status=ImportJob.STATUS_PENDING).update(
+            status=ImportJob.STATUS_RUNNING,
+            started_at=now,
+            heartbeat_at=now,
+            attempts=F('attempts') + 1,
+        )
+        return ImportJob.objects.get(id=job_id) if claimed else None
+    
+    @staticmethod
+    def requeue_stale() -> int:
+        """
+        Queue again the running jobs whose worker stopped reporting progress.
+        
+        Returns:
+            int: Number of jobs queued again
+        """
+        stale_before = timezone.now() - timedelta(seconds=getattr(settings, 'IMPORT_JOB_STALE_SECONDS', 300))
+        requeued = ImportJob.objects.filter(
+            Q(heartbeat_at__lt=stale_before) | Q(heartbeat_at__isnull=True, started_at__lt=stale_before),
+            status=ImportJob.STATUS_RUNNING,
+        ).update(status=ImportJob.STATUS_PENDING, heartbeat_at=None)
+        if requeued:
+            logger.warning(f"Queued {requeued} stale import jobs again")
+        return requeued
+    
+    @staticmethod
+    def run_next() -> Optional[ImportJob]:
+        """
+        Claim and run the oldest pending job, after queueing stale jobs again.
+        
+        Returns:
+            ImportJob: The job that was run, or None if no job is pending
+        """
+        ImportJobRunner.requeue_stale()
+        
+        while True:
+            pending = ImportJob.objects.filter(status=ImportJob.STATUS_PENDING).order_by('created_at', 'id')
+            job_id = pending.values_list('id', flat=True).first()
+            if job_id is None:
+                return None
+            
+            job = ImportJobRunner.run_job(job_id)
+            if job is not None:
+                return job
+            # Another worker claimed it first, try the next one
+    
+    @staticmethod
+    def run_job(job_id: int) -> Optional[ImportJob]:
+        """
+        Claim and run a job, recording its result or error.
+        
+        A failed job keeps the progress its chunks committed, so it is not
+        written with the error.
+        
+        Returns:
+            ImportJob: The finished job, or None if it was not pending or
+                another worker claimed it again while it ran
+        """
+        job = ImportJobRunner.claim(job_id)
+        if job is None:
+            return None
+        
+        try:
+            if job.kind == ImportJob.KIND_DECKLIST:
+                # The import and its result commit together, so a superseded worker leaves no changes
+                with transaction.atomic():
+                    result = ImportJobRunner._run_decklist_import(job)
+                    ImportJobRunner._finish(job, ImportJob.STATUS_COMPLETED, result=result,
+                                            processed_lines=job.total_lines)
+            else:
+                result = ImportJobRunner._run_collection_import(job)
+                ImportJobRunner._finish(job, ImportJob.STATUS_COMPLETED, result=result,
+                                        processed_lines=job.total_lines)
+        except ImportJobSuperseded:
+            logger.warning(f"Import job {job.id} was claimed by another worker, stopping")
+            return None
+        except Exception as e:
+            logger.exception(f"Import job {job.id} failed")
+            try:
+                ImportJobRunner._finish(job, ImportJob.STATUS_FAILED, error=str(e))
+            except ImportJobSuperseded:
+                return None
+        
+        return job
+    
+    @staticmethod
+    def _update(job: ImportJob, **fields):
+        """
+        Write fields of a job, as long as it is still running under this worker's claim.
+        
+        Raises:
+            ImportJobSuperseded: If the job was claimed again since this worker claimed it
+        """
+        updated = ImportJob.objects.filter(
+            id=job.id, status=ImportJob.STATUS_RUNNING, attempts=job.attempts
+        ).update(**fields)
+        if not updated:
+            raise ImportJobSuperseded(f"Import job {job.id} was claimed again")
+    
+    @staticmethod
+    def _finish(job: ImportJob, status: str, **fields):
+        """Record the final status of a job along with the given fields, such as its result or error."""
+        fields.update(status=status, finished_at=timezone.now())
+        ImportJobRunner._update(job, **fields)
+        for name, value in fields.items():
+            setattr(job, name, value)
+    
+    @staticmethod
+    def _iter_cards(input_data: str, input_format: str) -> Iterator[Dict[str, Any]]:
+        """Parse a job's card list lazily, ignoring sections."""
+        if input_format == 'csv':
+            cards = CardListParser.iter_csv(io.StringIO(input_data))
+        else:
+            cards = CardListParser.iter_lines(input_data.splitlines())
+        return (card_data for _, card_data in cards)
+    
+    @staticmethod
+    def _run_collection_import(job: ImportJob) -> Dict[str, Any]:
+        """
+        Import the job's cards into its collection chunk by chunk.
+        
+        Each chunk is committed on its own together with the job's progress, so a
+        failed job keeps the chunks imported before the failure, and a job queued
+        again after losing its worker skips them. A chunk whose progress can no
+        longer be recorded, because the job was claimed again, is rolled back.
+        The result lists a sample of the added and skipped cards, as in
+        ImportExport.process_card_import.
+        """
+        result = ImportExport.empty_result()
+        
+        resumed_from = job.processed_lines
+        if resumed_from:
+            result['warnings'].append(f"Resumed after {resumed_from} cards imported before the job was interrupted")
+        
+        cards = islice(ImportJobRunner._iter_cards(job.input_data, job.input_format), resumed_from, None)
+        chunks = ImportExport.iter_card_import(
+            job.collection, cards, job.options.get('skip_unknown', False), ImportJobRunner.CHUNK_SIZE
+        )
+        while True:
+            with transaction.atomic():
+                step = next(chunks, None)
+                if step is None:
+                    break
+                processed, chunk_result = step
+                ImportJobRunner._update(
+                    job, processed_lines=resumed_from + processed, heartbeat_at=timezone.now()
+                )
+            
+            ImportExport.merge_result(result, chunk_result)
+        
+        return result
+    
+    @staticmethod
+    def _run_decklist_import(job: ImportJob) -> Dict[str, Any]:
+        """Import the job's cards into its decklist in a single transaction."""
+        if job.input_format == 'csv':
+            card_data = CardListParser.parse_csv(io.StringIO(job.input_data))
+        else:
+            card_data = CardListParser.parse_text(job.input_data)
+        
+        return DecklistImporter.import_cards_to_decklist(
+            job.decklist, card_data, job.options.get('clear_existing', False)
+        )
@@ -1,3 +1,472 @@
-from django.test import TestCase
+import io
+import json
+import os
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.utils import timezone
+
+from collection.models import Card, Collection, CollectionCard, Decklist, DecklistCard, ImportJob, OracleCard, SeedRun
+from collection.services.card_demand import CardDemandTracker
+from collection.services.card_list_parser import CardListParser
+from collection.services.card_query import CardQuery, CardQueryError
+from collection.services.card_resolver import CardResolver
+from collection.services.card_rows import normalize_name
+from collection.services.card_seeder import CardSeeder, iter_json_array
+from collection.services.deck_simulator import DeckSimulator
+from collection.services.deck_status import DeckStatusEngine
+from collection.services.decklist_importer import DecklistImporter
+from collection.services.import_export import ImportExport
+from collection.services.import_jobs import ImportJobRunner, ImportJobSuperseded
+
+
+class CardListParserTests(SimpleTestCase):
+    def test_merges_repeated_lines_of_the_same_card(self):
+        result = CardListParser.parse_text("2 Lightning Bolt\n1 lightning bolt\nSideboard\n1 Lightning Bolt")
+        
+        self.assertEqual(result['mainboard'], [{'name': 'Lightning Bolt', 'quantity': 3}])
+        self.assertEqual(result['sideboard'], [{'name': 'Lightning Bolt', 'quantity': 1}])
+    
+    def test_keeps_different_printings_apart(self):
+        result = CardListParser.parse_text(
+            "2 Fire // Ice (MH2) 290\n2 Fire // Ice (DMR) 400\n1 Fire // Ice (mh2) 290\n1 Fire // Ice",
+            merge=True
+        )
+        
+        self.assertEqual(result['mainboard'], [
+            {'name': 'Fire // Ice', 'quantity': 3, 'set_code': 'MH2', 'collector_number': '290'},
+            {'name': 'Fire // Ice', 'quantity': 2, 'set_code': 'DMR', 'collector_number': '400'},
+            {'name': 'Fire // Ice', 'quantity': 1},
+        ])
+    
+    def test_keeps_every_line_without_merging(self):
+        result = CardListParser.parse_text("2 Lightning Bolt\n1 Lightning Bolt", merge=False)
+        
+        self.assertEqual([card['quantity'] for card in result['mainboard']], [2, 1])
+    
+    def test_merges_csv_rows_by_printing(self):
+        result = CardListParser.parse_csv(["2,Fire // Ice,MH2,290", "1,Fire // Ice,DMR,400", "1,Fire // Ice,MH2,290"])
+        
+        self.assertEqual([(card['set_code'], card['quantity']) for card in result['mainboard']], [('MH2', 3), ('DMR', 1)])
+
+
+class IterJsonArrayTests(SimpleTestCase):
+    def test_parses_elements_split_across_reads(self):
+        items = [{'name': 'Fire // Ice', 'text': 'Deals 2 damage, [then] "taps" {x}'}, 17, 2.5, 'a,]', [], None]
+        text = ' [ ' + ' ,\n'.join(json.dumps(item) for item in items) + ' ] '
+        
+        for chunk_size in (1, 3, 7, 1024):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(list(iter_json_array(io.StringIO(text), chunk_size=chunk_size)), items)
+    
+    def test_empty_array(self):
+        self.assertEqual(list(iter_json_array(io.StringIO(' [ ] '), chunk_size=2)), [])
+    
+    def test_rejects_malformed_input(self):
+        for text in ('{"name": "Bolt"}', '[1 2]', '[1, 2'):
+            with self.subTest(text=text), self.assertRaises(ValueError):
+                list(iter_json_array(io.StringIO(text), chunk_size=2))
+
+
+class CardSeederTests(TransactionTestCase):
+    """Seeding runs on a real database connection, as the pipeline's writer thread opens its own."""
+    
+    MODES = {
+        'sequential': {},
+        'pipelined': {'workers': 2},
+        'bulk load': {'bulk_load': True},
+    }
+    
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+    
+    @staticmethod
+    def scryfall_card(name, collector_number, oracle_text='', set_code='s00', oracle_id=None):
+        return {
+            'object': 'card', 'oracle_id': oracle_id or f'{name}-oracle', 'name': name,
+            'set': set_code, 'collector_number': collector_number, 'type_line': 'Instant',
+            'oracle_text': oracle_text, 'rarity': 'common', 'released_at': '2020-01-01',
+        }
+    
+    def write_cards(self, cards, filename='cards.json'):
+        """Write cards in Scryfall's one-card-per-line layout."""
+        path = os.path.join(self.directory, filename)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('[\n' + ',\n'.join(json.dumps(card) for card in cards) + '\n]\n')
+        return path
+    
+    @staticmethod
+    def stored_cards():
+        return sorted(Card.objects.values_list('set_code', 'collector_number', 'oracle_card__oracle_text'))
+    
+    def test_modes_count_and_store_cards_alike(self):
+        # With two cards per batch: a duplicate within the first batch, a changed
+        # repeat in the second and an identical repeat in the third
+        path = self.write_cards([
+            self.scryfall_card('Lightning Bolt', '1'),
+            self.scryfall_card('Lightning Bolt', '1', 'changed'),
+            self.scryfall_card('Llanowar Elves', '2'),
+            self.scryfall_card('Lightning Bolt', '1', 'changed again'),
+            self.scryfall_card('No Set', '3', set_code=''),
+            self.scryfall_card('Llanowar Elves', '2'),
+        ])
+        
+        for mode, options in self.MODES.items():
+            with self.subTest(mode=mode):
+                Card.objects.all().delete()
+                OracleCard.objects.all().delete()
+                
+                first = CardSeeder(**options).process_cards(path, batch_size=2)
+                self.assertEqual(first, {'total': 6, 'imported': 2, 'updated': 1, 'unchanged': 1, 'skipped': 2})
+                self.assertEqual(self.stored_cards(), [('s00', '1', 'changed again'), ('s00', '2', '')])
+                
+                # Seeding again compares the first batch with the stored cards
+                second = CardSeeder(**options).process_cards(path, batch_size=2)
+                self.assertEqual(second, {'total': 6, 'imported': 0, 'updated': 2, 'unchanged': 2, 'skipped': 2})
+                self.assertEqual(self.stored_cards(), [('s00', '1', 'changed again'), ('s00', '2', '')])
+    
+    def test_unchanged_cards_are_not_written(self):
+        path = self.write_cards([self.scryfall_card('Lightning Bolt', '1'), self.scryfall_card('Llanowar Elves', '2')])
+        CardSeeder().process_cards(path)
+        Card.objects.update(name='Renamed')
+        
+        stats = CardSeeder().process_cards(path)
+        
+        self.assertEqual((stats['imported'], stats['updated'], stats['unchanged']), (0, 0, 2))
+        self.assertEqual(set(Card.objects.values_list('name', flat=True)), {'Renamed'})
+    
+    def test_removes_oracle_cards_without_printings(self):
+        CardSeeder().process_cards(self.write_cards([self.scryfall_card('Lightning Bolt', '1')]))
+        CardSeeder().process_cards(self.write_cards([self.scryfall_card('Lightning Bolt', '1', oracle_id='errata')]))
+        
+        self.assertEqual(list(OracleCard.objects.values_list('oracle_id', flat=True)), ['errata'])
+        self.assertEqual(OracleCard.objects.get().preferred_printing, Card.objects.get())
+    
+    def test_run_skips_unchanged_file(self):
+        path = self.write_cards([self.scryfall_card('Lightning Bolt', '1'), self.scryfall_card('No Set', '2', set_code='')])
+        
+        def download(seeder, force=False):
+            seeder.updated_at = timezone.now()
+            return path
+        
+        with mock.patch.object(CardSeeder, 'download_bulk_data', download):
+            self.assertTrue(CardSeeder().run())
+            with mock.patch.object(CardSeeder, 'process_cards') as process_cards:
+                self.assertTrue(CardSeeder().run())
+                process_cards.assert_not_called()
+        
+        first, second = SeedRun.objects.order_by('id')
+        self.assertEqual(first.checksum, second.checksum)
+        self.assertEqual((first.imported_cards, first.unchanged_cards, first.skipped_cards), (1, 0, 1))
+        self.assertEqual((second.imported_cards, second.unchanged_cards, second.skipped_cards), (0, 1, 1))
+
+
+class CardResolverTests(TestCase):
+    def setUp(self):
+        self.bolt = self.make_card('Lightning Bolt', 'a', '1')
+        self.bolt_reprint = self.make_card('Lightning Bolt', 'b', '7', oracle_card=self.bolt.oracle_card)
+        self.fire_ice = self.make_card('Fire // Ice', 'a', '2')
+        self.elf = self.make_card('Llanowar Elves', 'a', '3')
+        CardResolver.invalidate()
+    
+    @staticmethod
+    def make_card(name, set_code, collector_number, oracle_card=None):
+        if oracle_card is None:
+            oracle_card = OracleCard.objects.create(
+                oracle_id=f'{name}-oracle', name=name, normalized_name=normalize_name(name),
+                normalized_face_name=normalize_name(name.split(' // ')[0]),
+            )
+        card = Card.objects.create(oracle_card=oracle_card, name=name, set_code=set_code, collector_number=collector_number)
+        if oracle_card.preferred_printing is None:
+            oracle_card.preferred_printing = card
+            oracle_card.save()
+        return card
+    
+    def test_names_resolve_to_the_preferred_printing(self):
+        cards = CardResolver.get_cards([{'name': 'lightning bolt'}, {'name': 'Fire // Ice'}, {'name': 'fire'}, {'name': 'Nope'}])
+        
+        self.assertEqual(cards, [self.bolt, self.fire_ice, self.fire_ice, None])
+    
+    def test_printings_resolve_to_that_printing(self):
+        cards = CardResolver.get_cards([
+            {'name': 'Lightning Bolt', 'set_code': 'B', 'collector_number': '7'},
+            {'name': 'Fire', 'set_code': 'a', 'collector_number': '2'},
+            {'name': 'Lightning Bolt', 'set_code': 'b', 'collector_number': '99'},
+        ])
+        
+        self.assertEqual(cards, [self.bolt_reprint, self.fire_ice, self.bolt])
+    
+    def test_printing_of_another_card_falls_back_to_the_name(self):
+        cards = CardResolver.get_cards([{'name': 'Lightning Bolt', 'set_code': 'a', 'collector_number': '3'}])
+        
+        self.assertEqual(cards, [self.bolt])
+    
+    def test_reuses_fetched_cards(self):
+        fetched = {}
+        CardResolver.get_cards([{'name': 'Lightning Bolt'}], fetched)
+        
+        # The seed run check, and fetching the one card not fetched before
+        with self.assertNumQueries(2):
+            cards = CardResolver.get_cards([{'name': 'Lightning Bolt'}, {'name': 'Llanowar Elves'}], fetched)
+        self.assertEqual(cards, [self.bolt, self.elf])
+
+
+class ImportJobTests(TestCase):
+    def setUp(self):
+        self.collection = Collection.objects.create(name='Jobs')
+        self.cards = [
+            CardResolverTests.make_card(f'Card {number}', 'a', str(number)) for number in range(5)
+        ]
+        CardResolver.invalidate()
+        self.text = ''.join(f'{number + 1} Card {number}\n' for number in range(5))
+    
+    def owned(self):
+        return dict(CollectionCard.objects.filter(collection=self.collection).values_list('card__name', 'quantity'))
+    
+    def test_job_is_claimed_once(self):
+        job = ImportJobRunner.submit_collection_import(self.collection, self.text)
+        
+        self.assertEqual(ImportJobRunner.claim(job.id).attempts, 1)
+        self.assertIsNone(ImportJobRunner.claim(job.id))
+        self.assertIsNone(ImportJobRunner.run_job(job.id))
+    
+    def test_runs_job_in_chunks(self):
+        job = ImportJobRunner.submit_collection_import(self.collection, self.text)
+        
+        with mock.patch.object(ImportJobRunner, 'CHUNK_SIZE', 2):
+            job = ImportJobRunner.run_next()
+        
+        self.assertEqual((job.status, job.processed_lines, job.total_lines), (ImportJob.STATUS_COMPLETED, 5, 5))
+        self.assertEqual(job.result['added_count'], 5)
+        self.assertEqual(self.owned(), {f'Card {number}': number + 1 for number in range(5)})
+    
+    def test_failed_job_keeps_progress_and_resumes(self):
+        job = ImportJobRunner.submit_collection_import(self.collection, self.text)
+        import_batch = ImportExport._import_batch
+        
+        def fail_on_third_chunk(collection, batch, *args):
+            if batch[0]['name'] == 'Card 4':
+                raise RuntimeError('Lost the database')
+            return import_batch(collection, batch, *args)
+        
+        with mock.patch.object(ImportJobRunner, 'CHUNK_SIZE', 2):
+            with mock.patch.object(ImportExport, '_import_batch', staticmethod(fail_on_third_chunk)), \
+                    self.assertLogs('collection.services.import_jobs', 'ERROR'):
+                failed = ImportJobRunner.run_job(job.id)
+            
+            failed.refresh_from_db()
+            self.assertEqual((failed.status, failed.processed_lines, failed.error),
+                             (ImportJob.STATUS_FAILED, 4, 'Lost the database'))
+            
+            ImportJob.objects.filter(id=job.id).update(status=ImportJob.STATUS_PENDING)
+            resumed = ImportJobRunner.run_job(job.id)
+        
+        self.assertEqual((resumed.status, resumed.processed_lines, resumed.attempts), (ImportJob.STATUS_COMPLETED, 5, 2))
+        self.assertEqual(resumed.result['added_count'], 1)
+        self.assertIn('Resumed after 4 cards', resumed.result['warnings'][0])
+        self.assertEqual(self.owned(), {f'Card {number}': number + 1 for number in range(5)})
+    
+    def test_stale_job_is_requeued(self):
+        job = ImportJobRunner.submit_collection_import(self.collection, self.text)
+        ImportJobRunner.claim(job.id)
+        
+        self.assertEqual(ImportJobRunner.requeue_stale(), 0)
+        ImportJob.objects.filter(id=job.id).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+        with self.assertLogs('collection.services.import_jobs', 'WARNING'):
+            self.assertEqual(ImportJobRunner.requeue_stale(), 1)
+        self.assertEqual(ImportJobRunner.run_next().status, ImportJob.STATUS_COMPLETED)
+    
+    def test_superseded_worker_stops_without_writing(self):
+        job = ImportJobRunner.submit_collection_import(self.collection, self.text)
+        stale = ImportJobRunner.claim(job.id)
+        ImportJob.objects.filter(id=job.id).update(status=ImportJob.STATUS_PENDING)
+        ImportJobRunner.claim(job.id)
+        
+        with self.assertRaises(ImportJobSuperseded):
+            ImportJobRunner._run_collection_import(stale)
+        self.assertEqual(self.owned(), {})
+        self.assertEqual(ImportJob.objects.get(id=job.id).processed_lines, 0)
+
+
+class DecklistImportTests(TestCase):
+    def setUp(self):
+        self.bolt = CardResolverTests.make_card('Lightning Bolt', 'a', '1')
+        self.elf = CardResolverTests.make_card('Llanowar Elves', 'a', '2')
+        self.forest = CardResolverTests.make_card('Forest', 'a', '3')
+        CardResolver.invalidate()
+        
+        collection = Collection.objects.create(name='Decks')
+        self.decklist = Decklist.objects.create(name='Deck', collection=collection)
+        DecklistCard.objects.create(decklist=self.decklist, card=self.bolt, quantity=4)
+        DecklistCard.objects.create(decklist=self.decklist, card=self.elf, quantity=4)
+    
+    def import_text(self, text, clear_existing):
+        return DecklistImporter.import_cards_to_decklist(
+            self.decklist, CardListParser.parse_text(text), clear_existing
+        )
+    
+    def deck(self):
+        return sorted(DecklistCard.objects.filter(decklist=self.decklist).values_list('card__name', 'is_sideboard', 'quantity'))
+    
+    def test_merges_into_existing_cards(self):
+        result = self.import_text("2 Lightning Bolt\n1 lightning bolt\n10 Forest\nSideboard\n1 Lightning Bolt", False)
+        
+        self.assertEqual(result['skipped_count'], 0)
+        self.assertEqual(self.deck(), [
+            ('Forest', False, 10), ('Lightning Bolt', False, 3), ('Lightning Bolt', True, 1), ('Llanowar Elves', False, 4),
+        ])
+    
+    def test_clearing_removes_cards_missing_from_the_import(self):
+        result = self.import_text("4 Lightning Bolt\n1 Nope", True)
+        
+        self.assertEqual(result['skipped_count'], 1)
+        self.assertEqual(self.deck(), [('Lightning Bolt', False, 4)])
+
+
+class CardQueryTests(TestCase):
+    def test_rejects_invalid_terms(self):
+        for text in ('foo:bar', 'c:purple', 'cmc>=many', 'is:shiny', 'o>bolt', 'is:owned'):
+            with self.subTest(text=text), self.assertRaises(CardQueryError):
+                CardQuery.compile(text)
+    
+    def test_recognizes_query_syntax(self):
+        self.assertTrue(CardQuery.is_query('t:elf'))
+        self.assertTrue(CardQuery.is_query('-bolt'))
+        self.assertFalse(CardQuery.is_query('lightning bolt'))
+
+
+class DeckStatusTests(TestCase):
+    def setUp(self):
+        self.bolt_a = self.make_card('Lightning Bolt', 'a', '1')
+        self.bolt_b = self.make_card('Lightning Bolt', 'b', '1', oracle_card=self.bolt_a.oracle_card)
+        self.elf = self.make_card('Llanowar Elves', 'a', '2')
+        self.forest = self.make_card('Forest', 'a', '3')
+        self.ghost = self.make_card('Ghostly Flicker', 'a', '4')
+        
+        self.collection = Collection.objects.create(name='Test')
+        for card, quantity in ((self.bolt_a, 2), (self.bolt_b, 2), (self.elf, 1), (self.forest, -1)):
+            CollectionCard.objects.create(collection=self.collection, card=card, quantity=quantity)
+        
+        self.missing = self.make_deck('Missing', [(self.ghost, 1)])
+        self.short = self.make_deck('Short', [(self.elf, 2)])
+        self.lands = self.make_deck('Lands', [(self.forest, 20)])
+        self.inactive = self.make_deck('Inactive', [(self.ghost, 4), (self.bolt_a, 4)], active=False)
+        # Three copies of one printing and two of the other, with four owned across both
+        self.bolt_a_deck = self.make_deck('Bolt A', [(self.bolt_a, 3)])
+        self.bolt_b_deck = self.make_deck('Bolt B', [(self.bolt_b, 1), (self.bolt_b, 1, True)])
+        
+        CardDemandTracker.rebuild([self.collection.id])
+        DeckSimulator.invalidate(self.collection.id)
+    
+    @staticmethod
+    def make_card(name, set_code, collector_number, oracle_card=None):
+        if oracle_card is None:
+            oracle_card = OracleCard.objects.create(oracle_id=f'{name}-oracle', name=name)
+        return Card.objects.create(oracle_card=oracle_card, name=name, set_code=set_code, collector_number=collector_number)
+    
+    def make_deck(self, name, cards, active=True):
+        decklist = Decklist.objects.create(name=name, collection=self.collection, active=active)
+        for card, quantity, *is_sideboard in cards:
+            DecklistCard.objects.create(decklist=decklist, card=card, quantity=quantity, is_sideboard=bool(is_sideboard))
+        return decklist
+    
+    def set_exact_printings(self, exact_printings):
+        self.collection.exact_printings = exact_printings
+        self.collection.save()
+        DeckSimulator.invalidate(self.collection.id)
+    
+    @staticmethod
+    def summary(conflicts):
+        """Conflicts as comparable tuples, whether they name their card by model or by id and name."""
+        return [
+            (
+                conflict['card'].id if isinstance(conflict['card'], Card) else conflict['card']['id'],
+                conflict['type'], conflict['needed'], conflict['available'], conflict.get('other_decks_need'),
+            )
+            for conflict in conflicts or []
+        ]
+    
+    def codes(self):
+        return {decklist_id: status[0] for decklist_id, status in DeckStatusEngine.statuses(self.collection).items()}
+    
+    def test_statuses_with_pooled_printings(self):
+        self.assertEqual(self.codes(), {
+            self.missing.id: 'error',
+            self.short.id: 'error',
+            self.lands.id: 'ok',
+            self.inactive.id: 'inactive',
+            self.bolt_a_deck.id: 'conflict',
+            self.bolt_b_deck.id: 'conflict',
+        })
+    
+    def test_statuses_with_exact_printings(self):
+        self.set_exact_printings(True)
+        
+        codes = self.codes()
+        self.assertEqual(codes[self.bolt_a_deck.id], 'error')
+        self.assertEqual(codes[self.bolt_b_deck.id], 'ok')
+    
+    def test_conflict_details(self):
+        conflicts = DeckStatusEngine.conflicts(self.collection)
+        
+        self.assertEqual(self.summary(conflicts[self.missing.id]), [(self.ghost.id, 'missing', 1, 0, None)])
+        self.assertEqual(self.summary(conflicts[self.short.id]), [(self.elf.id, 'insufficient', 2, 1, None)])
+        self.assertEqual(conflicts[self.lands.id], [])
+        self.assertNotIn(self.inactive.id, conflicts)
+        # Demand of both printings is pooled, named by the first printing each deck lists
+        self.assertEqual(self.summary(conflicts[self.bolt_a_deck.id]), [(self.bolt_a.id, 'conflict', 5, 4, 2)])
+        self.assertEqual(self.summary(conflicts[self.bolt_b_deck.id]), [(self.bolt_b.id, 'conflict', 5, 4, 3)])
+    
+    def test_inactive_deck_ignores_its_cards(self):
+        self.assertEqual(self.inactive.get_status()[0], 'inactive')
+        self.assertEqual(self.inactive.can_be_built(), (True, None))
+    
+    def test_single_deck_check_matches_collection_check(self):
+        for exact_printings in (False, True):
+            with self.subTest(exact_printings=exact_printings):
+                self.set_exact_printings(exact_printings)
+                conflicts = DeckStatusEngine.conflicts(self.collection)
+                
+                for decklist in Decklist.objects.filter(collection=self.collection, active=True):
+                    self.assertEqual(
+                        self.summary(DeckStatusEngine.deck_conflicts(decklist)),
+                        self.summary(conflicts.get(decklist.id))
+                    )
+                    self.assertEqual(decklist.get_status()[0], DeckStatusEngine.statuses(self.collection)[decklist.id][0])
+    
+    def test_simulation_matches_collection_check(self):
+        for exact_printings in (False, True):
+            with self.subTest(exact_printings=exact_printings):
+                self.set_exact_printings(exact_printings)
+                statuses = DeckStatusEngine.statuses(self.collection)
+                simulated = DeckSimulator.simulate(self.collection.id)
+                
+                self.assertEqual(simulated.keys(), statuses.keys())
+                for decklist_id, (code, message, details) in statuses.items():
+                    self.assertEqual(simulated[decklist_id][:2], (code, message))
+                    self.assertEqual(self.summary(simulated[decklist_id][2]), self.summary(details))
+    
+    def test_simulation_of_other_active_decks_matches_database(self):
+        proposed = [self.inactive.id, self.bolt_a_deck.id, self.lands.id]
+        simulated = DeckSimulator.simulate(self.collection.id, proposed)
+        
+        for decklist in Decklist.objects.filter(collection=self.collection):
+            decklist.active = decklist.id in proposed
+            decklist.save()
+            CardDemandTracker.refresh_decklist(decklist)
+        
+        for decklist_id, (code, message, details) in DeckStatusEngine.statuses(self.collection).items():
+            self.assertEqual(simulated[decklist_id][:2], (code, message))
+            self.assertEqual(self.summary(simulated[decklist_id][2]), self.summary(details))
+    
+    def test_simulation_names_cards_as_reseeded(self):
+        DeckSimulator.simulate(self.collection.id)
+        Card.objects.filter(id=self.ghost.id).update(name='Ghostly Flicker (renamed)')
+        DeckSimulator.invalidate_all()
+        
+        details = DeckSimulator.simulate(self.collection.id)[self.missing.id][2]
+        self.assertEqual(details[0]['card']['name'], 'Ghostly Flicker (renamed)')
@@ -10,6 +10,7 @@ urlpatterns = [
     path('collection/<int:collection_id>/decklist/<int:pk>/', views.DecklistDetailView.as_view(), name='decklist_detail'),
     path('collection/<int:collection_id>/decklist/<int:pk>/delete/', views.DeleteDecklistView.as_view(), name='delete_decklist'),
     path('collection/<int:collection_id>/decklist/<int:decklist_id>/toggle-active/', views.ToggleDecklistActiveView.as_view(), name='toggle_decklist_active'),
+    path('collection/<int:collection_id>/decklists/what-if/', views.SimulateDecklistsView.as_view(), name='simulate_decklists'),
     
     # Decklist Card Management
     path('collection/<int:collection_id>/decklist/<int:decklist_id>/search-cards/', views.DecklistCardSearchView.as_view(), name='search_decklist_cards'),
@@ -25,5 +26,12 @@ urlpatterns = [
 
     # Collection Import/Export
     path('collection/<int:collection_id>/import-cards/', views.ImportCardsView.as_view(), name='import_cards'),
+    path('collection/<int:collection_id>/import-cards/stream/', views.StreamImportCardsView.as_view(), name='stream_import_cards'),
     path('collection/<int:collection_id>/export-cards/', views.ExportCardsView.as_view(), name='export_cards'),
+
+    # Background import jobs
+    path('collection/<int:collection_id>/import-jobs/', views.SubmitImportJobView.as_view(), name='submit_import_job'),
+    path('collection/<int:collection_id>/decklist/<int:decklist_id>/import-jobs/', views.SubmitImportJobView.as_view(), name='submit_decklist_import_job'),
+    path('collection/<int:collection_id>/import-jobs/<int:job_id>/', views.ImportJobStatusView.as_view(), name='import_job_status'),
+    path('collection/<int:collection_id>/import-jobs/<int:job_id>/result/', views.ImportJobResultView.as_view(), name='import_job_result'),
 ]
\ No newline at end of file
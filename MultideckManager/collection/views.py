@@ -1,13 +1,21 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import JsonResponse, HttpResponse
+from django.http import Http404, JsonResponse, HttpResponse
 from django.views import View
 from django.views.generic import ListView, DetailView
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from django.db import transaction
-from django.db.models import Q, Sum
-from .models import Collection, Decklist, Card, CollectionCard, DecklistCard
+from django.db.models import Sum
+from .models import Collection, Decklist, Card, CollectionCard, DecklistCard, ImportJob
 from .forms import CollectionForm, CollectionEditForm, DecklistForm, DecklistEditForm
+from .services.card_demand import CardDemandTracker
+from .services.card_list_parser import CardListParser
+from .services.card_rows import normalize_name
+from .services.card_query import CardQuery, CardQueryError
+from .services.card_search import CardSearch
+from .services.deck_simulator import DeckSimulator
+from .services.deck_status import DeckStatusEngine
 from .services.import_export import ImportExport
+from .services.import_jobs import ImportJobRunner
 
 class CollectionListView(ListView):
     """View for listing and creating collections."""
@@ -30,7 +38,10 @@ class CollectionListView(ListView):
             for land_name in basic_lands:
                 # Try to find a basic land card in the database - get the most recent printing
                 try:
-                    land_card = Card.objects.filter(name=land_name, type_line__icontains="Basic Land").order_by('-set_code').first()
+                    land_card = Card.objects.filter(
+                        preferred_for__normalized_name=normalize_name(land_name),
+                        preferred_for__type_line__icontains="Basic Land"
+                    ).first()
                     if land_card:
                         CollectionCard.objects.create(
                             collection=collection,
@@ -61,11 +72,14 @@ class CollectionDetailView(DetailView):
         context['active_tab'] = self.request.GET.get('tab', 'cards')  # Default to cards tab
         
         # Get collection cards with quantities
-        collection_cards = CollectionCard.objects.filter(collection=self.object)
+        collection_cards = CollectionCard.objects.filter(collection=self.object).select_related('card__oracle_card')
         context['collection_cards'] = collection_cards
         
-        # Get decklists in this collection
-        context['decklists'] = Decklist.objects.filter(collection=self.object)
+        # Get decklists in this collection, with every deck's status computed at once
+        context['decklists'] = DeckStatusEngine.attach(
+            self.object,
+            Decklist.objects.filter(collection=self.object).annotate(card_total=Sum('decklistcard__quantity'))
+        )
         
         # Calculate collection statistics
         if collection_cards.exists():
@@ -193,6 +207,8 @@ class CollectionDetailView(DetailView):
         
         if form.is_valid():
             form.save()
+            if 'exact_printings' in form.changed_data:
+                DeckSimulator.invalidate(self.object.id)
             return redirect('collection_detail', pk=self.object.pk)
         
         context = self.get_context_data(object=self.object)
@@ -210,31 +226,25 @@ class CardSearchView(View):
         if len(query) < 2:
             return JsonResponse({'results': []})
         
-        # Search for cards matching the query
-        cards = Card.objects.filter(
-            Q(name__icontains=query)
-        ).order_by('name')[:20]  # Limit to 20 results
+        # Search for cards matching the query: Scryfall-style syntax is compiled
+        # to indexed filters, plain names are looked up best matches first
+        try:
+            if CardQuery.is_query(query):
+                cards = [CardSearch.card_fields(card) for card in CardQuery.compile(query, collection)[:20]]
+            else:
+                cards = CardSearch.typeahead(query, limit=20)
+        except CardQueryError as e:
+            return JsonResponse({'results': [], 'error': str(e)})
+        card_ids = [card['id'] for card in cards]
+        
+        # The cards' quantities in this collection, fetched at once
+        quantities = dict(
+            CollectionCard.objects.filter(collection=collection, card_id__in=card_ids).values_list('card_id', 'quantity')
+        ) if card_ids else {}
         
         results = []
         for card in cards:
-            # Try to get the card's quantity in this collection
-            try:
-                collection_card = CollectionCard.objects.get(collection=collection, card=card)
-                quantity = collection_card.quantity
-            except CollectionCard.DoesNotExist:
-                quantity = 0
-                
-            results.append({
-                'id': card.id,
-                'name': card.name,
-                'set_code': card.set_code,
-                'mana_cost': card.mana_cost,
-                'collector_number': card.collector_number,
-                'type_line': card.type_line,
-                'rarity': card.rarity,
-                'quantity': quantity,
-                'scryfall_uri': card.scryfall_uri,
-            })
+            results.append({**card, 'quantity': quantities.get(card['id'], 0)})
         
         return JsonResponse({'results': results})
 
@@ -266,6 +276,7 @@ class UpdateCardQuantityView(View):
             # Don't decrease if infinite (-1)
         
         collection_card.save()
+        DeckSimulator.invalidate(collection.id)
         
         return JsonResponse({
             'success': True,
@@ -300,7 +311,7 @@ class ImportCardsView(View):
                     cards_to_import = ImportExport.parse_csv_file(card_file)
                 else:
                     # Assume it's a plain text file
-                    cards_to_import = ImportExport.parse_text_input(card_file.read().decode('utf-8'))
+                    cards_to_import = ImportExport.parse_text_file(card_file)
             
             # Process the cards
             result = ImportExport.process_card_import(collection, cards_to_import, skip_unknown)
@@ -313,6 +324,122 @@ class ImportCardsView(View):
             })
 
 
+class StreamImportCardsView(View):
+    """View for importing cards into a collection, streaming results as server-sent events."""
+    
+    def post(self, request, *args, **kwargs):
+        collection_id = kwargs.get('collection_id')
+        collection = get_object_or_404(Collection, id=collection_id)
+        
+        skip_unknown = request.POST.get('skip_unknown') == 'true'
+        
+        if request.POST.get('import_type') == 'paste':
+            cards_to_import = ImportExport.parse_text_input(request.POST.get('card_input', ''))
+        else:  # file import
+            if 'card_file' not in request.FILES:
+                return JsonResponse({
+                    'success': False,
+                    'error': 'No file was uploaded.'
+                })
+            
+            # Files are parsed lazily while the response streams
+            card_file = request.FILES['card_file']
+            if card_file.name.endswith('.csv'):
+                cards_to_import = ImportExport.parse_csv_file(card_file)
+            else:
+                cards_to_import = ImportExport.parse_text_file(card_file)
+        
+        return ImportExport.stream_card_import(collection, cards_to_import, skip_unknown)
+
+
+class SubmitImportJobView(View):
+    """API view for queueing a collection or decklist import as a background job."""
+    
+    def post(self, request, *args, **kwargs):
+        collection_id = kwargs.get('collection_id')
+        decklist_id = kwargs.get('decklist_id')
+        collection = get_object_or_404(Collection, id=collection_id)
+        decklist = get_object_or_404(Decklist, id=decklist_id, collection=collection) if decklist_id else None
+        
+        # Decklist imports use their own form field names
+        input_field, file_field = ('deck_input', 'deck_file') if decklist else ('card_input', 'card_file')
+        
+        if request.POST.get('import_type') == 'paste':
+            input_data = request.POST.get(input_field, '')
+            input_format = 'text'
+        else:  # file import
+            if file_field not in request.FILES:
+                return JsonResponse({
+                    'success': False,
+                    'error': 'No file was uploaded.'
+                })
+            
+            upload = request.FILES[file_field]
+            try:
+                input_data = ''.join(CardListParser.read_file_lines(upload))
+            except UnicodeDecodeError:
+                return JsonResponse({
+                    'success': False,
+                    'error': ImportExport.decode_error(0)
+                })
+            input_format = 'csv' if upload.name.endswith('.csv') else 'text'
+        
+        if decklist:
+            clear_existing = request.POST.get('clear_existing') == 'true'
+            job = ImportJobRunner.submit_decklist_import(decklist, input_data, input_format, clear_existing)
+        else:
+            skip_unknown = request.POST.get('skip_unknown') == 'true'
+            job = ImportJobRunner.submit_collection_import(collection, input_data, input_format, skip_unknown)
+        
+        return JsonResponse({
+            'success': True,
+            'job_id': job.id,
+            'status_url': reverse('import_job_status', args=[collection.id, job.id]),
+            'result_url': reverse('import_job_result', args=[collection.id, job.id]),
+        })
+
+
+class ImportJobStatusView(View):
+    """API view for polling the progress of a background import job."""
+    
+    def get(self, request, *args, **kwargs):
+        job = get_object_or_404(ImportJob, id=kwargs.get('job_id'), collection_id=kwargs.get('collection_id'))
+        
+        return JsonResponse({
+            'success': True,
+            'job_id': job.id,
+            'kind': job.kind,
+            'status': job.status,
+            'processed_lines': job.processed_lines,
+            'total_lines': job.total_lines,
+            'error': job.error,
+            'created_at': job.created_at,
+            'started_at': job.started_at,
+            'finished_at': job.finished_at,
+        })
+
+
+class ImportJobResultView(View):
+    """API view for fetching the result of a finished background import job."""
+    
+    def get(self, request, *args, **kwargs):
+        job = get_object_or_404(ImportJob, id=kwargs.get('job_id'), collection_id=kwargs.get('collection_id'))
+        
+        if job.status == ImportJob.STATUS_COMPLETED:
+            return JsonResponse(job.result)
+        
+        if job.status == ImportJob.STATUS_FAILED:
+            error = job.error
+        else:
+            error = f'Import job is still {job.status}.'
+        
+        return JsonResponse({
+            'success': False,
+            'status': job.status,
+            'error': error
+        })
+
+
 class ExportCardsView(View):
     """View for exporting cards from a collection."""
     
@@ -341,11 +468,11 @@ class DecklistDetailView(DetailView):
         context['edit_form'] = DecklistEditForm(instance=self.object)
         
         # Get cards in this decklist
-        mainboard_cards = DecklistCard.objects.filter(decklist=self.object, is_sideboard=False)
-        sideboard_cards = DecklistCard.objects.filter(decklist=self.object, is_sideboard=True)
+        mainboard_cards = DecklistCard.objects.filter(decklist=self.object, is_sideboard=False).select_related('card__oracle_card')
+        sideboard_cards = DecklistCard.objects.filter(decklist=self.object, is_sideboard=True).select_related('card__oracle_card')
         
-        context['mainboard_cards'] = mainboard_cards.select_related('card')
-        context['sideboard_cards'] = sideboard_cards.select_related('card')
+        context['mainboard_cards'] = mainboard_cards
+        context['sideboard_cards'] = sideboard_cards
         
         # Calculate deck stats
         if mainboard_cards.exists() or sideboard_cards.exists():
@@ -394,7 +521,11 @@ class DecklistDetailView(DetailView):
         form = DecklistEditForm(request.POST, instance=self.object)
         
         if form.is_valid():
-            form.save()
+            with transaction.atomic():
+                form.save()
+                if 'active' in form.changed_data:
+                    CardDemandTracker.refresh_decklist(self.object)
+                    DeckSimulator.invalidate(self.object.collection_id)
             return redirect('decklist_detail', collection_id=self.object.collection_id, pk=self.object.pk)
         
         context = self.get_context_data(object=self.object)
@@ -424,6 +555,7 @@ class CreateDecklistView(View):
             decklist = form.save(commit=False)
             decklist.collection = collection
             decklist.save()
+            DeckSimulator.invalidate(collection.id)
             
             return redirect('decklist_detail', collection_id=collection_id, pk=decklist.id)
         
@@ -441,7 +573,12 @@ class DeleteDecklistView(View):
         decklist_id = kwargs.get('pk')
         
         decklist = get_object_or_404(Decklist, id=decklist_id, collection_id=collection_id)
-        decklist.delete()
+        with transaction.atomic():
+            card_ids = list(DecklistCard.objects.filter(decklist=decklist).values_list('card_id', flat=True))
+            decklist.delete()
+            if decklist.active:
+                CardDemandTracker.refresh(decklist.collection_id, card_ids)
+            DeckSimulator.invalidate(decklist.collection_id)
         
         return redirect('collection_detail', pk=collection_id)
 
@@ -459,46 +596,35 @@ class DecklistCardSearchView(View):
         if len(query) < 2:
             return JsonResponse({'results': []})
         
-        # Search for cards matching the query
-        cards = Card.objects.filter(
-            Q(name__icontains=query)
-        ).order_by('name')[:20]  # Limit to 20 results
+        # Search for cards matching the query: Scryfall-style syntax is compiled
+        # to indexed filters, plain names are looked up best matches first
+        try:
+            if CardQuery.is_query(query):
+                cards = [CardSearch.card_fields(card) for card in CardQuery.compile(query, collection)[:20]]
+            else:
+                cards = CardSearch.typeahead(query, limit=20)
+        except CardQueryError as e:
+            return JsonResponse({'results': [], 'error': str(e)})
+        card_ids = [card['id'] for card in cards]
+        
+        # The cards' quantities in the collection and in both boards of the decklist, fetched at once
+        collection_quantities = dict(
+            CollectionCard.objects.filter(collection=collection, card_id__in=card_ids).values_list('card_id', 'quantity')
+        ) if card_ids else {}
+        decklist_quantities = {
+            (card_id, is_sideboard): quantity
+            for card_id, is_sideboard, quantity in DecklistCard.objects.filter(
+                decklist=decklist, card_id__in=card_ids
+            ).values_list('card_id', 'is_sideboard', 'quantity')
+        } if card_ids else {}
         
         results = []
         for card in cards:
-            # Try to get the card's quantity in the collection
-            try:
-                collection_card = CollectionCard.objects.get(collection=collection, card=card)
-                collection_quantity = collection_card.quantity
-            except CollectionCard.DoesNotExist:
-                collection_quantity = 0
-            
-            # Try to get the card's quantity in the decklist (mainboard)
-            try:
-                mainboard_card = DecklistCard.objects.get(decklist=decklist, card=card, is_sideboard=False)
-                mainboard_quantity = mainboard_card.quantity
-            except DecklistCard.DoesNotExist:
-                mainboard_quantity = 0
-            
-            # Try to get the card's quantity in the decklist (sideboard)
-            try:
-                sideboard_card = DecklistCard.objects.get(decklist=decklist, card=card, is_sideboard=True)
-                sideboard_quantity = sideboard_card.quantity
-            except DecklistCard.DoesNotExist:
-                sideboard_quantity = 0
-            
             results.append({
-                'id': card.id,
-                'name': card.name,
-                'set_code': card.set_code,
-                'mana_cost': card.mana_cost,
-                'collector_number': card.collector_number,
-                'type_line': card.type_line,
-                'rarity': card.rarity,
-                'collection_quantity': collection_quantity,
-                'mainboard_quantity': mainboard_quantity,
-                'sideboard_quantity': sideboard_quantity,
-                'scryfall_uri': card.scryfall_uri,
+                **card,
+                'collection_quantity': collection_quantities.get(card['id'], 0),
+                'mainboard_quantity': decklist_quantities.get((card['id'], False), 0),
+                'sideboard_quantity': decklist_quantities.get((card['id'], True), 0),
             })
         
         return JsonResponse({'results': results})
@@ -507,6 +633,7 @@ class DecklistCardSearchView(View):
 class UpdateDecklistCardView(View):
     """API view for updating a card's quantity in a decklist."""
     
+    @transaction.atomic
     def post(self, request, *args, **kwargs):
         collection_id = kwargs.get('collection_id')
         decklist_id = kwargs.get('decklist_id')
@@ -526,6 +653,8 @@ class UpdateDecklistCardView(View):
             is_sideboard=is_sideboard,
             defaults={'quantity': 0}
         )
+        # Every action changes the card's quantity
+        DeckSimulator.invalidate(collection.id)
         
         # Update quantity based on action
         if action == 'increase':
@@ -536,6 +665,7 @@ class UpdateDecklistCardView(View):
                     else:
                         # Remove the card if quantity would be 0
                         decklist_card.delete()
+                        CardDemandTracker.refresh_decklist(decklist, [card.id])
                         return JsonResponse({
                             'success': True,
                             'quantity': 0,
@@ -543,6 +673,7 @@ class UpdateDecklistCardView(View):
                         })
         elif action == 'remove':
             decklist_card.delete()
+            CardDemandTracker.refresh_decklist(decklist, [card.id])
             return JsonResponse({
                 'success': True,
                 'quantity': 0,
@@ -550,6 +681,7 @@ class UpdateDecklistCardView(View):
             })
         
         decklist_card.save()
+        CardDemandTracker.refresh_decklist(decklist, [card.id])
         
         return JsonResponse({
             'success': True,
@@ -590,7 +722,7 @@ class ImportDecklistView(View):
                     cards_to_import = DecklistImporter.parse_csv_file(deck_file)
                 else:
                     # Assume it's a plain text file
-                    cards_to_import = DecklistImporter.parse_text_input(deck_file.read().decode('utf-8'))
+                    cards_to_import = DecklistImporter.parse_text_file(deck_file)
             elif import_type == 'archidekt':
                 deck_id = request.POST.get('archidekt_id', '')
                 if not deck_id:
@@ -708,9 +840,57 @@ class ToggleDecklistActiveView(View):
         
         decklist = get_object_or_404(Decklist, id=decklist_id, collection_id=collection_id)
         decklist.active = not decklist.active
-        decklist.save()
+        with transaction.atomic():
+            decklist.save()
+            CardDemandTracker.refresh_decklist(decklist)
+            DeckSimulator.invalidate(decklist.collection_id)
         
         return JsonResponse({
             'success': True,
             'active': decklist.active
-        })
\ No newline at end of file
+        })
+
+
+class SimulateDecklistsView(View):
+    """
+    API view for the status of every deck under a proposed set of active decks.
+    
+    Nothing is written: the statuses are computed from the collection's cached
+    snapshot. The proposed decks are given as repeated or comma-separated
+    'active' parameters, an empty 'active' meaning no deck is active, and the
+    decks currently active are used when the parameter is missing.
+    """
+    
+    def get(self, request, *args, **kwargs):
+        collection_id = kwargs.get('collection_id')
+        
+        active_ids = None
+        if 'active' in request.GET:
+            try:
+                active_ids = [
+                    int(decklist_id)
+                    for value in request.GET.getlist('active')
+                    for decklist_id in value.split(',') if decklist_id.strip()
+                ]
+            except ValueError:
+                return JsonResponse({
+                    'success': False,
+                    'error': 'Decklist ids must be numbers.'
+                })
+        
+        statuses = DeckSimulator.simulate(collection_id, active_ids)
+        if statuses is None:
+            raise Http404('Collection not found')
+        
+        return JsonResponse({
+            'success': True,
+            'decks': [
+                {
+                    'id': decklist_id,
+                    'status_code': status_code,
+                    'status_message': status_message,
+                    'conflicts': conflicts
+                }
+                for decklist_id, (status_code, status_message, conflicts) in statuses.items()
+            ]
+        })